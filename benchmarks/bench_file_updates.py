@@ -0,0 +1,100 @@
+"""Per-step cost of virtual filesystem updates as the filesystem grows.
+
+Compares the legacy protocol (tools return the whole `files` dict) with the delta
+protocol (tools return only the changed paths). For each filesystem size it
+measures, for a single `write_file` step:
+
+- the bytes the checkpointer serializes for the tool's pending write,
+- the time to serialize that write,
+- the time `file_reducer` takes to apply the update.
+
+The pending-write bytes stay flat under the delta protocol. Two costs do not,
+and the first is not measured here: when `files` changes, the checkpointer also
+stores the merged channel value as a new version, whose size grows with the
+number of paths. The reducer time grows too: `file_reducer` makes a shallow copy of the path -> content
+mapping (it may still be referenced by a checkpoint being written), which is
+linear in the number of files under both protocols. The `reduce us/1k` column
+reports that cost per 1,000 files.
+
+Usage:
+    python benchmarks/bench_file_updates.py [--json results.json]
+"""
+
+import argparse
+import json
+import time
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from deepagents.state import file_reducer
+
+FILE_SIZE = 4 * 1024
+FILE_COUNTS = [10, 100, 1_000, 5_000]
+REPEATS = 20
+
+
+def _legacy_update(files, path, content):
+    updated = dict(files)
+    updated[path] = content
+    return updated
+
+
+def _delta_update(files, path, content):
+    return {path: content}
+
+
+def measure(file_count: int, make_update) -> dict:
+    serde = JsonPlusSerializer()
+    files = {f"notes/{i}.md": "x" * FILE_SIZE for i in range(file_count)}
+    serialized_bytes = 0
+    serialize_time = 0.0
+    reduce_time = 0.0
+    for i in range(REPEATS):
+        update = make_update(files, "final_report.md", f"draft {i} " + "y" * FILE_SIZE)
+
+        start = time.perf_counter()
+        _, payload = serde.dumps_typed(update)
+        serialize_time += time.perf_counter() - start
+        serialized_bytes = len(payload)
+
+        start = time.perf_counter()
+        files = file_reducer(files, update)
+        reduce_time += time.perf_counter() - start
+    return {
+        "file_count": file_count,
+        "filesystem_bytes": sum(len(c) for c in files.values()),
+        "write_bytes": serialized_bytes,
+        "serialize_ms": serialize_time / REPEATS * 1000,
+        "reduce_ms": reduce_time / REPEATS * 1000,
+    }
+
+
+def run() -> dict:
+    return {
+        "legacy": [measure(n, _legacy_update) for n in FILE_COUNTS],
+        "delta": [measure(n, _delta_update) for n in FILE_COUNTS],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'protocol':<8} {'files':>6} {'fs MB':>7} {'write KB':>10} {'serialize ms':>13} {'reduce ms':>10} "
+          f"{'reduce us/1k':>13}")
+    for protocol, rows in results.items():
+        for row in rows:
+            print(
+                f"{protocol:<8} {row['file_count']:>6} {row['filesystem_bytes'] / 1e6:>7.1f} "
+                f"{row['write_bytes'] / 1024:>10.1f} {row['serialize_ms']:>13.3f} {row['reduce_ms']:>10.3f} "
+                f"{row['reduce_ms'] * 1e6 / row['file_count']:>13.1f}"
+            )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Offline benchmarks for the deep agent graph, driven by a scripted fake model.
+
+Measures framework-side costs without any LLM calls:
+
+- step overhead: wall time per model/tool step of `create_deep_agent`,
+- filesystem: `file_reducer` and file tool cost, and the cost of a full graph
+  step with a checkpointer, as the virtual filesystem grows from 1 KB to 50 MB,
+- message growth: size of the `messages` channel over a long run,
+- subagents: overhead of a `task` call (per subagent, at several fan-outs)
+  compared with a plain tool call,
+- peak RSS after each section.
+
+Usage:
+    python benchmarks/bench_graph.py [--quick] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import time
+from importlib.metadata import version
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from deepagents import create_deep_agent
+from deepagents.state import file_reducer
+from deepagents.tools import edit_file, read_file, write_file
+from fake_model import ScriptedChatModel, call_tools, make_payload_tool, noop, tool_call, tool_steps
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+STEP_COUNTS = [10, 50]
+FILESYSTEM_SIZES = [1_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+MAX_FILE_SIZE = 256 * 1024
+LINE = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.\n"
+MESSAGE_STEPS = 40
+MESSAGE_PAYLOAD = 2_000
+SUBAGENT_FANOUTS = [1, 4, 8]
+REPEATS = 5
+RUN_CONFIG = {"recursion_limit": 1_000}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _best_of(fn, repeats: int = REPEATS) -> float:
+    """Best wall time of `repeats` calls, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _agent(policy, tools=(), checkpointer=None):
+    return create_deep_agent(
+        list(tools), "Benchmark agent.", model=ScriptedChatModel(policy=policy), checkpointer=checkpointer
+    )
+
+
+def _inputs(**state):
+    return {"messages": [{"role": "user", "content": "run the benchmark"}], **state}
+
+
+def measure_step_overhead(steps: int) -> dict:
+    policy = tool_steps([lambda: call_tools(tool_call("noop"))] * steps)
+    agent = _agent(policy, [noop])
+    run_ms = _best_of(lambda: agent.invoke(_inputs(), RUN_CONFIG), repeats=3)
+    return {"steps": steps, "run_ms": run_ms, "per_step_ms": run_ms / (steps + 1)}
+
+
+def _make_filesystem(total_bytes: int) -> dict:
+    file_size = min(total_bytes, MAX_FILE_SIZE)
+    content = (LINE * (file_size // len(LINE) + 1))[:file_size]
+    count = max(1, total_bytes // file_size)
+    # Each file gets distinct content so nothing is shared between paths
+    return {f"docs/{i}.md": f"# doc {i}\n" + content for i in range(count)}
+
+
+def measure_filesystem(total_bytes: int) -> dict:
+    files = _make_filesystem(total_bytes)
+    path = "docs/0.md"
+    state = {"files": files, "messages": []}
+    new_content = files[path] + "appended line\n"
+    edit_target = files[path].splitlines(keepends=True)[0]
+
+    reduce_ms = _best_of(lambda: file_reducer(files, {path: new_content}))
+    read_ms = _best_of(lambda: read_file.func(path, state, offset=0, limit=2000))
+    edit_ms = _best_of(lambda: edit_file.func(path, edit_target, "# edited\n", state, tool_call_id="bench"))
+    write_ms = _best_of(lambda: write_file(path, new_content, state, tool_call_id="bench"))
+
+    policy = tool_steps([lambda: call_tools(tool_call("write_file", file_path=path, content="# short\n"))])
+    agent = _agent(policy, checkpointer=InMemorySaver())
+    threads = iter(range(1_000_000))
+    step_ms = _best_of(
+        lambda: agent.invoke(
+            _inputs(files=files), {**RUN_CONFIG, "configurable": {"thread_id": str(next(threads))}}
+        ),
+        repeats=3,
+    )
+    return {
+        "filesystem_bytes": sum(len(c) for c in files.values()),
+        "file_count": len(files),
+        "reduce_ms": reduce_ms,
+        "read_file_ms": read_ms,
+        "edit_file_ms": edit_ms,
+        "write_file_ms": write_ms,
+        "graph_run_ms": step_ms,
+    }
+
+
+def measure_message_growth(steps: int, payload: int) -> list[dict]:
+    search = make_payload_tool(payload)
+    policy = tool_steps([lambda: call_tools(tool_call("fake_search", query="benchmark"))] * steps)
+    agent = _agent(policy, [search])
+    samples = []
+    start = time.perf_counter()
+    for i, values in enumerate(agent.stream(_inputs(), RUN_CONFIG, stream_mode="values")):
+        messages = values["messages"]
+        samples.append({
+            "update": i,
+            "messages": len(messages),
+            "content_chars": sum(len(str(m.content)) for m in messages),
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        })
+    return samples
+
+
+SUBAGENT_TASK = "BENCHMARK SUBAGENT TASK"
+
+
+def _fanout_policy(fanout: int, make_call):
+    def policy(messages):
+        if any(m.type == "human" and m.content == SUBAGENT_TASK for m in messages):
+            return AIMessage(content="subagent done")
+        if not any(m.type == "ai" for m in messages):
+            return call_tools(*[make_call() for _ in range(fanout)])
+        return AIMessage(content="done")
+
+    return policy
+
+
+def measure_subagents(fanout: int) -> dict:
+    task_agent = _agent(_fanout_policy(
+        fanout, lambda: tool_call("task", description=SUBAGENT_TASK, subagent_type="general-purpose")
+    ))
+    noop_agent = _agent(_fanout_policy(fanout, lambda: tool_call("noop")), [noop])
+
+    def run(agent):
+        return lambda: asyncio.run(agent.ainvoke(_inputs(), RUN_CONFIG))
+
+    task_ms = _best_of(run(task_agent))
+    noop_ms = _best_of(run(noop_agent))
+    return {
+        "fanout": fanout,
+        "task_run_ms": task_ms,
+        "tool_run_ms": noop_ms,
+        "overhead_per_subagent_ms": (task_ms - noop_ms) / fanout,
+    }
+
+
+def run(quick: bool = False) -> dict:
+    sizes = FILESYSTEM_SIZES[:3] if quick else FILESYSTEM_SIZES
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "langgraph": version("langgraph"),
+            "langchain_core": version("langchain-core"),
+        },
+        "peak_rss_mb": {},
+    }
+    results["step_overhead"] = [measure_step_overhead(n) for n in STEP_COUNTS]
+    results["peak_rss_mb"]["step_overhead"] = peak_rss_mb()
+    results["filesystem"] = [measure_filesystem(n) for n in sizes]
+    results["peak_rss_mb"]["filesystem"] = peak_rss_mb()
+    results["message_growth"] = measure_message_growth(MESSAGE_STEPS, MESSAGE_PAYLOAD)
+    results["peak_rss_mb"]["message_growth"] = peak_rss_mb()
+    results["subagents"] = [measure_subagents(n) for n in SUBAGENT_FANOUTS]
+    results["peak_rss_mb"]["subagents"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Skip the 10 MB and 50 MB filesystems")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(quick=args.quick)
+
+    print(f"{'steps':>6} {'run ms':>9} {'ms/step':>8}")
+    for row in results["step_overhead"]:
+        print(f"{row['steps']:>6} {row['run_ms']:>9.1f} {row['per_step_ms']:>8.2f}")
+
+    print(f"\n{'fs MB':>7} {'files':>6} {'reduce ms':>10} {'read ms':>8} {'edit ms':>8} {'write ms':>9} {'run ms':>8}")
+    for row in results["filesystem"]:
+        print(
+            f"{row['filesystem_bytes'] / 1e6:>7.2f} {row['file_count']:>6} {row['reduce_ms']:>10.3f} "
+            f"{row['read_file_ms']:>8.3f} {row['edit_file_ms']:>8.3f} {row['write_file_ms']:>9.3f} "
+            f"{row['graph_run_ms']:>8.1f}"
+        )
+
+    last = results["message_growth"][-1]
+    print(f"\nmessages after {MESSAGE_STEPS} steps: {last['messages']} ({last['content_chars'] / 1e3:.0f} K chars)")
+
+    print(f"\n{'fanout':>6} {'task ms':>8} {'tool ms':>8} {'overhead/subagent ms':>21}")
+    for row in results["subagents"]:
+        print(
+            f"{row['fanout']:>6} {row['task_run_ms']:>8.1f} {row['tool_run_ms']:>8.1f} "
+            f"{row['overhead_per_subagent_ms']:>21.2f}"
+        )
+
+    print("\npeak RSS (MB): " + ", ".join(
+        f"{section}={mb:.0f}" for section, mb in results["peak_rss_mb"].items() if mb is not None
+    ))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
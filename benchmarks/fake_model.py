@@ -0,0 +1,100 @@
+"""Scripted chat model and fake tools for offline deep agent benchmarks.
+
+`ScriptedChatModel` decides each reply with a plain Python policy over the
+messages it receives, so benchmarks can drive `create_deep_agent` through any
+sequence of tool calls (including `task` calls into subagents) without an LLM,
+network access or API keys.
+"""
+
+import itertools
+import json
+from typing import Callable, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+
+Policy = Callable[[Sequence[BaseMessage]], AIMessage]
+
+_call_ids = itertools.count()
+
+
+def tool_call(name: str, **args) -> dict:
+    """Build a tool call with a unique ID."""
+    return {"name": name, "args": args, "id": f"call_{next(_call_ids)}"}
+
+
+def call_tools(*tool_calls: dict) -> AIMessage:
+    """AI message that calls the given tools (in parallel if several)."""
+    return AIMessage(content="", tool_calls=list(tool_calls))
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose replies come from `policy(messages)`.
+
+    Tool binding is a no-op: the policy decides which tools to call.
+    """
+
+    policy: Policy
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=self.policy(messages))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self.policy(messages)
+        words = message.content.split(" ") if message.content else []
+        for i, word in enumerate(words):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                    for i, tc in enumerate(message.tool_calls)
+                ],
+            )
+        )
+
+
+def tool_steps(steps: Sequence[Callable[[], AIMessage]], final: str = "done") -> Policy:
+    """Policy that plays `steps` in order (one per model call), then answers `final`.
+
+    The position in the script is derived from the number of AI messages already
+    in the conversation, so the same policy can be reused across runs.
+    """
+
+    def policy(messages):
+        turn = sum(1 for m in messages if m.type == "ai")
+        if turn < len(steps):
+            return steps[turn]()
+        return AIMessage(content=final)
+
+    return policy
+
+
+@tool
+def noop(payload: str = "") -> str:
+    """Fake tool that does nothing."""
+    return "ok"
+
+
+def make_payload_tool(size: int):
+    """Fake search tool returning a payload of `size` characters."""
+
+    @tool
+    def fake_search(query: str) -> str:
+        """Fake web search."""
+        return ((query + " ") * (size // (len(query) + 1) + 1))[:size]
+
+    return fake_search
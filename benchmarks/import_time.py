@@ -0,0 +1,100 @@
+"""Cold import time of deepagents modules, checked against a budget.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so
+numbers include every dependency the import pulls in. The report also lists the
+heavy third-party packages (providers, UI, crypto, numpy) that were loaded, which
+is what lazy imports are meant to avoid.
+
+Usage:
+    python benchmarks/import_time.py [--repeats 3] [--json results.json] [--no-budget]
+
+Exits with status 1 if any module exceeds its budget.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Budgets (ms) for the cumulative import time of each module. They leave headroom
+# over what the module itself needs, but fail if a provider, UI or crypto package
+# is pulled in eagerly again.
+BUDGETS_MS = {
+    "deepagents": 50,
+    "deepagents.graph": 1500,
+    "deepagents.search": 1000,
+    "deepagents.monitoring": 300,
+    "deepagents.config": 100,
+    "deepagents.auth": 150,
+}
+
+HEAVY_PACKAGES = [
+    "langchain_anthropic",
+    "anthropic",
+    "langchain_google_genai",
+    "streamlit",
+    "cryptography",
+    "numpy",
+    "bcrypt",
+]
+
+
+def measure(module: str) -> dict:
+    """Import `module` in a fresh interpreter; return its cumulative import time and heavy deps."""
+    env = {**os.environ, "PYTHONPATH": SRC + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    cumulative_us = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative_us[name.strip()] = int(cumulative)
+    return {
+        "ms": cumulative_us[module] / 1000,
+        "heavy": [p for p in HEAVY_PACKAGES if p in cumulative_us],
+    }
+
+
+def run(repeats: int = 3) -> dict:
+    results = {}
+    for module in BUDGETS_MS:
+        samples = [measure(module) for _ in range(repeats)]
+        results[module] = {
+            "ms": min(s["ms"] for s in samples),
+            "budget_ms": BUDGETS_MS[module],
+            "heavy": samples[0]["heavy"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3, help="Imports per module; the best is kept")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--no-budget", action="store_true", help="Report only, never fail")
+    args = parser.parse_args()
+
+    results = run(args.repeats)
+    over = []
+    print(f"{'module':<24} {'ms':>8} {'budget':>8}  heavy dependencies")
+    for module, row in results.items():
+        flag = "" if row["ms"] <= row["budget_ms"] else "  OVER BUDGET"
+        print(f"{module:<24} {row['ms']:>8.1f} {row['budget_ms']:>8}  {', '.join(row['heavy']) or '-'}{flag}")
+        if flag:
+            over.append(module)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if over and not args.no_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Login throughput of the password pool under a burst of concurrent logins.
+
+Simulates `--sessions` Streamlit sessions that each log in `--logins` times
+through `AuthManager.authenticate_user`, for every cost profile of the chosen
+algorithm and pool size. Reports logins per second, p50/p95 login latency,
+time spent queued for the pool and rejected logins, to size
+`SOFIA_PASSWORD_PROFILE`, `SOFIA_PASSWORD_WORKERS` and `SOFIA_PASSWORD_QUEUE`
+against the expected morning login spike.
+
+Usage:
+    python benchmarks/login_throughput.py [--algorithm scrypt] [--sessions 32] [--logins 4]
+        [--workers 1 2 4] [--queue 64] [--json results.json]
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+from deepagents import auth, monitoring, passwords
+from deepagents.passwords import COST_PROFILES, PasswordHasher, PasswordPool
+from deepagents.user_store import UserStore
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _queue_wait():
+    """Total seconds queued and number of queued operations so far."""
+    sample = monitoring.registry.get_sample_value
+    return (sample("sofia_password_queue_wait_seconds_sum") or 0.0,
+            sample("sofia_password_queue_wait_seconds_count") or 0.0)
+
+
+def measure(algorithm: str, profile: str, workers: int, queue: int, sessions: int, logins: int) -> dict:
+    pool = PasswordPool(PasswordHasher(algorithm, profile), max_workers=workers, max_pending=queue)
+    passwords._pool = pool
+    manager = auth.AuthManager.__new__(auth.AuthManager)
+    manager.store = UserStore(":memory:")
+    manager.store.create("bench", pool.hash("bench-password"))
+
+    def session():
+        latencies, rejected = [], 0
+        for _ in range(logins):
+            start = time.perf_counter()
+            if manager.authenticate_user("bench", "bench-password") is None:
+                rejected += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, rejected
+
+    wait_before, count_before = _queue_wait()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(lambda _: session(), range(sessions)))
+    elapsed = time.perf_counter() - start
+    wait_after, count_after = _queue_wait()
+    pool.shutdown()
+    manager.store.close()
+
+    latencies = [latency for session_latencies, _ in results for latency in session_latencies]
+    rejected = sum(r for _, r in results)
+    waited = count_after - count_before
+    return {
+        "algorithm": algorithm,
+        "profile": profile,
+        "workers": workers,
+        "logins": len(latencies),
+        "rejected": rejected,
+        "logins_per_second": (len(latencies) - rejected) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "mean_queue_wait_ms": (wait_after - wait_before) / waited * 1000 if waited else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--algorithm", default="scrypt", choices=sorted(COST_PROFILES))
+    parser.add_argument("--profiles", nargs="+", default=["low", "default", "high"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--queue", type=int, default=64, help="Max pending operations before rejecting")
+    parser.add_argument("--sessions", type=int, default=32, help="Concurrent sessions logging in")
+    parser.add_argument("--logins", type=int, default=4, help="Logins per session")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    # Keep per-login log lines out of the measurement
+    auth.logger.disabled = True
+
+    rows = [
+        measure(args.algorithm, profile, workers, args.queue, args.sessions, args.logins)
+        for profile in args.profiles
+        for workers in args.workers
+    ]
+
+    print(f"cpus: {os.cpu_count()}  sessions: {args.sessions}  logins/session: {args.logins}  queue: {args.queue}")
+    print(f"{'profile':<8} {'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'queue ms':>9} {'rejected':>9}")
+    for row in rows:
+        print(
+            f"{row['profile']:<8} {row['workers']:>7} {row['logins_per_second']:>9.1f} {row['p50_ms']:>8.1f} "
+            f"{row['p95_ms']:>8.1f} {row['mean_queue_wait_ms']:>9.1f} {row['rejected']:>9}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
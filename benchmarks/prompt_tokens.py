@@ -0,0 +1,110 @@
+"""Fixed prompt overhead per model call for each prompt profile.
+
+For the main agent, the general-purpose subagent and a research subagent
+(configured like the Streamlit app), reports the tokens of the system prompt
+and of the tool schemas that are re-sent on every model call, for the
+`default` and `compact` profiles of `create_deep_agent`. Token counts use
+`count_tokens_approximately`, so no model or API key is needed.
+
+Usage:
+    python benchmarks/prompt_tokens.py [--steps 15] [--json results.json]
+"""
+
+import argparse
+import json
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.tools import BaseTool, tool
+
+from deepagents.graph import _built_in_tools, base_prompt, compact_base_prompt
+from deepagents.search import internet_search_tool
+from deepagents.state import DeepAgentState
+from deepagents.sub_agent import _create_task_tool
+
+PROFILES = ["default", "compact"]
+
+INSTRUCTIONS = (
+    "Eres SOF-IA, un asistente de investigación. Usa la búsqueda web para obtener "
+    "información actualizada y responde en español de forma clara y estructurada."
+)
+
+SUBAGENTS = [
+    {
+        "name": "research-agent",
+        "description": "Used to research more in depth questions. Only give this researcher one topic at a time.",
+        "prompt": "You are a dedicated researcher. Conduct thorough research and reply with a detailed answer.",
+        "tools": ["internet_search"],
+    },
+]
+
+
+class _OfflineModel(BaseChatModel):
+    """Placeholder model: subagent graphs are built but never invoked."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+
+def _overhead(agent: str, profile: str, system_prompt: str, tools: list) -> dict:
+    prompt_tokens = count_tokens_approximately([SystemMessage(system_prompt)])
+    tools = [t if isinstance(t, BaseTool) else tool(t) for t in tools]
+    tool_tokens = count_tokens_approximately([], tools=tools)
+    return {
+        "agent": agent,
+        "profile": profile,
+        "prompt_tokens": prompt_tokens,
+        "tool_tokens": tool_tokens,
+        "total_tokens": prompt_tokens + tool_tokens,
+    }
+
+
+def measure(profile: str) -> list[dict]:
+    built_in_tools = _built_in_tools(profile)
+    tools = [internet_search_tool] + built_in_tools
+    task_tool = _create_task_tool(
+        tools, INSTRUCTIONS, SUBAGENTS, _OfflineModel(), DeepAgentState, prompt_profile=profile
+    )
+    main_prompt = INSTRUCTIONS + (compact_base_prompt if profile == "compact" else base_prompt)
+    rows = [
+        _overhead("main", profile, main_prompt, built_in_tools + [internet_search_tool, task_tool]),
+        _overhead("general-purpose", profile, INSTRUCTIONS, tools),
+    ]
+    for subagent in SUBAGENTS:
+        sub_tools = [t for t in tools if getattr(t, "name", None) in subagent["tools"]]
+        rows.append(_overhead(subagent["name"], profile, subagent["prompt"], sub_tools))
+    return rows
+
+
+def run() -> list[dict]:
+    return [row for profile in PROFILES for row in measure(profile)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=15, help="Main agent model calls per run")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run()
+    print(f"{'agent':<16} {'profile':<8} {'prompt':>7} {'tools':>7} {'total':>7} {'per run':>8}")
+    for row in results:
+        print(
+            f"{row['agent']:<16} {row['profile']:<8} {row['prompt_tokens']:>7} "
+            f"{row['tool_tokens']:>7} {row['total_tokens']:>7} {row['total_tokens'] * args.steps:>8}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"steps": args.steps, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
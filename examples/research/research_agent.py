@@ -5,6 +5,7 @@ from tavily import TavilyClient
 
 
 from deepagents import create_deep_agent, SubAgent
+from deepagents.search_cache import cached_search
  
 # It's best practice to initialize the client once and reuse it.
 tavily_client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
@@ -17,7 +18,8 @@ def internet_search(
     include_raw_content: bool = False,
 ):
     """Run a web search"""
-    search_docs = tavily_client.search(
+    search_docs = cached_search(
+        tavily_client.search,
         query,
         max_results=max_results,
         include_raw_content=include_raw_content,
@@ -37,6 +39,8 @@ research_sub_agent = {
     "description": "Used to research more in depth questions. Only give this researcher one topic at a time. Do not pass multiple sub questions to this researcher. Instead, you should break down a large topic into the necessary components, and then call multiple research agents in parallel, one for each sub question.",
     "prompt": sub_research_prompt,
     "tools": ["internet_search"],
+    "max_concurrency": 4,
+    "timeout": 300,
 }
 
 sub_critique_prompt = """You are a dedicated editor. You are being tasked to critique a report.
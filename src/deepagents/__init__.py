@@ -1,5 +1,50 @@
-from deepagents.graph import create_deep_agent
-from deepagents.interrupt import ToolInterruptConfig
-from deepagents.state import DeepAgentState
-from deepagents.sub_agent import SubAgent
-from deepagents.model import get_default_model
+"""Deep agents: planning, a virtual filesystem and subagents on top of LangGraph.
+
+Public names are imported on first access, so importing a submodule (or the
+package itself) does not pull in LangGraph or a model provider until needed.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from deepagents.file_store import FileStore, InMemoryFileStore, SQLiteFileStore
+    from deepagents.graph import create_deep_agent
+    from deepagents.interrupt import ToolInterruptConfig
+    from deepagents.jobs import Job, JobRunner, get_job_runner
+    from deepagents.model import get_default_model
+    from deepagents.state import DeepAgentState
+    from deepagents.streaming import StreamEvent, astream_agent_events, stream_agent_events
+    from deepagents.sub_agent import SubAgent
+
+_EXPORTS = {
+    "create_deep_agent": "deepagents.graph",
+    "ToolInterruptConfig": "deepagents.interrupt",
+    "DeepAgentState": "deepagents.state",
+    "SubAgent": "deepagents.sub_agent",
+    "get_default_model": "deepagents.model",
+    "StreamEvent": "deepagents.streaming",
+    "astream_agent_events": "deepagents.streaming",
+    "stream_agent_events": "deepagents.streaming",
+    "Job": "deepagents.jobs",
+    "JobRunner": "deepagents.jobs",
+    "get_job_runner": "deepagents.jobs",
+    "FileStore": "deepagents.file_store",
+    "InMemoryFileStore": "deepagents.file_store",
+    "SQLiteFileStore": "deepagents.file_store",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,332 @@
+"""
+Control de admisión para las ejecuciones del agente en SOF-IA.
+Antes de lanzar un agente (que abre llamadas a Gemini y Tavily) cada consulta
+pasa por un controlador con:
+
+- un límite global de ejecuciones simultáneas, que se reduce a la mitad cuando
+  los proveedores devuelven 429 y se recupera poco a poco (AIMD);
+- un token bucket por usuario, para que nadie acapare el servicio;
+- una cola con reparto justo ponderado (WFQ) entre usuarios: quien tiene
+  varias consultas en cola no adelanta a quien tiene una;
+- descarte de carga: si la cola está llena o la espera estimada supera el
+  máximo, se rechaza enseguida en lugar de esperar a un timeout.
+
+Mientras espera, quien llama recibe su posición en la cola y la espera
+estimada para mostrarlas en la interfaz.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import monitoring
+from .health import register_readiness_check
+
+logger = logging.getLogger(__name__)
+
+# Peso en el reparto justo por rol: un admin avanza el doble de rápido en la cola
+DEFAULT_ROLE_WEIGHTS = {'admin': 2.0, 'user': 1.0}
+
+# Cada cuánto (s) se olvida el estado de los usuarios inactivos (una entrada por sesión anónima)
+PRUNE_INTERVAL = 60.0
+
+WaitCallback = Callable[[int, float], None]
+
+
+class AdmissionRejected(RuntimeError):
+    """La consulta no se admitió: `reason` es `rate_limited`, `queue_full`,
+    `overloaded` o `timeout`; `retry_after` sugiere cuándo reintentar (segundos)."""
+
+    def __init__(self, reason: str, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket: `rate` consultas por segundo con ráfagas de hasta `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_full(self, now: float) -> bool:
+        """Lleno: equivale a un bucket nuevo, así que se puede descartar."""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+    def try_consume(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def retry_after(self) -> float:
+        """Segundos hasta que haya un token disponible."""
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else float('inf')
+
+
+class _Ticket:
+    __slots__ = ('user', 'finish', 'seq', 'enqueued', 'granted')
+
+    def __init__(self, user: str, finish: float, seq: int):
+        self.user = user
+        self.finish = finish
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+    def __lt__(self, other: '_Ticket') -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class AdmissionController:
+    """Limita y ordena las ejecuciones del agente (ver el docstring del módulo).
+
+    Se usa como `with controller.admit(usuario, on_wait=...):` alrededor de la
+    ejecución; lanza `AdmissionRejected` si la consulta se descarta.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 32, max_wait: float = 60.0,
+                 user_rate: float = 0.2, user_burst: float = 3, role_weights: Optional[Dict[str, float]] = None,
+                 min_concurrent: int = 1, throttle_cooldown: float = 5.0):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent debe ser un entero positivo")
+        self.max_concurrent = max_concurrent
+        self.min_concurrent = max(1, min(min_concurrent, max_concurrent))
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.role_weights = {**DEFAULT_ROLE_WEIGHTS, **(role_weights or {})}
+        self.throttle_cooldown = throttle_cooldown
+
+        self._cond = threading.Condition()
+        self._limit = float(max_concurrent)
+        self._running = 0
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._avg_run = 10.0  # media móvil de la duración de una ejecución (s)
+        self._last_throttle = 0.0
+        self._last_prune = time.monotonic()
+        monitoring.ADMISSION_LIMIT.set(self.max_concurrent)
+
+    @property
+    def limit(self) -> int:
+        """Ejecuciones simultáneas permitidas ahora mismo."""
+        return max(self.min_concurrent, int(self._limit))
+
+    def _bucket(self, user: str) -> TokenBucket:
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def _prune(self, now: float):
+        """Olvidar usuarios inactivos: bucket lleno y sin ventaja en el tiempo virtual
+        (se llama con el lock tomado)."""
+        self._last_prune = now
+        for user in [u for u, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[user]
+        for user in [u for u, finish in self._last_finish.items() if finish <= self._virtual_time]:
+            del self._last_finish[user]
+
+    def _estimated_wait(self, position: int) -> float:
+        """Espera estimada para la posición `position` (1 = la siguiente en entrar)."""
+        return position * self._avg_run / self.limit
+
+    def _position(self, ticket: _Ticket) -> int:
+        return 1 + sum(1 for other in self._waiting if other < ticket)
+
+    def _dispatch(self):
+        while self._waiting and self._running < self.limit:
+            ticket = heapq.heappop(self._waiting)
+            ticket.granted = True
+            self._running += 1
+            self._virtual_time = max(self._virtual_time, ticket.finish)
+        self._publish()
+        self._cond.notify_all()
+
+    def _publish(self):
+        monitoring.ADMISSION_RUNNING.set(self._running)
+        monitoring.ADMISSION_QUEUE_DEPTH.set(len(self._waiting))
+
+    def _reject(self, reason: str, message: str, retry_after: float = 0.0):
+        monitoring.ADMISSION_REJECTED.labels(reason=reason).inc()
+        logger.warning(f"Consulta rechazada por el control de admisión ({reason}): {message}")
+        raise AdmissionRejected(reason, message, retry_after)
+
+    def acquire(self, user: str, role: str = 'user', on_wait: Optional[WaitCallback] = None,
+                poll_interval: float = 0.5):
+        """Esperar turno para ejecutar; `on_wait(posición, espera_estimada)` se llama
+        (sin el lock tomado) mientras la consulta está en cola."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self._prune(now)
+            bucket = self._bucket(user)
+            if not bucket.try_consume():
+                retry_after = bucket.retry_after()
+                self._reject('rate_limited', f"Demasiadas consultas seguidas de {user}", retry_after)
+
+            if not self._waiting and self._running < self.limit:
+                self._running += 1
+                self._publish()
+                monitoring.ADMISSION_WAIT.observe(0.0)
+                return
+
+            position = len(self._waiting) + 1
+            estimated = self._estimated_wait(position)
+            if len(self._waiting) >= self.max_queue:
+                bucket.refund()
+                self._reject('queue_full', f"Cola llena ({len(self._waiting)} consultas)", estimated)
+            if estimated > self.max_wait:
+                bucket.refund()
+                self._reject('overloaded', f"Espera estimada de {estimated:.0f}s", estimated)
+
+            # WFQ: cada consulta termina, en tiempo virtual, 1/peso después de la
+            # anterior del mismo usuario (o del tiempo virtual actual si no tiene)
+            weight = self.role_weights.get(role, 1.0)
+            start = max(self._virtual_time, self._last_finish.get(user, 0.0))
+            ticket = _Ticket(user, start + 1.0 / weight, next(self._seq))
+            self._last_finish[user] = ticket.finish
+            heapq.heappush(self._waiting, ticket)
+            self._publish()
+
+        deadline = ticket.enqueued + self.max_wait
+        try:
+            while True:
+                with self._cond:
+                    if not ticket.granted:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject('timeout', f"Sin turno tras {self.max_wait:.0f}s en cola")
+                        self._cond.wait(min(remaining, poll_interval))
+                    if ticket.granted:
+                        monitoring.ADMISSION_WAIT.observe(time.monotonic() - ticket.enqueued)
+                        return
+                    position = self._position(ticket)
+                    estimated = self._estimated_wait(position)
+                if on_wait is not None:
+                    on_wait(position, estimated)
+        except BaseException:
+            # Timeout, error en `on_wait` o interrupción (p. ej. un rerun de Streamlit):
+            # sin esto el turno se concedería más tarde y nadie lo liberaría
+            with self._cond:
+                granted = ticket.granted
+                if not granted:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._publish()
+            if granted:
+                self.release()
+            raise
+
+    def release(self, duration: Optional[float] = None):
+        """Liberar el turno; `duration` (s) alimenta la estimación de espera."""
+        with self._cond:
+            self._running -= 1
+            if duration is not None:
+                self._avg_run = 0.8 * self._avg_run + 0.2 * duration
+            # Recuperación aditiva: +1 ejecución simultánea por cada `limit` que terminan
+            self._limit = min(float(self.max_concurrent), self._limit + 1.0 / max(1.0, self._limit))
+            monitoring.ADMISSION_LIMIT.set(self.limit)
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, user: str, role: str = 'user', on_wait: Optional[WaitCallback] = None) -> Iterator[None]:
+        """Mantener un turno mientras dura el bloque."""
+        self.acquire(user, role, on_wait)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def report_rate_limited(self):
+        """Un proveedor devolvió 429: reducir a la mitad el límite global (como mucho
+        una vez cada `throttle_cooldown` segundos)."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_throttle < self.throttle_cooldown:
+                return
+            self._last_throttle = now
+            self._limit = max(float(self.min_concurrent), self._limit / 2)
+            monitoring.ADMISSION_LIMIT.set(self.limit)
+            logger.warning(f"Límite de proveedor alcanzado: ejecuciones simultáneas reducidas a {self.limit}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'running': self._running,
+                'queued': len(self._waiting),
+                'limit': self.limit,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'avg_run_seconds': self._avg_run,
+            }
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Detectar errores 429 / cuota agotada de los proveedores (Gemini, Tavily)."""
+    for current in (error, error.__cause__):
+        if current is None:
+            continue
+        status = getattr(current, 'status_code', None) or getattr(getattr(current, 'response', None),
+                                                                   'status_code', None)
+        if status == 429:
+            return True
+        text = f"{type(current).__name__} {current}".lower()
+        if any(marker in text for marker in ('429', 'resourceexhausted', 'resource_exhausted',
+                                             'rate limit', 'ratelimit', 'too many requests')):
+            return True
+    return False
+
+
+def _admission_check() -> Tuple[bool, Dict[str, Any]]:
+    """Listo mientras la cola de admisión no esté llena."""
+    if _controller is None:
+        return True, {'started': False}
+    stats = _controller.get_stats()
+    return stats['queued'] < stats['max_queue'], stats
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Controlador compartido, configurado con `SOFIA_MAX_CONCURRENT_RUNS`,
+    `SOFIA_ADMISSION_QUEUE`, `SOFIA_ADMISSION_MAX_WAIT`, `SOFIA_USER_RATE`
+    (consultas por minuto) y `SOFIA_USER_BURST`."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    max_concurrent=int(os.getenv('SOFIA_MAX_CONCURRENT_RUNS', '4')),
+                    max_queue=int(os.getenv('SOFIA_ADMISSION_QUEUE', '32')),
+                    max_wait=float(os.getenv('SOFIA_ADMISSION_MAX_WAIT', '60')),
+                    user_rate=float(os.getenv('SOFIA_USER_RATE', '12')) / 60,
+                    user_burst=float(os.getenv('SOFIA_USER_BURST', '3')),
+                )
+                register_readiness_check('admission', _admission_check)
+    return _controller
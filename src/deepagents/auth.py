@@ -5,63 +5,121 @@ Proporciona autenticación de usuarios con JWT y gestión de sesiones.
 import os
 import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import jwt
-import streamlit as st
-from .config import secure_config
+from .lazy_imports import lazy_import
+from .passwords import PasswordPoolBusy, get_password_pool
+from .user_store import UserStore, get_user_store
 import logging
 
+# Streamlit solo se carga cuando se usa la sesión o la UI
+st = lazy_import('streamlit')
+
 logger = logging.getLogger(__name__)
 
+# Hashes de las contraseñas por defecto, calculados una vez por proceso
+_default_hashes: Dict[str, str] = {}
+_default_hashes_lock = threading.Lock()
+
+def _default_password_hash(password: str) -> str:
+    with _default_hashes_lock:
+        if password not in _default_hashes:
+            _default_hashes[password] = get_password_pool().hash(password)
+        return _default_hashes[password]
+
+# Usuarios iniciales: (contraseña, rol). Cambiar en producción
+DEFAULT_USERS = {
+    "admin": ("admin123", "admin"),
+    "user": ("user123", "user"),
+}
+
+def _seed_default_users(store: UserStore):
+    """Crear los usuarios iniciales que falten (solo se hashea si no existen)."""
+    for username, (password, role) in DEFAULT_USERS.items():
+        if username not in store:
+            store.create(username, _default_password_hash(password), role)
+
+# Vida de los tokens y ventana final en la que se renuevan (sesión deslizante)
+JWT_LIFETIME = timedelta(hours=24)
+JWT_REFRESH_WINDOW = timedelta(hours=float(os.getenv('SOFIA_JWT_REFRESH_HOURS', '2')))
+
+class VerifiedTokenCache:
+    """Claims de tokens JWT ya verificados, por digest del token, válidos hasta su `exp`.
+
+    Streamlit re-ejecuta el script en cada interacción: así cada token se
+    decodifica y verifica una sola vez en lugar de en cada re-ejecución.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """`(exp, claims)` del token si está en caché y no ha expirado."""
+        key = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], dict(entry[1])
+
+    def put(self, token: str, exp: float, claims: Dict[str, Any]):
+        with self._lock:
+            self._entries[self._digest(token)] = (exp, dict(claims))
+            self._entries.move_to_end(self._digest(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(self._digest(token), None)
+
 class AuthManager:
     """Gestor de autenticación con JWT y hash seguro de contraseñas."""
 
-    def __init__(self):
+    def __init__(self, store: Optional[UserStore] = None):
         self.jwt_secret = os.getenv('JWT_SECRET', 'sofia-jwt-secret-key-change-in-production')
-        self.users_db = self._load_users_db()
-
-    def _load_users_db(self) -> Dict[str, Dict[str, Any]]:
-        """Cargar base de datos de usuarios (en memoria por ahora)."""
-        # En producción, esto debería venir de una base de datos
-        default_users = {
-            "admin": {
-                "password_hash": self._hash_password("admin123"),  # Cambiar en producción
-                "role": "admin",
-                "enabled": True
-            },
-            "user": {
-                "password_hash": self._hash_password("user123"),  # Cambiar en producción
-                "role": "user",
-                "enabled": True
-            }
-        }
-
-        # Incluir usuarios registrados desde session_state
-        if 'registered_users' in st.session_state:
-            default_users.update(st.session_state.registered_users)
-
-        return default_users
+        self.store = store if store is not None else get_user_store()
+        _seed_default_users(self.store)
+        self.token_cache = VerifiedTokenCache()
 
     def _hash_password(self, password: str) -> str:
-        """Hash seguro de contraseña usando SHA-256 con salt."""
-        salt = os.getenv('PASSWORD_SALT', 'sofia-salt-2024')
-        salted_password = password + salt
-        return hashlib.sha256(salted_password.encode()).hexdigest()
+        """Hash seguro de contraseña (sal por usuario), calculado en el pool de contraseñas."""
+        return get_password_pool().hash(password)
 
     def _verify_password(self, password: str, password_hash: str) -> bool:
-        """Verificar contraseña contra hash."""
-        return self._hash_password(password) == password_hash
+        """Verificar contraseña contra hash (también hashes SHA-256 antiguos)."""
+        return get_password_pool().verify(password, password_hash)
 
     def authenticate_user(self, username: str, password: str) -> Optional[Dict[str, Any]]:
         """Autenticar usuario y devolver información si es válido."""
-        user = self.users_db.get(username)
+        user = self.store.get(username)
         if not user or not user.get('enabled', False):
             logger.warning(f"Intento de login fallido para usuario: {username}")
             return None
 
-        if self._verify_password(password, user['password_hash']):
+        try:
+            valid = self._verify_password(password, user['password_hash'])
+        except PasswordPoolBusy:
+            logger.warning(f"Login rechazado por saturación del pool de contraseñas: {username}")
+            return None
+
+        if valid:
             logger.info(f"Login exitoso para usuario: {username}")
+            self._upgrade_hash(username, user['password_hash'], password)
             return {
                 'username': username,
                 'role': user['role'],
@@ -71,66 +129,112 @@ class AuthManager:
             logger.warning(f"Contraseña incorrecta para usuario: {username}")
             return None
 
+    def _upgrade_hash(self, username: str, password_hash: str, password: str):
+        """Re-hashear con el algoritmo y coste actuales si el hash guardado es antiguo."""
+        if not get_password_pool().hasher.needs_rehash(password_hash):
+            return
+        try:
+            self.store.update_password_hash(username, self._hash_password(password))
+        except PasswordPoolBusy:
+            return
+        logger.info(f"Hash de contraseña actualizado para usuario: {username}")
+
     def register_user(self, username: str, password: str, role: str = "user") -> bool:
         """Registrar un nuevo usuario."""
         if not username or not password:
             logger.warning("Intento de registro con campos vacíos")
             return False
 
-        if username in self.users_db:
+        if username in self.store:
             logger.warning(f"Intento de registro con usuario existente: {username}")
             return False
 
-        # Crear usuario registrado
-        new_user = {
-            "password_hash": self._hash_password(password),
-            "role": role,
-            "enabled": True,
-            "registered_at": datetime.utcnow().isoformat()
-        }
-
-        # Guardar en session_state para persistencia temporal
-        if 'registered_users' not in st.session_state:
-            st.session_state.registered_users = {}
-        st.session_state.registered_users[username] = new_user
+        try:
+            password_hash = self._hash_password(password)
+        except PasswordPoolBusy:
+            logger.warning(f"Registro rechazado por saturación del pool de contraseñas: {username}")
+            return False
 
-        # Actualizar users_db
-        self.users_db[username] = new_user
+        # La restricción de clave primaria resuelve registros simultáneos del mismo nombre
+        if not self.store.create(username, password_hash, role):
+            logger.warning(f"Intento de registro con usuario existente: {username}")
+            return False
 
         logger.info(f"Usuario registrado exitosamente: {username}")
         return True
 
-    def create_jwt_token(self, user_info: Dict[str, Any]) -> str:
+    def create_jwt_token(self, user_info: Dict[str, Any], reason: str = 'login') -> str:
         """Crear token JWT para el usuario."""
+        # Import diferido: prometheus_client no debe cargarse al importar `deepagents.auth`
+        from . import monitoring
+
+        now = datetime.utcnow()
         payload = {
             'user': user_info['username'],
             'role': user_info['role'],
-            'iat': datetime.utcnow(),
-            'exp': datetime.utcnow() + timedelta(hours=24)  # 24 horas
+            'iat': now,
+            'exp': now + JWT_LIFETIME  # 24 horas
         }
         token = jwt.encode(payload, self.jwt_secret, algorithm='HS256')
+        monitoring.JWT_ISSUED.labels(reason=reason).inc()
         return token
 
-    def verify_jwt_token(self, token: str) -> Optional[Dict[str, Any]]:
-        """Verificar token JWT y devolver información del usuario."""
+    def _verify(self, token: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """`(exp, usuario)` de un token válido, desde la caché o decodificándolo."""
+        from . import monitoring
+
+        cached = self.token_cache.get(token)
+        if cached is not None:
+            monitoring.JWT_CACHE_HITS.inc()
+            return cached
         try:
             payload = jwt.decode(token, self.jwt_secret, algorithms=['HS256'])
-            return {
-                'username': payload['user'],
-                'role': payload['role']
-            }
         except jwt.ExpiredSignatureError:
+            monitoring.JWT_DECODES.labels(result='expired').inc()
             logger.warning("Token JWT expirado")
             return None
         except jwt.InvalidTokenError:
+            monitoring.JWT_DECODES.labels(result='invalid').inc()
             logger.warning("Token JWT inválido")
             return None
+        monitoring.JWT_DECODES.labels(result='valid').inc()
+        user = {
+            'username': payload['user'],
+            'role': payload['role']
+        }
+        self.token_cache.put(token, float(payload['exp']), user)
+        return float(payload['exp']), user
+
+    def verify_jwt_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """Verificar token JWT y devolver información del usuario."""
+        verified = self._verify(token)
+        return verified[1] if verified else None
+
+    def refresh_jwt_token(self, token: str) -> Optional[str]:
+        """Emitir un token nuevo si `token` es válido y está dentro de la ventana de renovación.
+
+        Devuelve None si el token no es válido o aún no está cerca de expirar.
+        """
+        verified = self._verify(token)
+        if verified is None:
+            return None
+        exp, user = verified
+        if exp - time.time() > JWT_REFRESH_WINDOW.total_seconds():
+            return None
+        self.token_cache.discard(token)
+        return self.create_jwt_token(user, reason='refresh')
 
     def get_current_user(self) -> Optional[Dict[str, Any]]:
-        """Obtener usuario actual desde session state."""
-        if 'auth_token' in st.session_state:
-            return self.verify_jwt_token(st.session_state.auth_token)
-        return None
+        """Obtener usuario actual desde session state (renovando el token cerca de su expiración)."""
+        token = st.session_state.get('auth_token')
+        if not token:
+            return None
+        user = self.verify_jwt_token(token)
+        if user is not None:
+            refreshed = self.refresh_jwt_token(token)
+            if refreshed is not None:
+                st.session_state.auth_token = refreshed
+        return user
 
     def require_auth(self, required_role: Optional[str] = None) -> bool:
         """Verificar que el usuario esté autenticado y tenga el rol requerido."""
@@ -152,6 +256,10 @@ class AuthManager:
             'last_result', 'query_history', 'favorites'
         ]
 
+        token = st.session_state.get('auth_token')
+        if token:
+            self.token_cache.discard(token)
+
         for key in keys_to_remove:
             if key in st.session_state:
                 del st.session_state[key]
@@ -176,7 +284,12 @@ class AuthManager:
             role = st.session_state.persistent_role
 
             # Verificar que el usuario aún existe
-            if username in self.users_db:
+            if username in self.store:
+                # Si la sesión ya tiene un token válido no se emite otro en cada re-ejecución
+                current = self.get_current_user()
+                if current is not None and current['username'] == username:
+                    return st.session_state.get('user_info', current)
+
                 user_info = {
                     'username': username,
                     'role': role,
@@ -185,7 +298,7 @@ class AuthManager:
                 }
 
                 # Crear nuevo token
-                token = self.create_jwt_token(user_info)
+                token = self.create_jwt_token(user_info, reason='restore')
                 st.session_state.auth_token = token
                 st.session_state.user_info = user_info
                 st.session_state.session_start = time.time()
@@ -195,11 +308,28 @@ class AuthManager:
 
         return None
 
-# Instancia global del gestor de autenticación
-auth_manager = AuthManager()
+# Instancia global, creada en el primer uso (lee usuarios de la sesión de Streamlit)
+_auth_manager: Optional[AuthManager] = None
+_auth_manager_lock = threading.Lock()
+
+def get_auth_manager() -> AuthManager:
+    """Obtener el gestor de autenticación global."""
+    global _auth_manager
+    if _auth_manager is None:
+        with _auth_manager_lock:
+            if _auth_manager is None:
+                _auth_manager = AuthManager()
+    return _auth_manager
+
+def __getattr__(name: str):
+    # Compatibilidad: `from .auth import auth_manager` sigue funcionando
+    if name == 'auth_manager':
+        return get_auth_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def login_form() -> bool:
     """Mostrar formulario de login/registro moderno y manejar autenticación."""
+    auth_manager = get_auth_manager()
     st.sidebar.markdown("---")
 
     # Intentar restaurar sesión recordada
@@ -239,8 +369,8 @@ def login_form() -> bool:
         return True
 
     # Estado de autenticación normal
-    if auth_manager.get_current_user():
-        user = auth_manager.get_current_user()
+    user = auth_manager.get_current_user()
+    if user:
         is_restored = user.get('restored', False)
 
         status_icon = "🔄" if is_restored else "✅"
@@ -427,7 +557,7 @@ def require_login(required_role: Optional[str] = None):
     """Decorador para requerir autenticación."""
     def decorator(func):
         def wrapper(*args, **kwargs):
-            if not auth_manager.require_auth(required_role):
+            if not get_auth_manager().require_auth(required_role):
                 st.error("❌ Debe iniciar sesión para acceder a esta funcionalidad")
                 login_form()
                 st.stop()
@@ -0,0 +1,208 @@
+"""
+Instrumentación por llamada al modelo y por herramienta para SOF-IA.
+Un callback handler de LangChain que, adjunto al agente principal, también ve
+las ejecuciones de los subagentes (heredan los callbacks) y exporta histogramas
+Prometheus etiquetados con el nombre del agente o subagente.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from . import monitoring
+from .health import get_dependency
+
+# Clave de metadata con el nombre del agente; los subagentes la fijan en su grafo
+AGENT_NAME_KEY = "lc_agent_name"
+MAIN_AGENT = "main"
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], metadata: Optional[Dict[str, Any]]) -> str:
+    if metadata and metadata.get("ls_model_name"):
+        return str(metadata["ls_model_name"])
+    kwargs = (serialized or {}).get("kwargs", {})
+    return str(kwargs.get("model") or kwargs.get("model_name") or "unknown")
+
+
+def _payload_size(output: Any) -> int:
+    """Tamaño en bytes del resultado de una herramienta (str, ToolMessage o Command)."""
+    update = getattr(output, "update", None)
+    if isinstance(update, dict):
+        return sum(_payload_size(m) for m in update.get("messages", []))
+    content = getattr(output, "content", output)
+    return len(str(content).encode("utf-8", errors="ignore"))
+
+
+def _usage(response) -> Dict[str, int]:
+    """Tokens de entrada/salida de un `LLMResult`, si el proveedor los informa."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return {
+            "input_tokens": token_usage.get("prompt_tokens", 0),
+            "output_tokens": token_usage.get("completion_tokens", 0),
+        }
+    return {}
+
+
+class AgentMetricsCallbackHandler(BaseCallbackHandler):
+    """Exporta latencias, tokens y pasos de los agentes a Prometheus.
+
+    Los pasos por ejecución se cuentan por cada ejecución de agente: la raíz
+    de la traza o cualquier ejecución cuyo nombre de agente difiere del de su padre
+    (p. ej. un subagente lanzado por la herramienta `task`).
+
+    Una ejecución cancelada (plazo de un subagente, trabajo cancelado) no recibe
+    su `*_end` ni su `*_error`: al terminar cualquier ejecución se descartan las
+    descendientes que sigan abiertas, y sus herramientas cuentan como `error`.
+    """
+
+    # Las métricas se registran en el mismo hilo del evento (sin executor), para no
+    # distorsionar el tiempo hasta el primer token
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+        self._children: Dict[UUID, Set[UUID]] = {}
+        self._agents: Dict[UUID, str] = {}
+        self._agent_steps: Dict[UUID, int] = {}
+        self._llm_calls: Dict[UUID, Dict[str, Any]] = {}
+        self._tool_calls: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start_run(self, run_id: UUID, parent_run_id: Optional[UUID],
+                   metadata: Optional[Dict[str, Any]]) -> str:
+        with self._lock:
+            parent_agent = self._agents.get(parent_run_id) if parent_run_id else None
+            agent = (metadata or {}).get(AGENT_NAME_KEY) or parent_agent or MAIN_AGENT
+            self._parents[run_id] = parent_run_id
+            if parent_run_id is not None:
+                self._children.setdefault(parent_run_id, set()).add(run_id)
+            self._agents[run_id] = agent
+            return agent
+
+    def _agent_run(self, run_id: UUID) -> Optional[UUID]:
+        """Ejecución de agente que contiene a `run_id` (se llama con el lock tomado)."""
+        while run_id is not None and run_id not in self._agent_steps:
+            run_id = self._parents.get(run_id)
+        return run_id
+
+    def _pop_run(self, run_id: UUID):
+        """Olvidar una ejecución; devuelve `(agente, pasos)` (se llama con el lock tomado)."""
+        parent = self._parents.pop(run_id, None)
+        siblings = self._children.get(parent)
+        if siblings is not None:
+            siblings.discard(run_id)
+            if not siblings:
+                del self._children[parent]
+        return self._agents.pop(run_id, MAIN_AGENT), self._agent_steps.pop(run_id, None)
+
+    def _end_run(self, run_id: UUID):
+        with self._lock:
+            finished = [(self._pop_run(run_id), None)]
+            pending = list(self._children.pop(run_id, ()))
+            while pending:
+                child = pending.pop()
+                pending.extend(self._children.pop(child, ()))
+                self._llm_calls.pop(child, None)
+                finished.append((self._pop_run(child), self._tool_calls.pop(child, None)))
+        now = time.perf_counter()
+        for (agent, steps), tool_call in finished:
+            if steps:
+                monitoring.AGENT_STEPS.labels(agent=agent).observe(steps)
+            if tool_call is not None:
+                monitoring.TOOL_LATENCY.labels(
+                    agent=tool_call['agent'], tool=tool_call['tool'], status='error'
+                ).observe(now - tool_call['start'])
+
+    # Cadenas (grafos y nodos)
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        agent = self._start_run(run_id, parent_run_id, metadata)
+        with self._lock:
+            parent_agent = self._agents.get(parent_run_id) if parent_run_id else None
+            if parent_run_id is None or parent_agent != agent:
+                self._agent_steps[run_id] = 0
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_run(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_run(run_id)
+
+    # Modelo
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        agent = self._start_run(run_id, parent_run_id, metadata)
+        with self._lock:
+            agent_run = self._agent_run(parent_run_id)
+            if agent_run is not None:
+                self._agent_steps[agent_run] += 1
+            self._llm_calls[run_id] = {
+                'agent': agent,
+                'model': _model_name(serialized, metadata),
+                'start': time.perf_counter(),
+                'first_token': None,
+            }
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, [], run_id=run_id, parent_run_id=parent_run_id, metadata=metadata)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._llm_calls.get(run_id)
+        if call is not None and call['first_token'] is None:
+            call['first_token'] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._llm_calls.pop(run_id, None)
+        self._end_run(run_id)
+        get_dependency('model').record_success()
+        if call is None:
+            return
+        labels = {'agent': call['agent'], 'model': call['model']}
+        end = time.perf_counter()
+        monitoring.LLM_LATENCY.labels(**labels).observe(end - call['start'])
+        # Sin streaming, el primer token llega con la respuesta completa
+        monitoring.LLM_TTFT.labels(**labels).observe((call['first_token'] or end) - call['start'])
+        usage = _usage(response)
+        if usage:
+            monitoring.LLM_INPUT_TOKENS.labels(**labels).observe(usage.get('input_tokens', 0))
+            monitoring.LLM_OUTPUT_TOKENS.labels(**labels).observe(usage.get('output_tokens', 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            call = self._llm_calls.pop(run_id, None)
+        self._end_run(run_id)
+        get_dependency('model').record_failure(error)
+        if call is not None:
+            monitoring.LLM_LATENCY.labels(agent=call['agent'], model=call['model']).observe(
+                time.perf_counter() - call['start'])
+
+    # Herramientas
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        agent = self._start_run(run_id, parent_run_id, metadata)
+        name = kwargs.get('name') or (serialized or {}).get('name') or 'unknown'
+        with self._lock:
+            self._tool_calls[run_id] = {'agent': agent, 'tool': name, 'start': time.perf_counter()}
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish_tool(run_id, 'success', output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish_tool(run_id, 'error', None)
+
+    def _finish_tool(self, run_id: UUID, status: str, output: Any):
+        with self._lock:
+            call = self._tool_calls.pop(run_id, None)
+        self._end_run(run_id)
+        if call is None:
+            return
+        monitoring.TOOL_LATENCY.labels(agent=call['agent'], tool=call['tool'], status=status).observe(
+            time.perf_counter() - call['start'])
+        if output is not None:
+            monitoring.TOOL_PAYLOAD.labels(agent=call['agent'], tool=call['tool']).observe(_payload_size(output))
@@ -0,0 +1,472 @@
+"""Durable local checkpointing for deep agents.
+
+`SQLiteSaver` persists LangGraph checkpoints in a SQLite database so a thread
+survives process restarts. It follows the storage layout of LangGraph's
+`InMemorySaver`: each checkpoint only records channel *versions*, and channel
+values are stored as separate blobs keyed by `(channel, version)`. A step
+therefore only writes the channels it changed, not a full copy of the state.
+
+Pending writes from tasks that finished before a crash are stored as well, so
+resuming an interrupted run (`agent.invoke(None, config)`) re-executes only the
+work that had not completed.
+
+The async methods run the same SQLite work in a worker thread
+(`asyncio.to_thread`), so a slow commit or a large checkpoint does not stall
+the event loop that all agent runs share. Calls are still serialized by the
+saver's lock.
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.constants import TASKS
+
+from .file_store import find_refs
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS checkpoints (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL,
+        checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT,
+        type TEXT NOT NULL,
+        checkpoint BLOB NOT NULL,
+        metadata_type TEXT NOT NULL,
+        metadata BLOB NOT NULL,
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS blobs (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL,
+        channel TEXT NOT NULL,
+        version TEXT NOT NULL,
+        type TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+    )""",
+    """CREATE TABLE IF NOT EXISTS writes (
+        thread_id TEXT NOT NULL,
+        checkpoint_ns TEXT NOT NULL,
+        checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        type TEXT NOT NULL,
+        data BLOB NOT NULL,
+        task_path TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+    )""",
+)
+
+
+def thread_config(user_id: str, thread_id: str, **configurable: Any) -> RunnableConfig:
+    """Build the run config for a user's conversation thread.
+
+    Threads are namespaced by user so two users can never read or resume each
+    other's checkpoints, even if their thread IDs collide.
+    """
+    return {"configurable": {"thread_id": f"{user_id}:{thread_id}", **configurable}}
+
+
+def has_unfinished_run(agent, config: RunnableConfig) -> bool:
+    """Return whether the thread's last run stopped before reaching the end.
+
+    Such a run can be resumed from its last completed step with
+    `agent.invoke(None, config)` (or by streaming `None` as the input).
+
+    Equivalent to `bool(agent.get_state(config).next)`, but only reads the
+    latest checkpoint's channel versions: with `SQLiteSaver` no channel value is
+    deserialized, so it is cheap enough to call on every page load.
+    """
+    checkpointer = agent.checkpointer
+    if isinstance(checkpointer, SQLiteSaver):
+        latest = checkpointer.get_versions(config)
+    else:
+        saved = checkpointer.get_tuple(config)
+        latest = saved and (
+            saved.checkpoint,
+            {c for c, v in saved.checkpoint["channel_values"].items() if c != TASKS or v},
+        )
+    if not latest:
+        return False
+    checkpoint, available = latest
+    # Pending `Send` packets run as tasks of their own in the next step
+    if TASKS in available:
+        return True
+    versions = checkpoint["channel_versions"]
+    null_version = type(next(iter(versions.values()), ""))()
+    for name, node in agent.nodes.items():
+        seen = checkpoint["versions_seen"].get(name)
+        for channel in node.triggers:
+            if channel in available and (
+                seen is None or versions.get(channel, null_version) > seen.get(channel, null_version)
+            ):
+                return True
+    return False
+
+
+class SQLiteSaver(BaseCheckpointSaver[str]):
+    """A checkpoint saver that stores checkpoints in a local SQLite database.
+
+    Safe to share between threads; writes are committed per step, so an
+    interrupted run can be resumed by a new process pointing at the same file.
+
+    Args:
+        path: Path of the database file (`":memory:"` for a throwaway store).
+        serde: The serializer to use for checkpoints and channel values.
+
+    Example:
+        ```python
+        checkpointer = SQLiteSaver("checkpoints.sqlite3")
+        agent = create_deep_agent(tools, instructions, checkpointer=checkpointer)
+        config = thread_config("alice", "report-1")
+        agent.invoke({"messages": [...]}, config)
+        ```
+    """
+
+    def __init__(self, path: str, *, serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                "SELECT type, data FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        rows = self._conn.execute(
+            "SELECT task_id, idx, channel, type, data, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        rows.sort(key=lambda r: writes_sort_key(r[5], r[0], r[1]))
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, data)))
+            for task_id, _, channel, type_, data, _ in rows
+        ]
+
+    def _make_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        checkpoint_: Checkpoint = self.serde.loads_typed((type_, checkpoint))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint_,
+                "channel_values": self._load_blobs(
+                    thread_id, checkpoint_ns, checkpoint_["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def _select_checkpoint(self, config: RunnableConfig):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = (
+            "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            return self._conn.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? "
+                "AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchone()
+        return self._conn.execute(
+            f"SELECT {columns} FROM checkpoints WHERE thread_id = ? "
+            "AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+            (thread_id, checkpoint_ns),
+        ).fetchone()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the checkpoint for `config`, or the thread's latest one if no ID is given."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            row = self._select_checkpoint(config)
+            if row is None:
+                return None
+            return self._make_tuple(thread_id, checkpoint_ns, row)
+
+    def get_versions(self, config: RunnableConfig) -> Optional[tuple[Checkpoint, set[str]]]:
+        """Like `get_tuple`, but without loading channel values or pending writes.
+
+        Returns the checkpoint (with empty `channel_values`) and the set of
+        channels that hold a value, or None if the thread has no checkpoint. The
+        `Send` packets channel only counts when it has pending packets.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            row = self._select_checkpoint(config)
+            if row is None:
+                return None
+            checkpoint: Checkpoint = {
+                **self.serde.loads_typed((row[2], row[3])),
+                "channel_values": {},
+            }
+            available = set()
+            for channel, version in checkpoint["channel_versions"].items():
+                stored = self._conn.execute(
+                    "SELECT type FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, str(version)),
+                ).fetchone()
+                if stored is None or stored[0] == "empty":
+                    continue
+                if channel == TASKS and not self._load_blobs(
+                    thread_id, checkpoint_ns, {channel: version}
+                ).get(channel):
+                    continue
+                available.add(channel)
+        return checkpoint, available
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first, optionally filtered by thread, metadata or age."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            tuples = []
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[4], row[5]))
+                    if not all(metadata.get(k) == v for k, v in filter.items()):
+                        continue
+                tuples.append(self._make_tuple(thread_id, checkpoint_ns, row))
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, storing values only for the channels in `new_versions`."""
+        c = checkpoint.copy()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        values: dict[str, Any] = c.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, data = (
+                self.serde.dumps_typed(values[channel])
+                if channel in values
+                else ("empty", b"")
+            )
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, data))
+        type_, serialized = self.serde.dumps_typed(c)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, "
+                "type, data) VALUES (?, ?, ?, ?, ?, ?)",
+                blobs,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                "parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized,
+                    metadata_type,
+                    serialized_metadata,
+                ),
+            )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save the writes of a finished task against the checkpoint it ran from."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, data = self.serde.dumps_typed(value)
+            rows.append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, data, task_path)
+            )
+        # Regular writes are immutable once stored; special writes (errors,
+        # interrupts) replace the previous value.
+        verb = "INSERT OR REPLACE" if all(row[4] < 0 for row in rows) else "INSERT OR IGNORE"
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                "channel, type, data, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints, writes and blobs of a thread."""
+        with self._lock, self._conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def file_refs(self) -> set[str]:
+        """Return the file store references held by any stored checkpoint or write.
+
+        Pass the result to `FileStore.collect_garbage` to drop file contents that
+        no thread can reach anymore.
+        """
+        refs: set[str] = set()
+        with self._lock:
+            for table in ("blobs", "writes"):
+                for (data,) in self._conn.execute(f"SELECT data FROM {table} WHERE data IS NOT NULL"):
+                    refs |= find_refs(data)
+        return refs
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Asynchronous version of `get_tuple`."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Asynchronous version of `list`."""
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Asynchronous version of `put`."""
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Asynchronous version of `put_writes`."""
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Asynchronous version of `delete_thread`."""
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
@@ -0,0 +1,189 @@
+"""Token-budgeted compaction of the message history sent to the model.
+
+Deep agent runs accumulate every search payload, file write and todo update in
+`messages`. The compaction hook runs before each model call and, only when the
+history exceeds its token budget, builds a smaller view of it for that call:
+
+1. Leading system messages, the original user request, the latest user
+   message (the question of the current run in multi-turn threads) and the
+   most recent messages are kept verbatim.
+2. Older tool results and large tool-call arguments are collapsed into short
+   digests.
+3. If that is still not enough, the oldest turns are dropped whole (an AI
+   message together with its tool results) until the history fits.
+
+The graph state itself is never modified: the hook returns the compacted view
+as `llm_input_messages`, so checkpoints and the final result keep the full
+history.
+"""
+
+from typing import Any, Callable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from typing_extensions import TypedDict
+
+TokenCounter = Callable[[Sequence[AnyMessage]], int]
+
+
+class CompactionStats(TypedDict):
+    """Outcome of compacting one model input."""
+
+    agent: str
+    tokens_before: int
+    tokens_after: int
+    ratio: float
+    messages_before: int
+    messages_after: int
+    digested: int
+    dropped: int
+
+
+def _digest(text: str, max_chars: int) -> str:
+    return f"{text[:max_chars]}... [{len(text) - max_chars} characters omitted]"
+
+
+def _digest_message(message: AnyMessage, max_chars: int) -> Optional[AnyMessage]:
+    """Return a digested copy of an old message, or None if it is already short."""
+    if isinstance(message, ToolMessage):
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if len(content) <= max_chars:
+            return None
+        return message.model_copy(update={"content": _digest(content, max_chars)})
+    if isinstance(message, AIMessage) and message.tool_calls:
+        changed = False
+        tool_calls = []
+        for tool_call in message.tool_calls:
+            args = {}
+            for key, value in tool_call["args"].items():
+                if isinstance(value, str) and len(value) > max_chars:
+                    value = _digest(value, max_chars)
+                    changed = True
+                args[key] = value
+            tool_calls.append({**tool_call, "args": args})
+        if not changed:
+            return None
+        return message.model_copy(update={"tool_calls": tool_calls})
+    return None
+
+
+def _turns(messages: Sequence[AnyMessage]) -> list[list[int]]:
+    """Group message indexes so an AI message stays with its tool results."""
+    turns: list[list[int]] = []
+    for i, message in enumerate(messages):
+        if isinstance(message, ToolMessage) and turns:
+            turns[-1].append(i)
+        else:
+            turns.append([i])
+    return turns
+
+
+def compact_messages(
+    messages: Sequence[AnyMessage],
+    max_tokens: int,
+    keep_last: int = 6,
+    digest_chars: int = 400,
+    token_counter: TokenCounter = count_tokens_approximately,
+    agent: str = "main",
+) -> tuple[list[AnyMessage], CompactionStats]:
+    """Fit `messages` into `max_tokens`, returning the compacted list and stats.
+
+    Args:
+        messages: The full message history.
+        max_tokens: Token budget for the history (excluding the system prompt
+            added by the agent).
+        keep_last: Number of most recent messages that are never altered.
+        digest_chars: Characters kept from each collapsed tool result or argument.
+        token_counter: Counts the tokens of a list of messages.
+        agent: Name reported in the stats.
+    """
+    messages = list(messages)
+    counts = [token_counter([m]) for m in messages]
+    tokens_before = sum(counts)
+    stats: CompactionStats = {
+        "agent": agent,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+        "ratio": 1.0,
+        "messages_before": len(messages),
+        "messages_after": len(messages),
+        "digested": 0,
+        "dropped": 0,
+    }
+    if tokens_before <= max_tokens:
+        return messages, stats
+
+    # Pin leading system messages and the original request
+    pinned = 0
+    while pinned < len(messages) and isinstance(messages[pinned], SystemMessage):
+        pinned += 1
+    if pinned < len(messages) and isinstance(messages[pinned], HumanMessage):
+        pinned += 1
+
+    # In multi-turn threads, also pin the question the current run is answering
+    latest = next(
+        (i for i in range(len(messages) - 1, pinned - 1, -1) if isinstance(messages[i], HumanMessage)),
+        None,
+    )
+
+    # The recent window must not start with tool results cut off from their call
+    cut = max(pinned, len(messages) - keep_last)
+    while cut > pinned and isinstance(messages[cut], ToolMessage):
+        cut -= 1
+
+    for i in range(pinned, cut):
+        digested = _digest_message(messages[i], digest_chars)
+        if digested is not None:
+            messages[i] = digested
+            counts[i] = token_counter([digested])
+            stats["digested"] += 1
+
+    total = sum(counts)
+    old_turns = _turns(messages[pinned:cut])
+    dropped: set[int] = set()
+    for turn in old_turns:
+        if total <= max_tokens:
+            break
+        if pinned + turn[0] == latest:
+            continue
+        for i in turn:
+            dropped.add(pinned + i)
+            total -= counts[pinned + i]
+    if dropped:
+        messages = [m for i, m in enumerate(messages) if i not in dropped]
+        stats["dropped"] = len(dropped)
+
+    stats["tokens_after"] = total
+    stats["ratio"] = total / tokens_before if tokens_before else 1.0
+    stats["messages_after"] = len(messages)
+    return messages, stats
+
+
+def create_compaction_hook(
+    max_tokens: int,
+    keep_last: int = 6,
+    digest_chars: int = 400,
+    token_counter: TokenCounter = count_tokens_approximately,
+    on_compact: Optional[Callable[[CompactionStats], Any]] = None,
+    agent: str = "main",
+) -> Callable[[dict], dict]:
+    """Create a `pre_model_hook` that compacts the history sent to the model.
+
+    `on_compact` is called with the `CompactionStats` of every model call that
+    needed compaction, e.g. to export compaction ratios as metrics.
+    """
+
+    def compaction_hook(state: dict) -> dict:
+        messages, stats = compact_messages(
+            state["messages"],
+            max_tokens,
+            keep_last=keep_last,
+            digest_chars=digest_chars,
+            token_counter=token_counter,
+            agent=agent,
+        )
+        if on_compact is not None and stats["tokens_after"] < stats["tokens_before"]:
+            on_compact(stats)
+        return {"llm_input_messages": messages}
+
+    return compaction_hook
@@ -1,40 +1,46 @@
 """
 Configuración segura para SOF-IA con encriptación de claves sensibles.
+La derivación de la clave (PBKDF2) y la instancia global se crean en el primer
+uso, no al importar el módulo.
 """
 import os
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from typing import Optional
+import hashlib
+import hmac
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
 import logging
 
-# Configurar logging seguro
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('sofia_secure.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from .log_pipeline import install_log_pipeline
 
-class SecureConfig:
-    """Gestor de configuración segura con encriptación."""
+if TYPE_CHECKING:
+    from cryptography.fernet import Fernet
 
-    def __init__(self, master_key: Optional[str] = None):
-        self.master_key = master_key or os.getenv('SOFIA_MASTER_KEY')
-        if not self.master_key:
-            logger.warning("No se encontro SOFIA_MASTER_KEY. Generando una nueva...")
-            self.master_key = base64.urlsafe_b64encode(os.urandom(32)).decode()
-            logger.info("Nueva master key generada. Guardela de forma segura.")
+# Configurar logging seguro: archivo rotado + consola, escritos por un hilo de fondo
+install_log_pipeline()
 
-        self._cipher = self._create_cipher()
+logger = logging.getLogger(__name__)
+
+# Derivación de claves memoizada: PBKDF2 se ejecuta una vez por master key y proceso.
+# Solo se guarda la de la master key en uso, identificada por su SHA-256 (nunca en claro)
+_derived_key: Optional[Tuple[bytes, bytes]] = None
+_derived_keys_lock = threading.Lock()
+
+def _derive_key(master_key: str) -> bytes:
+    """Derivar (una sola vez) la clave Fernet de una master key usando PBKDF2."""
+    global _derived_key
+    digest = hashlib.sha256(master_key.encode()).digest()
+    cached = _derived_key
+    if cached is not None and hmac.compare_digest(cached[0], digest):
+        return cached[1]
+    with _derived_keys_lock:
+        cached = _derived_key
+        if cached is not None and hmac.compare_digest(cached[0], digest):
+            return cached[1]
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
-    def _create_cipher(self) -> Fernet:
-        """Crear cipher para encriptación."""
-        # Derivar clave usando PBKDF2
         salt = b'sofia_salt_2024'  # En producción, usar salt aleatorio
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
@@ -42,8 +48,64 @@ class SecureConfig:
             salt=salt,
             iterations=100000,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(self.master_key.encode()))
-        return Fernet(key)
+        key = base64.urlsafe_b64encode(kdf.derive(master_key.encode()))
+        _derived_key = (digest, key)
+    return key
+
+class SecureConfig:
+    """Gestor de configuración segura con encriptación.
+
+    Las API keys descifradas se memorizan por servicio y por valor de las variables
+    de entorno (un cambio en el entorno invalida la entrada), opcionalmente con
+    un TTL en segundos (`secret_ttl` o `SOFIA_SECRET_TTL`). `reload()` descarta
+    la caché y vuelve a leer la master key del entorno.
+    """
+
+    def __init__(self, master_key: Optional[str] = None, secret_ttl: Optional[float] = None):
+        self._explicit_master_key = master_key
+        if secret_ttl is None and os.getenv('SOFIA_SECRET_TTL'):
+            secret_ttl = float(os.getenv('SOFIA_SECRET_TTL'))
+        self.secret_ttl = secret_ttl
+        self._secrets: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._load_master_key()
+
+    def _load_master_key(self):
+        self._env_master_key = os.getenv('SOFIA_MASTER_KEY')
+        self.master_key = self._explicit_master_key or self._env_master_key
+        if not self.master_key:
+            logger.warning("No se encontro SOFIA_MASTER_KEY. Generando una nueva...")
+            self.master_key = base64.urlsafe_b64encode(os.urandom(32)).decode()
+            logger.info("Nueva master key generada. Guardela de forma segura.")
+
+        self._cipher_instance: Optional["Fernet"] = None
+
+    def master_key_changed(self) -> bool:
+        """Indica si `SOFIA_MASTER_KEY` cambió desde que se leyó (si no se pasó explícita)."""
+        return self._explicit_master_key is None and os.getenv('SOFIA_MASTER_KEY') != self._env_master_key
+
+    def reload(self):
+        """Descartar los secretos memorizados y releer la master key del entorno."""
+        with self._lock:
+            self._secrets.clear()
+            if self._explicit_master_key is None and os.getenv('SOFIA_MASTER_KEY'):
+                self._load_master_key()
+            else:
+                self._env_master_key = os.getenv('SOFIA_MASTER_KEY')
+        logger.info("Configuración segura recargada")
+
+    @property
+    def _cipher(self) -> "Fernet":
+        """Cipher derivado de la master key, creado en el primer uso."""
+        if self._cipher_instance is None:
+            self._cipher_instance = self._create_cipher()
+        return self._cipher_instance
+
+    def _create_cipher(self) -> "Fernet":
+        """Crear cipher para encriptación."""
+        from cryptography.fernet import Fernet
+
+        return Fernet(_derive_key(self.master_key))
 
     def encrypt_value(self, value: str) -> str:
         """Encriptar un valor sensible."""
@@ -72,10 +134,26 @@ class SecureConfig:
         return default
 
     def get_secure_api_key(self, service: str) -> str:
-        """Obtener API key de forma segura."""
+        """Obtener API key de forma segura (memorizada hasta que cambie el entorno o expire)."""
         env_key = f"{service.upper()}_API_KEY"
         encrypted_key = f"{service.upper()}_API_KEY_ENCRYPTED"
-
+        cache_key = (service, os.getenv(encrypted_key), os.getenv(env_key))
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._secrets.get(cache_key)
+        if cached is not None and (self.secret_ttl is None or now - cached[0] < self.secret_ttl):
+            return cached[1]
+
+        api_key = self._load_api_key(service, env_key, encrypted_key)
+        with self._lock:
+            # Solo se conserva el valor vigente de cada servicio
+            for key in [k for k in self._secrets if k[0] == service]:
+                del self._secrets[key]
+            self._secrets[cache_key] = (now, api_key)
+        return api_key
+
+    def _load_api_key(self, service: str, env_key: str, encrypted_key: str) -> str:
         # Primero intentar variable encriptada
         api_key = self.get_encrypted_env_var(encrypted_key)
         if api_key:
@@ -91,28 +169,61 @@ class SecureConfig:
         logger.error(f"No se encontró API key para {service}")
         return ""
 
-# Instancia global de configuración segura
-secure_config = SecureConfig()
+# Instancia global de configuración segura, creada en el primer uso
+_secure_config: Optional[SecureConfig] = None
+_secure_config_lock = threading.Lock()
+
+def get_secure_config() -> SecureConfig:
+    """Obtener la instancia global de configuración segura.
+
+    Si `SOFIA_MASTER_KEY` cambió desde que se creó, se recarga.
+    """
+    global _secure_config
+    if _secure_config is None:
+        with _secure_config_lock:
+            if _secure_config is None:
+                _secure_config = SecureConfig()
+    elif _secure_config.master_key_changed():
+        _secure_config.reload()
+    return _secure_config
+
+def reload_secure_config():
+    """Recargar la configuración segura (p. ej. tras rotar variables de entorno)."""
+    get_secure_config().reload()
+
+def __getattr__(name: str):
+    # Compatibilidad: `from .config import secure_config` sigue funcionando
+    if name == 'secure_config':
+        return get_secure_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Funciones de conveniencia
 def get_gemini_api_key() -> str:
     """Obtener API key de Gemini de forma segura."""
-    return secure_config.get_secure_api_key('gemini') or secure_config.get_secure_api_key('google')
+    config = get_secure_config()
+    return config.get_secure_api_key('gemini') or config.get_secure_api_key('google')
 
 def get_tavily_api_key() -> str:
     """Obtener API key de Tavily de forma segura."""
-    return secure_config.get_secure_api_key('tavily')
+    return get_secure_config().get_secure_api_key('tavily')
 
 def get_master_key() -> str:
     """Obtener la master key (solo para debugging)."""
-    return secure_config.master_key
+    return get_secure_config().master_key
 
 # Validación de configuración
+_last_validation: Optional[Tuple[str, ...]] = None
+
 def validate_configuration() -> bool:
-    """Validar que la configuración sea segura."""
+    """Validar que la configuración sea segura.
+
+    Se llama en cada re-ejecución de Streamlit: solo se registra en el log
+    cuando el resultado cambia.
+    """
+    global _last_validation
     issues = []
 
-    if not secure_config.master_key:
+    if not get_secure_config().master_key:
         issues.append("SOFIA_MASTER_KEY no configurada")
 
     gemini_key = get_gemini_api_key()
@@ -123,10 +234,15 @@ def validate_configuration() -> bool:
     if not tavily_key:
         issues.append("TAVILY_API_KEY no encontrada")
 
+    changed = tuple(issues) != _last_validation
+    _last_validation = tuple(issues)
+
     if issues:
-        for issue in issues:
-            logger.error(f"Problema de configuración: {issue}")
+        if changed:
+            for issue in issues:
+                logger.error(f"Problema de configuración: {issue}")
         return False
 
-    logger.info("Configuración validada correctamente")
-    return True
\ No newline at end of file
+    if changed:
+        logger.info("Configuración validada correctamente")
+    return True
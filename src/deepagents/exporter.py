@@ -0,0 +1,133 @@
+"""
+Exportador de métricas y salud para SOF-IA, independiente de Streamlit.
+Servidor HTTP en un hilo de fondo con `/metrics` (Prometheus), `/stats` (JSON de
+`get_stats()`), `/healthz` (vivacidad) y `/readyz` (disponibilidad: colas, caché
+y dependencias). Se arranca una sola vez por proceso aunque Streamlit re-ejecute
+el script; también puede lanzarse como proceso aparte:
+
+    python -m deepagents.exporter --port 9100
+
+En modo multiproceso (`PROMETHEUS_MULTIPROC_DIR`) ese proceso aparte sirve las
+métricas agregadas de todos los workers.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from .health import readiness
+from .monitoring import configure_logging, metrics, metrics_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9100
+_started_at = time.time()
+
+
+class ExporterHandler(BaseHTTPRequestHandler):
+    """Atiende los endpoints del exportador."""
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/') or '/'
+        try:
+            if path == '/metrics':
+                self._send(200, generate_latest(metrics_registry()), CONTENT_TYPE_LATEST)
+            elif path == '/stats':
+                self._send_json(200, metrics.get_stats())
+            elif path == '/healthz':
+                self._send_json(200, {'status': 'ok', 'pid': os.getpid(),
+                                      'uptime_seconds': time.time() - _started_at})
+            elif path == '/readyz':
+                report = readiness()
+                self._send_json(200 if report['ready'] else 503, report)
+            else:
+                self._send_json(404, {'error': 'not found'})
+        except Exception as e:
+            logger.exception("Error en el exportador de métricas")
+            self._send_json(500, {'error': str(e)})
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        self._send(status, json.dumps(payload, default=str).encode(), 'application/json')
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Los sondeos del balanceador son frecuentes: no ensuciar stderr
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_exporter(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """Arrancar el exportador en un hilo de fondo (idempotente por proceso).
+
+    Devuelve el servidor, o None si está desactivado (`SOFIA_EXPORTER_PORT=off`)
+    o el puerto ya está ocupado (p. ej. por otro worker de la misma máquina).
+    """
+    global _server
+    if _server is not None:
+        return _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        if port is None:
+            configured = os.getenv('SOFIA_EXPORTER_PORT', str(DEFAULT_PORT)).lower()
+            if configured in ('', 'off', 'false', '0'):
+                return None
+            port = int(configured)
+        host = host if host is not None else os.getenv('SOFIA_EXPORTER_HOST', '0.0.0.0')
+        try:
+            server = ThreadingHTTPServer((host, port), ExporterHandler)
+        except OSError as e:
+            logger.warning(f"No se pudo iniciar el exportador en {host}:{port}: {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='sofia-exporter', daemon=True).start()
+        logger.info(f"Exportador de métricas escuchando en {host}:{server.server_address[1]}")
+        _server = server
+        return server
+
+
+def stop_exporter():
+    """Detener el exportador si está en marcha."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportador de métricas y salud de SOF-IA")
+    parser.add_argument('--host', default=os.getenv('SOFIA_EXPORTER_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SOFIA_EXPORTER_PORT', str(DEFAULT_PORT))))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    configure_logging()
+    server = ThreadingHTTPServer((args.host, args.port), ExporterHandler)
+    logger.info(f"Exportador de métricas escuchando en {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Content-addressed, deduplicated storage for the virtual filesystem.
+
+When a file store is configured, `DeepAgentState.files` maps each path to a short
+reference (`cas:sha256:<digest>`) instead of the full file content. The content
+lives once in the store, split into content-defined chunks so that drafts of
+the same report share most of their chunks. `read_file`, `edit_file` and the
+other file tools resolve references transparently.
+
+A store is selected per run through `config["configurable"]["file_store"]`
+(which `create_deep_agent(file_store=...)` sets), falling back to the
+process-wide default set with `set_default_file_store`.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional, Union
+
+REF_PREFIX = "cas:sha256:"
+_REF_PATTERN = re.compile(r"cas:sha256:[0-9a-f]{64}")
+_REF_BYTES_PATTERN = re.compile(rb"cas:sha256:[0-9a-f]{64}")
+
+# Content-defined chunking parameters: chunks end on a segment boundary once they
+# are at least MIN_CHUNK bytes and the segment's checksum hits the mask, and are
+# cut at exactly MAX_CHUNK bytes otherwise. Segments are lines; lines longer than
+# MIN_CHUNK (minified JSON, scraped HTML) are further split after punctuation or
+# spaces. Edits therefore only change the chunks around them.
+MIN_CHUNK = 1024
+MAX_CHUNK = 64 * 1024
+_BOUNDARY_MASK = 0x7
+_SOFT_BREAK = re.compile(rb"[,;:>})\] ]")
+
+
+def is_ref(value) -> bool:
+    """Return whether `value` is a file store reference."""
+    return isinstance(value, str) and _REF_PATTERN.fullmatch(value) is not None
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _segments(data: bytes) -> Iterator[bytes]:
+    for line in data.splitlines(keepends=True):
+        if len(line) <= MIN_CHUNK:
+            yield line
+            continue
+        start = 0
+        for match in _SOFT_BREAK.finditer(line):
+            yield line[start : match.end()]
+            start = match.end()
+        if start < len(line):
+            yield line[start:]
+
+
+def _chunk(data: bytes) -> Iterable[bytes]:
+    start = 0
+    size = 0
+    for segment in _segments(data):
+        size += len(segment)
+        # Content without any break point (e.g. base64) falls back to fixed-size cuts
+        while size >= MAX_CHUNK:
+            yield data[start : start + MAX_CHUNK]
+            start += MAX_CHUNK
+            size -= MAX_CHUNK
+        if size >= MIN_CHUNK and zlib.crc32(segment) & _BOUNDARY_MASK == 0:
+            yield data[start : start + size]
+            start += size
+            size = 0
+    if size:
+        yield data[start : start + size]
+
+
+def find_refs(data: Union[str, bytes]) -> set[str]:
+    """Return every file store reference that appears in `data` (e.g. a serialized checkpoint)."""
+    if isinstance(data, str):
+        return set(_REF_PATTERN.findall(data))
+    return {ref.decode() for ref in _REF_BYTES_PATTERN.findall(data)}
+
+
+class FileStore(ABC):
+    """Content-addressed blob store with chunk-level deduplication.
+
+    Subclasses only need to persist chunks and blob manifests; chunking,
+    hashing, compression and decoding are shared.
+
+    Args:
+        compress: Compress chunks with zlib before storing them.
+        cache_size: Number of decoded blobs kept in memory. Returning the same
+            `str` object for repeated reads keeps per-content caches (such as the
+            `read_file` line index) effective.
+    """
+
+    def __init__(self, compress: bool = False, cache_size: int = 64):
+        self.compress = compress
+        self.cache_size = cache_size
+        self._decoded: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _has_blob(self, digest: str) -> bool:
+        """Return whether the manifest for `digest` is stored."""
+
+    @abstractmethod
+    def _put_blob(self, digest: str, chunks: list[tuple[str, bytes]]) -> None:
+        """Store a blob manifest and any chunks not stored yet."""
+
+    @abstractmethod
+    def _get_blob(self, digest: str) -> Optional[list[bytes]]:
+        """Return the stored chunk payloads of a blob, in order."""
+
+    @abstractmethod
+    def _touch_blob(self, digest: str) -> None:
+        """Mark an existing blob as just written, so garbage collection keeps it."""
+
+    @abstractmethod
+    def _delete_unreferenced(self, live: set[str], written_before: float) -> tuple[int, int]:
+        """Delete blobs not in `live` written before `written_before`, then orphaned chunks.
+
+        Returns the number of blobs and chunks deleted.
+        """
+
+    def put(self, content: str) -> str:
+        """Store `content` and return its reference."""
+        data = content.encode()
+        digest = _digest(data)
+        with self._lock:
+            if not self._has_blob(digest):
+                chunks = []
+                for chunk in _chunk(data):
+                    payload = zlib.compress(chunk) if self.compress else chunk
+                    chunks.append((_digest(chunk), payload))
+                self._put_blob(digest, chunks)
+            else:
+                self._touch_blob(digest)
+            self._remember(digest, content)
+        return REF_PREFIX + digest
+
+    def collect_garbage(self, live_refs: Iterable[str], min_age: float = 3600.0) -> dict:
+        """Delete blobs not in `live_refs`, and the chunks only they used.
+
+        `live_refs` are the references still reachable, e.g.
+        `SQLiteSaver.file_refs()` for a store used with that checkpointer. Blobs
+        written in the last `min_age` seconds are kept, since a run in progress
+        may hold references that are not checkpointed yet.
+        """
+        live = {ref[len(REF_PREFIX) :] for ref in live_refs if is_ref(ref)}
+        with self._lock:
+            blobs, chunks = self._delete_unreferenced(live, time.time() - min_age)
+            for digest in [d for d in self._decoded if d not in live]:
+                del self._decoded[digest]
+        return {"blobs_deleted": blobs, "chunks_deleted": chunks}
+
+    def get(self, ref: str) -> str:
+        """Return the content for `ref`. Raises `KeyError` if it is unknown."""
+        digest = ref[len(REF_PREFIX) :]
+        with self._lock:
+            content = self._decoded.get(digest)
+            if content is not None:
+                self._decoded.move_to_end(digest)
+                return content
+            payloads = self._get_blob(digest)
+            if payloads is None:
+                raise KeyError(ref)
+            if self.compress:
+                payloads = [zlib.decompress(p) for p in payloads]
+            content = b"".join(payloads).decode()
+            self._remember(digest, content)
+            return content
+
+    def _remember(self, digest: str, content: str) -> None:
+        self._decoded[digest] = content
+        self._decoded.move_to_end(digest)
+        while len(self._decoded) > self.cache_size:
+            self._decoded.popitem(last=False)
+
+    def resolve(self, value: str) -> str:
+        """Return file content for a state value, whether it is a reference or not."""
+        return self.get(value) if is_ref(value) else value
+
+
+class InMemoryFileStore(FileStore):
+    """File store that keeps chunks in process memory."""
+
+    def __init__(self, compress: bool = False, cache_size: int = 64):
+        super().__init__(compress=compress, cache_size=cache_size)
+        self._chunks: dict[str, bytes] = {}
+        self._blobs: dict[str, tuple[str, ...]] = {}
+        self._written: dict[str, float] = {}
+
+    def _has_blob(self, digest):
+        return digest in self._blobs
+
+    def _put_blob(self, digest, chunks):
+        for chunk_digest, payload in chunks:
+            self._chunks.setdefault(chunk_digest, payload)
+        self._blobs[digest] = tuple(chunk_digest for chunk_digest, _ in chunks)
+        self._written[digest] = time.time()
+
+    def _touch_blob(self, digest):
+        self._written[digest] = time.time()
+
+    def _delete_unreferenced(self, live, written_before):
+        dead = [
+            digest for digest in self._blobs
+            if digest not in live and self._written.get(digest, 0.0) < written_before
+        ]
+        for digest in dead:
+            del self._blobs[digest]
+            self._written.pop(digest, None)
+        used = {chunk for chunk_digests in self._blobs.values() for chunk in chunk_digests}
+        orphaned = [chunk for chunk in self._chunks if chunk not in used]
+        for chunk in orphaned:
+            del self._chunks[chunk]
+        return len(dead), len(orphaned)
+
+    def _get_blob(self, digest):
+        chunk_digests = self._blobs.get(digest)
+        if chunk_digests is None:
+            return None
+        return [self._chunks[d] for d in chunk_digests]
+
+    def stats(self) -> dict:
+        """Blob and chunk counts and stored bytes."""
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "chunks": len(self._chunks),
+                "stored_bytes": sum(len(p) for p in self._chunks.values()),
+            }
+
+
+class SQLiteFileStore(FileStore):
+    """File store persisted in a SQLite database, shareable across processes."""
+
+    def __init__(self, path: str, compress: bool = True, cache_size: int = 64):
+        super().__init__(compress=compress, cache_size=cache_size)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (digest TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, chunks TEXT NOT NULL, "
+                "written_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(blobs)")}
+            if "written_at" not in columns:
+                # Stores created before garbage collection existed
+                self._conn.execute(
+                    "ALTER TABLE blobs ADD COLUMN written_at REAL NOT NULL DEFAULT 0"
+                )
+
+    def _has_blob(self, digest):
+        row = self._conn.execute(
+            "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        return row is not None
+
+    def _put_blob(self, digest, chunks):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (digest, data) VALUES (?, ?)", chunks
+            )
+            self._conn.execute(
+                "INSERT INTO blobs (digest, chunks, written_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET written_at = excluded.written_at",
+                (digest, ",".join(chunk_digest for chunk_digest, _ in chunks), time.time()),
+            )
+
+    def _touch_blob(self, digest):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE blobs SET written_at = ? WHERE digest = ?", (time.time(), digest)
+            )
+
+    def _delete_unreferenced(self, live, written_before):
+        with self._conn:
+            dead = [
+                digest
+                for (digest,) in self._conn.execute(
+                    "SELECT digest FROM blobs WHERE written_at < ?", (written_before,)
+                )
+                if digest not in live
+            ]
+            self._conn.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in dead])
+            used = set()
+            for (chunk_digests,) in self._conn.execute("SELECT chunks FROM blobs"):
+                if chunk_digests:
+                    used.update(chunk_digests.split(","))
+            orphaned = [
+                digest
+                for (digest,) in self._conn.execute("SELECT digest FROM chunks")
+                if digest not in used
+            ]
+            self._conn.executemany("DELETE FROM chunks WHERE digest = ?", [(d,) for d in orphaned])
+        return len(dead), len(orphaned)
+
+    def _get_blob(self, digest):
+        row = self._conn.execute(
+            "SELECT chunks FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        chunk_digests = row[0].split(",") if row[0] else []
+        payloads = []
+        for chunk_digest in chunk_digests:
+            chunk_row = self._conn.execute(
+                "SELECT data FROM chunks WHERE digest = ?", (chunk_digest,)
+            ).fetchone()
+            payloads.append(chunk_row[0])
+        return payloads
+
+
+_default_store: Optional[FileStore] = None
+
+
+def set_default_file_store(store: Optional[FileStore]) -> None:
+    """Set the process-wide file store used when a run does not configure one."""
+    global _default_store
+    _default_store = store
+
+
+def get_file_store() -> Optional[FileStore]:
+    """Return the file store for the current run, if any."""
+    try:
+        from langgraph.config import get_config
+
+        store = get_config().get("configurable", {}).get("file_store")
+    except RuntimeError:
+        # Called outside of a runnable context
+        store = None
+    return store or _default_store
+
+
+def read_content(value: str) -> str:
+    """Resolve a `files` state value to the file content."""
+    if not is_ref(value):
+        return value
+    store = get_file_store()
+    if store is None:
+        raise KeyError(f"No file store configured to resolve {value}")
+    return store.get(value)
+
+
+def store_content(content: str) -> str:
+    """Return the value to put in `files` state for `content`."""
+    store = get_file_store()
+    return store.put(content) if store is not None else content
+
+
+def resolve_files(files: dict[str, str], store: Optional[FileStore] = None) -> dict[str, str]:
+    """Return a copy of `files` with every reference replaced by its content."""
+    store = store or get_file_store()
+    if store is None:
+        return dict(files)
+    return {path: store.resolve(value) for path, value in files.items()}
@@ -1,8 +1,16 @@
 from deepagents.sub_agent import _create_task_tool, SubAgent
+from deepagents.scheduler import SubAgentScheduler
 from deepagents.model import get_default_model
 from deepagents.tools import write_todos, write_file, read_file, ls, edit_file
+from deepagents.prompts import (
+    WRITE_TODOS_DESCRIPTION_COMPACT,
+    EDIT_DESCRIPTION_COMPACT,
+    TOOL_DESCRIPTION_COMPACT,
+)
 from deepagents.state import DeepAgentState
-from typing import Sequence, Union, Callable, Any, TypeVar, Type, Optional, Dict
+from deepagents.file_store import FileStore
+from deepagents.compaction import CompactionStats, create_compaction_hook
+from typing import Sequence, Union, Callable, Any, TypeVar, Type, Optional, Dict, Literal
 from langchain_core.tools import BaseTool
 from langchain_core.language_models import LanguageModelLike
 from deepagents.interrupt import create_interrupt_hook, ToolInterruptConfig
@@ -24,6 +32,29 @@ It is critical that you mark todos as completed as soon as you are done with a t
 
 - When doing web search, prefer to use the `task` tool in order to reduce context usage."""
 
+compact_base_prompt = """
+
+## Tools
+- `write_todos`: plan multi-step tasks and keep the list current; mark each todo completed as soon as it is done.
+- `task`: delegate work (especially web search) to subagents to keep your context small."""
+
+PromptProfile = Literal["default", "compact"]
+
+
+def _built_in_tools(prompt_profile: PromptProfile = "default") -> list:
+    """Return the built-in tools, with condensed descriptions for the compact profile."""
+    if prompt_profile == "default":
+        return [write_todos, write_file, read_file, ls, edit_file]
+    if prompt_profile != "compact":
+        raise ValueError(f"Unknown prompt profile: {prompt_profile!r}")
+    return [
+        write_todos.model_copy(update={"description": WRITE_TODOS_DESCRIPTION_COMPACT}),
+        write_file,
+        read_file.model_copy(update={"description": TOOL_DESCRIPTION_COMPACT}),
+        ls,
+        edit_file.model_copy(update={"description": EDIT_DESCRIPTION_COMPACT}),
+    ]
+
 
 def create_deep_agent(
     tools: Sequence[Union[BaseTool, Callable, dict[str, Any]]],
@@ -35,6 +66,12 @@ def create_deep_agent(
     config_schema: Optional[Type[Any]] = None,
     checkpointer: Optional[Checkpointer] = None,
     post_model_hook: Optional[Callable] = None,
+    subagent_max_concurrency: Optional[int] = None,
+    subagent_timeout: Optional[float] = None,
+    file_store: Optional[FileStore] = None,
+    max_context_tokens: Optional[int] = None,
+    on_compact: Optional[Callable[[CompactionStats], Any]] = None,
+    prompt_profile: PromptProfile = "default",
 ):
     """Create a deep agent.
 
@@ -52,15 +89,36 @@ def create_deep_agent(
                 - `description` (used by the main agent to decide whether to call the sub agent)
                 - `prompt` (used as the system prompt in the subagent)
                 - (optional) `tools`
+                - (optional) `max_concurrency`: cap on parallel runs of this subagent
+                - (optional) `timeout`: deadline in seconds for a single run
+                - (optional) `max_context_tokens`: history token budget for this
+                  subagent's model (defaults to `max_context_tokens`)
         state_schema: The schema of the deep agent. Should subclass from DeepAgentState
         interrupt_config: Optional Dict[str, HumanInterruptConfig] mapping tool names to interrupt configs.
 
         config_schema: The schema of the deep agent.
         checkpointer: Optional checkpointer for persisting agent state between runs.
+        subagent_max_concurrency: Maximum number of subagents (of any type) that may
+            run at the same time within a run. Defaults to unbounded.
+        subagent_timeout: Default deadline in seconds for a single subagent run. A
+            subagent that runs out of time returns its partial result, if any.
+        file_store: Optional content-addressed store for file contents. When set,
+            the `files` state holds references and contents are stored (deduplicated)
+            in the store; subagents share the same store.
+        max_context_tokens: Token budget for the message history sent to the model.
+            When set, a compaction step runs before every model call (of the main
+            agent and of subagents) that digests old tool results and drops the
+            oldest turns once the history exceeds the budget.
+        on_compact: Optional callback receiving `CompactionStats` whenever a model
+            input was compacted, e.g. to export compaction metrics.
+        prompt_profile: `"default"` or `"compact"`. The compact profile uses
+            condensed descriptions for the built-in tools and the `task` tool and a
+            shorter base system prompt, cutting the fixed input tokens of every model
+            call of the main agent and of subagents.
     """
     
-    prompt = instructions + base_prompt
-    built_in_tools = [write_todos, write_file, read_file, ls, edit_file]
+    built_in_tools = _built_in_tools(prompt_profile)
+    prompt = instructions + (compact_base_prompt if prompt_profile == "compact" else base_prompt)
     if model is None:
         model = get_default_model()
     state_schema = state_schema or DeepAgentState
@@ -69,7 +127,14 @@ def create_deep_agent(
         instructions,
         subagents or [],
         model,
-        state_schema
+        state_schema,
+        scheduler=SubAgentScheduler(
+            max_concurrency=subagent_max_concurrency,
+            default_timeout=subagent_timeout,
+        ),
+        max_context_tokens=max_context_tokens,
+        on_compact=on_compact,
+        prompt_profile=prompt_profile,
     )
     all_tools = built_in_tools + list(tools) + [task_tool]
     
@@ -86,12 +151,21 @@ def create_deep_agent(
     else:
         selected_post_model_hook = None
     
-    return create_react_agent(
+    if max_context_tokens is not None:
+        pre_model_hook = create_compaction_hook(max_context_tokens, on_compact=on_compact)
+    else:
+        pre_model_hook = None
+
+    agent = create_react_agent(
         model,
         prompt=prompt,
         tools=all_tools,
         state_schema=state_schema,
+        pre_model_hook=pre_model_hook,
         post_model_hook=selected_post_model_hook,
         config_schema=config_schema,
         checkpointer=checkpointer,
     )
+    if file_store is not None:
+        agent = agent.with_config({"configurable": {"file_store": file_store}})
+    return agent
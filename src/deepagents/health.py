@@ -0,0 +1,180 @@
+"""
+Señales de salud y disponibilidad para SOF-IA.
+Registra el resultado de las llamadas a dependencias externas (Tavily, el modelo)
+con un estado tipo circuito y agrupa los checks de disponibilidad (`/readyz`):
+profundidad de colas, ratio de aciertos de la caché y estado de las dependencias.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Tuple
+
+from . import runtime
+from .search_cache import get_search_cache, search_flights
+
+# Fallos consecutivos tras los que una dependencia se considera caída
+DEFAULT_FAILURE_THRESHOLD = 5
+# Segundos tras los que una dependencia caída vuelve a "half_open" para probarse de nuevo
+DEFAULT_RECOVERY_SECONDS = 30.0
+
+
+class DependencyHealth:
+    """Estado de una dependencia externa a partir del resultado de sus llamadas.
+
+    Es un circuito pasivo: no corta llamadas, solo informa. Pasa a `open` tras
+    `failure_threshold` fallos consecutivos, a `half_open` cuando han pasado
+    `recovery_seconds` desde el último fallo, y vuelve a `closed` con un éxito.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 recovery_seconds: float = DEFAULT_RECOVERY_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._last_failure = 0.0
+        self._last_error = ''
+        self._calls = 0
+        self._failures = 0
+
+    def record_success(self):
+        with self._lock:
+            self._calls += 1
+            self._consecutive_failures = 0
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self._calls += 1
+            self._failures += 1
+            self._consecutive_failures += 1
+            self._last_failure = time.time()
+            self._last_error = f"{type(error).__name__}: {error}"[:200]
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._consecutive_failures < self.failure_threshold:
+            return 'closed'
+        if time.time() - self._last_failure >= self.recovery_seconds:
+            return 'half_open'
+        return 'open'
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self._state(),
+                'calls': self._calls,
+                'failures': self._failures,
+                'consecutive_failures': self._consecutive_failures,
+                'last_error': self._last_error or None,
+            }
+
+
+_dependencies: Dict[str, DependencyHealth] = {}
+_dependencies_lock = threading.Lock()
+
+
+def get_dependency(name: str) -> DependencyHealth:
+    """Estado compartido de la dependencia `name`, creado en el primer uso."""
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        with _dependencies_lock:
+            dependency = _dependencies.setdefault(name, DependencyHealth(
+                name,
+                failure_threshold=int(os.getenv('SOFIA_DEPENDENCY_FAILURES', str(DEFAULT_FAILURE_THRESHOLD))),
+                recovery_seconds=float(os.getenv('SOFIA_DEPENDENCY_RECOVERY', str(DEFAULT_RECOVERY_SECONDS))),
+            ))
+    return dependency
+
+
+@contextmanager
+def track_dependency(name: str):
+    """Registrar el éxito o fallo de una llamada a la dependencia `name`."""
+    dependency = get_dependency(name)
+    try:
+        yield
+    except Exception as e:
+        dependency.record_failure(e)
+        raise
+    else:
+        dependency.record_success()
+
+
+# Checks de disponibilidad: nombre -> función que devuelve (listo, detalles)
+ReadinessCheck = Callable[[], Tuple[bool, Dict[str, Any]]]
+_readiness_checks: Dict[str, ReadinessCheck] = {}
+
+
+def register_readiness_check(name: str, check: ReadinessCheck):
+    """Añadir (o sustituir) un check de disponibilidad para `/readyz`."""
+    _readiness_checks[name] = check
+
+
+def _dependencies_check() -> Tuple[bool, Dict[str, Any]]:
+    with _dependencies_lock:
+        dependencies = list(_dependencies.values())
+    details = {dependency.name: dependency.snapshot() for dependency in dependencies}
+    return all(d['state'] != 'open' for d in details.values()), details
+
+
+def _search_check() -> Tuple[bool, Dict[str, Any]]:
+    cache = get_search_cache().get_stats()
+    flights = search_flights.get_stats()
+    return True, {
+        'cache_hit_ratio': cache['hit_ratio'],
+        'cache_entries': cache['memory_entries'],
+        'in_flight': flights['in_flight'],
+        'coalesced': flights['coalesced'],
+    }
+
+
+async def _pending_tasks() -> int:
+    """Tareas del loop en curso, sin contar esta."""
+    return len(asyncio.all_tasks()) - 1
+
+
+def _background_loop_check() -> Tuple[bool, Dict[str, Any]]:
+    """Tareas pendientes en el event loop compartido (agentes y subagentes en curso).
+
+    El recuento se hace dentro del propio loop (`all_tasks` no es seguro desde otro
+    hilo); si no responde en `SOFIA_READY_LOOP_TIMEOUT` segundos, está bloqueado.
+    """
+    max_depth = int(os.getenv('SOFIA_READY_MAX_QUEUE', '100'))
+    loop = runtime.peek_background_loop()
+    if loop is None:
+        return True, {'started': False, 'queue_depth': 0, 'max_queue_depth': max_depth}
+    running = loop.is_running()
+    details: Dict[str, Any] = {'started': True, 'running': running, 'max_queue_depth': max_depth}
+    if not running:
+        return False, details
+    future = asyncio.run_coroutine_threadsafe(_pending_tasks(), loop)
+    try:
+        depth = future.result(timeout=float(os.getenv('SOFIA_READY_LOOP_TIMEOUT', '2')))
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return False, {**details, 'responsive': False}
+    return depth <= max_depth, {**details, 'responsive': True, 'queue_depth': depth}
+
+
+register_readiness_check('dependencies', _dependencies_check)
+register_readiness_check('search', _search_check)
+register_readiness_check('background_loop', _background_loop_check)
+
+
+def readiness() -> Dict[str, Any]:
+    """Ejecutar todos los checks; `ready` es falso si alguno falla."""
+    checks = {}
+    for name, check in list(_readiness_checks.items()):
+        try:
+            ok, details = check()
+        except Exception as e:
+            ok, details = False, {'error': f"{type(e).__name__}: {e}"}
+        checks[name] = {'ok': ok, **details}
+    return {'ready': all(c['ok'] for c in checks.values()), 'checks': checks}
@@ -0,0 +1,338 @@
+"""Background jobs for deep agent runs that outlive the caller.
+
+A job runs an agent on the shared background loop (see `deepagents.runtime`)
+and records every `StreamEvent` it produces, so any caller holding the job ID
+(a later Streamlit rerun, another browser session, a polling endpoint) can
+replay progress from the start, follow it live and read the final result.
+Dropping the caller never cancels the run; only `cancel()` does.
+
+Finished jobs are kept for a bounded time and count, then evicted. Once a
+finished job has had time to be read, consecutive token events are merged so
+retained jobs do not hold one event per streamed token.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, Literal, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from deepagents.runtime import run_coroutine
+from deepagents.streaming import StreamEvent, astream_agent_events
+
+JobStatus = Literal["pending", "running", "succeeded", "failed", "cancelled"]
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised when reading the outcome of a job that was cancelled."""
+
+
+class JobAlreadyRunning(RuntimeError):
+    """Raised by `JobRunner.submit` when a job with the same key is still running.
+
+    The running job is available as `job`.
+    """
+
+    def __init__(self, job: "Job"):
+        super().__init__(f"Job {job.id} is already running for key {job.key!r}")
+        self.job = job
+
+
+class Job:
+    """A single background agent run and everything it has produced so far.
+
+    Events are appended by the background loop and read from any thread;
+    `events_since` and `stream` take a cursor (the number of events already
+    seen) so readers can resume where they left off.
+    """
+
+    def __init__(self, key: Optional[str] = None, owner: Optional[str] = None,
+                 metadata: Optional[dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.owner = owner
+        self.metadata = dict(metadata or {})
+        self.status: JobStatus = "pending"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._events: list[StreamEvent] = []
+        self._cond = threading.Condition()
+        self._future = None
+        self._callbacks: list[Callable[["Job"], None]] = []
+        self._readers = 0
+        self._compacted = False
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds from start to finish (or to now while still running)."""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _append(self, event: StreamEvent):
+        with self._cond:
+            if event["type"] == "token" and not event["namespace"] and self.first_token_at is None:
+                self.first_token_at = time.time()
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def _finish(self, status: JobStatus, result: Any = None, error: Optional[BaseException] = None):
+        with self._cond:
+            if self.done:
+                return
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            callbacks, self._callbacks = self._callbacks, []
+            self._cond.notify_all()
+        for callback in callbacks:
+            callback(self)
+
+    def _start(self) -> bool:
+        """Mark the job as running, unless it was cancelled before it started."""
+        with self._cond:
+            if self.done:
+                return False
+            self.status = "running"
+            self.started_at = time.time()
+            return True
+
+    def _compact(self) -> bool:
+        """Merge consecutive token events from the same agent into one.
+
+        Only done once the job finished and nobody is streaming it, since
+        merging shifts event positions and so invalidates cursors.
+        """
+        with self._cond:
+            if not self.done or self._readers or self._compacted:
+                return False
+            events: list[StreamEvent] = []
+            for event in self._events:
+                previous = events[-1] if events else None
+                if (
+                    event["type"] == "token"
+                    and previous is not None
+                    and previous["type"] == "token"
+                    and previous["namespace"] == event["namespace"]
+                ):
+                    events[-1] = {**previous, "data": previous["data"] + event["data"]}
+                else:
+                    events.append(event)
+            self._events = events
+            self._compacted = True
+            return True
+
+    def add_done_callback(self, callback: Callable[["Job"], None]):
+        """Call `callback(job)` once the job finishes (right away if it already has)."""
+        with self._cond:
+            if not self.done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def events_since(self, cursor: int = 0, timeout: Optional[float] = None) -> list[StreamEvent]:
+        """Return the events after `cursor`, waiting up to `timeout` seconds for new ones.
+
+        Cursors stay valid while the job runs and while it is being streamed;
+        a finished job may later merge its token events (see `JobRunner`).
+        """
+        with self._cond:
+            if timeout is not None:
+                self._cond.wait_for(lambda: len(self._events) > cursor or self.done, timeout)
+            return self._events[cursor:]
+
+    def stream(self, cursor: int = 0, poll_interval: float = 1.0) -> Iterator[StreamEvent]:
+        """Yield events from `cursor` on until the job finishes.
+
+        Replays what already happened, then follows the run live. Raises the
+        run's exception if it failed and `JobCancelled` if it was cancelled.
+        Stopping iteration early leaves the job running.
+        """
+        with self._cond:
+            self._readers += 1
+        try:
+            while True:
+                events = self.events_since(cursor, timeout=poll_interval)
+                for event in events:
+                    yield event
+                cursor += len(events)
+                if self.done and cursor >= len(self._events):
+                    break
+        finally:
+            with self._cond:
+                self._readers -= 1
+        self.raise_for_status()
+
+    def raise_for_status(self):
+        """Raise the job's error if it failed or `JobCancelled` if it was cancelled."""
+        if self.status == "failed" and self.error is not None:
+            raise self.error
+        if self.status == "cancelled":
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes; return whether it did within `timeout`."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def cancel(self) -> bool:
+        """Cancel the run; return False if it had already finished."""
+        if self.done:
+            return False
+        if self._future is not None:
+            self._future.cancel()
+        self._finish("cancelled")
+        return True
+
+    def snapshot(self) -> dict[str, Any]:
+        """JSON-friendly summary of the job (without events or result)."""
+        with self._cond:
+            return {
+                "id": self.id,
+                "key": self.key,
+                "owner": self.owner,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "events": len(self._events),
+                "error": repr(self.error) if self.error is not None else None,
+                "metadata": dict(self.metadata),
+            }
+
+
+class JobRunner:
+    """Submits agent runs as background jobs and keeps track of them.
+
+    Args:
+        retention: Seconds a finished job stays available.
+        max_retained: Maximum number of finished jobs kept; the oldest are
+            evicted first.
+        compact_after: Seconds after a job finishes before its token events
+            are merged.
+    """
+
+    def __init__(self, retention: float = 3600.0, max_retained: int = 100,
+                 compact_after: float = 60.0):
+        self.retention = retention
+        self.max_retained = max_retained
+        self.compact_after = compact_after
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        agent,
+        inputs: Any,
+        config: Optional[RunnableConfig] = None,
+        *,
+        key: Optional[str] = None,
+        owner: Optional[str] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        on_finish: Optional[Callable[[Job], None]] = None,
+    ) -> Job:
+        """Start running `agent` in the background and return its `Job`.
+
+        At most one job runs per `key` (e.g. the conversation thread): if one
+        is still running, `JobAlreadyRunning` is raised with it instead of
+        starting a second run, and `on_finish` is not registered. Otherwise
+        `on_finish` is called with the new job once it ends, whatever the
+        outcome.
+        """
+        with self._lock:
+            self._evict()
+            running = self._active_for(key) if key is not None else None
+            if running is not None:
+                raise JobAlreadyRunning(running)
+            job = Job(key=key, owner=owner, metadata=metadata)
+            self._jobs[job.id] = job
+            job._future = run_coroutine(self._run(job, agent, inputs, config))
+        if on_finish is not None:
+            job.add_done_callback(on_finish)
+        return job
+
+    async def _run(self, job: Job, agent, inputs: Any, config: Optional[RunnableConfig]):
+        if not job._start():
+            return
+        final_state = None
+        try:
+            async for event in astream_agent_events(agent, inputs, config):
+                if event["type"] == "final":
+                    final_state = event["data"]
+                job._append(event)
+        except asyncio.CancelledError:
+            job._finish("cancelled")
+            raise
+        except Exception as e:
+            job._finish("failed", error=e)
+        else:
+            job._finish("succeeded", result=final_state)
+
+    def _active_for(self, key: str) -> Optional[Job]:
+        for job in reversed(self._jobs.values()):
+            if job.key == key and not job.done:
+                return job
+        return None
+
+    def _evict(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        for index, job in enumerate(finished):
+            expired = now - job.finished_at > self.retention
+            if expired or len(finished) - index > self.max_retained:
+                del self._jobs[job.id]
+            elif now - job.finished_at > self.compact_after:
+                job._compact()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with this ID, if it is still retained."""
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def find(self, key: str) -> Optional[Job]:
+        """Return the unfinished job for `key`, if any."""
+        with self._lock:
+            return self._active_for(key)
+
+    def list(self, owner: Optional[str] = None) -> list[Job]:
+        """Return the retained jobs (optionally only `owner`'s), oldest first."""
+        with self._lock:
+            self._evict()
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job by ID; return False if it is unknown or already finished."""
+        job = self.get(job_id)
+        return job.cancel() if job is not None else False
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner(**kwargs: Any) -> JobRunner:
+    """Return the process-wide job runner, creating it on first use.
+
+    `kwargs` are passed to `JobRunner` only when it is first created.
+    """
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner(**kwargs)
+    return _runner
@@ -0,0 +1,26 @@
+"""Deferred imports for heavy optional dependencies (UI, providers, numerics)."""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module `name`, deferring its execution until an attribute is used.
+
+    If the module is already imported it is returned as is. Otherwise a lazy
+    module is registered in `sys.modules`, so later regular imports (and
+    `unittest.mock.patch`) see the same object once it has loaded.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
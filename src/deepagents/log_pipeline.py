@@ -0,0 +1,216 @@
+"""
+Pipeline de logging asíncrono para SOF-IA.
+Los handlers del logger raíz se sustituyen por una cola acotada: en el camino
+caliente solo se encola el registro (sin esperar), y un hilo de fondo escribe
+los registros por lotes, rota el archivo por tamaño y, si la cola se llena,
+descarta líneas y las contabiliza.
+"""
+import atexit
+import copy
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+from typing import Callable, List, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+_STOP = object()
+
+# Se llaman por cada línea descartada (p. ej. para un contador Prometheus)
+_drop_listeners: List[Callable[[], None]] = []
+
+
+def add_drop_listener(listener: Callable[[], None]):
+    """Registrar `listener`, que se llamará por cada línea de log descartada."""
+    _drop_listeners.append(listener)
+
+
+class PipelineFormatter(logging.Formatter):
+    """Formato de texto para los registros; los eventos de structlog se renderizan
+    con `structlog_formatter` (p. ej. JSON) en el hilo escritor."""
+
+    structlog_formatter: Optional[logging.Formatter] = None
+
+    def format(self, record: logging.LogRecord) -> str:
+        formatter = PipelineFormatter.structlog_formatter
+        if formatter is not None and hasattr(record, '_logger'):
+            record = copy.copy(record)
+            record.msg, record.args = formatter.format(record), ()
+        return super().format(record)
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """`RotatingFileHandler` que escribe un lote de registros con un único flush."""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        self.acquire()
+        try:
+            for record in records:
+                try:
+                    line = self.format(record) + self.terminator
+                    if self.stream is None:
+                        self.stream = self._open()
+                    if self.maxBytes > 0 and self.stream.tell() + len(line) >= self.maxBytes:
+                        self.doRollover()
+                        if self.stream is None:  # con `delay=True` no se reabre solo
+                            self.stream = self._open()
+                    self.stream.write(line)
+                except Exception:
+                    self.handleError(record)
+            self.flush()
+        finally:
+            self.release()
+
+
+class LogPipeline:
+    """Cola acotada + hilo escritor que reparte lotes de registros entre handlers.
+
+    El hilo arranca con el primer registro, de modo que importar el módulo que
+    instala el pipeline no crea hilos ni abre archivos.
+    """
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(self, record: logging.LogRecord):
+        """Encolar sin bloquear; si la cola está llena, el registro se descarta."""
+        if self._thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            for listener in _drop_listeners:
+                listener()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sofia-log-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0):
+        """Escribir lo pendiente y detener el hilo escritor."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is _STOP for record in batch)
+            self._write([record for record in batch if record is not _STOP])
+            if stop:
+                return
+
+    def _write(self, records: List[logging.LogRecord]):
+        for handler in self.handlers:
+            accepted = [r for r in records if r.levelno >= handler.level]
+            if not accepted:
+                continue
+            if isinstance(handler, BatchRotatingFileHandler):
+                handler.emit_batch(accepted)
+            else:
+                for record in accepted:
+                    handler.handle(record)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class PipelineQueueHandler(logging.Handler):
+    """Handler del camino caliente: solo resuelve el mensaje y encola."""
+
+    def __init__(self, pipeline: LogPipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            # Los argumentos pueden mutar después: fijar el mensaje ahora (barato);
+            # el formateo completo (fecha, JSON, trazas) ocurre en el hilo escritor
+            if record.args and not hasattr(record, '_logger'):
+                record.msg, record.args = record.getMessage(), None
+            # Como `QueueHandler.prepare`: la traza se formatea ya, para no mantener
+            # vivos los frames (ni ver sus variables ya mutadas) hasta que se escriba
+            if record.exc_info:
+                if not record.exc_text:
+                    record.exc_text = _exception_formatter.formatException(record.exc_info)
+                record.exc_info = None
+            self.pipeline.enqueue(record)
+        except Exception:
+            self.handleError(record)
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def get_log_pipeline() -> Optional[LogPipeline]:
+    """Pipeline instalado en el logger raíz, si lo hay."""
+    return _pipeline
+
+
+def install_log_pipeline(file_path: Optional[str] = None, level: int = logging.INFO,
+                         fmt: str = DEFAULT_FORMAT) -> Optional[LogPipeline]:
+    """Instalar el pipeline en el logger raíz (archivo rotado + stderr).
+
+    Como `logging.basicConfig`, no hace nada si el logger raíz ya tiene handlers.
+    Se configura con `SOFIA_LOG_FILE`, `SOFIA_LOG_MAX_BYTES`, `SOFIA_LOG_BACKUPS`
+    y `SOFIA_LOG_QUEUE_SIZE`.
+    """
+    global _pipeline
+    root = logging.getLogger()
+    if root.handlers:
+        return _pipeline
+
+    formatter = PipelineFormatter(fmt)
+    handlers: List[logging.Handler] = []
+    file_path = file_path or os.getenv('SOFIA_LOG_FILE', 'sofia_secure.log')
+    if file_path:
+        file_handler = BatchRotatingFileHandler(
+            file_path,
+            maxBytes=int(os.getenv('SOFIA_LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv('SOFIA_LOG_BACKUPS', '5')),
+            encoding='utf-8',
+            delay=True,
+        )
+        handlers.append(file_handler)
+    handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _pipeline = LogPipeline(handlers, queue_size=int(os.getenv('SOFIA_LOG_QUEUE_SIZE', str(DEFAULT_QUEUE_SIZE))))
+    root.addHandler(PipelineQueueHandler(_pipeline))
+    root.setLevel(level)
+    return _pipeline
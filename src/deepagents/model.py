@@ -1,5 +1,5 @@
-from langchain_anthropic import ChatAnthropic
-
-
 def get_default_model():
+    # Imported here so that only callers relying on the default model pay for the provider
+    from langchain_anthropic import ChatAnthropic
+
     return ChatAnthropic(model_name="claude-sonnet-4-20250514", max_tokens=64000)
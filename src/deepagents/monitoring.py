@@ -1,40 +1,80 @@
 """
 Sistema de monitorización para SOF-IA.
 Proporciona métricas de rendimiento, logging estructurado y alertas.
+
+Con varios procesos de Streamlit (p. ej. detrás de un balanceador), definir
+`PROMETHEUS_MULTIPROC_DIR` con un directorio compartido y vacío antes de arrancar
+cada proceso: las métricas se escriben en ese directorio y `get_stats()`, el
+dashboard y el servidor de métricas muestran los valores agregados de todos.
 """
+import atexit
+import os
 import time
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 from contextlib import contextmanager
-import streamlit as st
-from prometheus_client import Counter, Histogram, Gauge, start_http_server, CollectorRegistry
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, multiprocess
 import structlog
 
-# Configurar logging estructurado
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
-    cache_logger_on_first_use=True,
-)
+from .health import readiness
+from .lazy_imports import lazy_import
+from .log_pipeline import PipelineFormatter, add_drop_listener, get_log_pipeline
+
+# Streamlit solo se carga al dibujar el dashboard: los workers sin UI no lo importan
+st = lazy_import('streamlit')
+
+_logging_configured = False
+
+def configure_logging():
+    """Configurar logging estructurado (JSON) una sola vez por proceso.
+
+    No se hace al importar el módulo para no alterar la configuración global de
+    quien solo lo importa; lo llaman `init_monitoring` y el exportador.
+    En el hilo que registra solo se construye el evento; el JSON lo renderiza
+    el hilo escritor del pipeline de logging (`log_pipeline`). Si no hay pipeline
+    (el logger raíz ya tenía handlers), el JSON se renderiza al registrar, para
+    que esos handlers reciban texto y no el diccionario del evento.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+    if get_log_pipeline() is not None:
+        PipelineFormatter.structlog_formatter = structlog.stdlib.ProcessorFormatter(
+            processor=structlog.processors.JSONRenderer()
+        )
+        render = structlog.stdlib.ProcessorFormatter.wrap_for_formatter
+    else:
+        render = structlog.processors.JSONRenderer()
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            render,
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
 
 logger = structlog.get_logger()
 
 # Usar un registro personalizado para evitar conflictos con recargas de módulos
 registry = CollectorRegistry()
 
+# Modo multiproceso de prometheus_client: la variable debe existir antes de crear cualquier métrica
+MULTIPROCESS_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv('prometheus_multiproc_dir')
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
 # Función para crear métricas de forma segura
 def create_metric(metric_class, name, description, *args, **kwargs):
     """Crear métrica solo si no existe."""
@@ -52,48 +92,124 @@ def create_metric(metric_class, name, description, *args, **kwargs):
 # Métricas Prometheus con registro personalizado
 REQUEST_COUNT = create_metric(Counter, 'sofia_requests_total', 'Total de requests', ['method', 'endpoint', 'status'])
 REQUEST_LATENCY = create_metric(Histogram, 'sofia_request_duration_seconds', 'Duración de requests', ['method', 'endpoint'])
-ACTIVE_USERS = create_metric(Gauge, 'sofia_active_users', 'Usuarios activos')
+ACTIVE_USERS = create_metric(Gauge, 'sofia_active_users', 'Usuarios activos', multiprocess_mode='livesum')
+PROCESS_START = create_metric(Gauge, 'sofia_process_start_time_seconds', 'Inicio del proceso más antiguo', multiprocess_mode='min')
+LIVE_PROCESSES = create_metric(Gauge, 'sofia_processes', 'Procesos de SOF-IA activos', multiprocess_mode='livesum')
 AGENT_INVOCATIONS = create_metric(Counter, 'sofia_agent_invocations_total', 'Invocaciones de agentes', ['agent_type'])
 ERROR_COUNT = create_metric(Counter, 'sofia_errors_total', 'Total de errores', ['error_type'])
+COMPACTION_RATIO = create_metric(
+    Histogram, 'sofia_context_compaction_ratio', 'Fracción de tokens del historial conservada al compactar',
+    ['agent'], buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+LOG_LINES_DROPPED = create_metric(Counter, 'sofia_log_lines_dropped_total', 'Líneas de log descartadas por cola llena')
+COMPACTED_TOKENS = create_metric(Counter, 'sofia_context_compacted_tokens_total', 'Tokens eliminados del historial por compactación', ['agent'])
+add_drop_listener(LOG_LINES_DROPPED.inc)
+
+# Métricas por llamada al modelo y por herramienta (ver `callbacks.AgentMetricsCallbackHandler`)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000)
+LLM_TTFT = create_metric(Histogram, 'sofia_llm_time_to_first_token_seconds', 'Tiempo hasta el primer token del modelo', ['agent', 'model'], buckets=LATENCY_BUCKETS)
+LLM_LATENCY = create_metric(Histogram, 'sofia_llm_call_duration_seconds', 'Duración total de una llamada al modelo', ['agent', 'model'], buckets=LATENCY_BUCKETS)
+LLM_INPUT_TOKENS = create_metric(Histogram, 'sofia_llm_input_tokens', 'Tokens de entrada por llamada al modelo', ['agent', 'model'], buckets=TOKEN_BUCKETS)
+LLM_OUTPUT_TOKENS = create_metric(Histogram, 'sofia_llm_output_tokens', 'Tokens de salida por llamada al modelo', ['agent', 'model'], buckets=TOKEN_BUCKETS)
+TOOL_LATENCY = create_metric(Histogram, 'sofia_tool_duration_seconds', 'Duración de una llamada a herramienta', ['agent', 'tool', 'status'], buckets=LATENCY_BUCKETS)
+TOOL_PAYLOAD = create_metric(Histogram, 'sofia_tool_output_bytes', 'Tamaño del resultado de una herramienta', ['agent', 'tool'], buckets=(100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000))
+AGENT_STEPS = create_metric(Histogram, 'sofia_agent_steps', 'Llamadas al modelo por ejecución de agente o subagente', ['agent'], buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+
+# Pool de hash de contraseñas (ver `passwords.PasswordPool`)
+PASSWORD_QUEUE_DEPTH = create_metric(Gauge, 'sofia_password_queue_depth', 'Operaciones de contraseña en cola o en curso', multiprocess_mode='livesum')
+PASSWORD_QUEUE_WAIT = create_metric(Histogram, 'sofia_password_queue_wait_seconds', 'Espera en cola antes de hashear o verificar', buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+PASSWORD_HASH_DURATION = create_metric(Histogram, 'sofia_password_hash_duration_seconds', 'Duración de un hash o verificación de contraseña', ['operation'], buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2))
+PASSWORD_REJECTED = create_metric(Counter, 'sofia_password_rejected_total', 'Operaciones de contraseña rechazadas por cola llena')
+
+# Tokens JWT de sesión (ver `auth.AuthManager`)
+JWT_DECODES = create_metric(Counter, 'sofia_jwt_decodes_total', 'Tokens JWT decodificados y verificados', ['result'])
+JWT_CACHE_HITS = create_metric(Counter, 'sofia_jwt_cache_hits_total', 'Verificaciones de JWT resueltas desde la caché')
+JWT_ISSUED = create_metric(Counter, 'sofia_jwt_issued_total', 'Tokens JWT emitidos', ['reason'])
+
+# Almacén de usuarios (ver `user_store.UserStore`)
+USER_STORE_LOOKUPS = create_metric(Counter, 'sofia_user_store_lookups_total', 'Búsquedas de usuario por resultado de la caché', ['result'])
+
+# Control de admisión de ejecuciones del agente (ver `admission.AdmissionController`)
+ADMISSION_QUEUE_DEPTH = create_metric(Gauge, 'sofia_admission_queue_depth', 'Consultas esperando turno para ejecutar el agente', multiprocess_mode='livesum')
+ADMISSION_RUNNING = create_metric(Gauge, 'sofia_admission_running', 'Ejecuciones del agente admitidas en curso', multiprocess_mode='livesum')
+ADMISSION_LIMIT = create_metric(Gauge, 'sofia_admission_limit', 'Ejecuciones simultáneas permitidas', multiprocess_mode='livesum')
+ADMISSION_WAIT = create_metric(Histogram, 'sofia_admission_wait_seconds', 'Espera en cola antes de ejecutar el agente', buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60))
+ADMISSION_REJECTED = create_metric(Counter, 'sofia_admission_rejected_total', 'Consultas rechazadas por el control de admisión', ['reason'])
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Registro a exportar: el del proceso o, en modo multiproceso, el agregado de todos."""
+    if not MULTIPROCESS_DIR:
+        return registry
+    aggregated = CollectorRegistry()
+    multiprocess.MultiProcessCollector(aggregated, path=MULTIPROCESS_DIR)
+    return aggregated
+
+
+def _mark_process_dead():
+    """Descontar este proceso de los gauges `livesum` al terminar."""
+    multiprocess.mark_process_dead(os.getpid(), MULTIPROCESS_DIR)
+
 
 class MetricsCollector:
-    """Colector de métricas para SOF-IA."""
+    """Colector de métricas para SOF-IA.
+
+    Los totales se leen de las métricas Prometheus (seguras entre hilos) en lugar
+    de contadores propios, de modo que en modo multiproceso son los del clúster.
+    """
 
     def __init__(self):
         self.start_time = time.time()
-        self.request_count = 0
-        self.error_count = 0
-        self.agent_calls = 0
+        PROCESS_START.set(self.start_time)
+        LIVE_PROCESSES.set(1)
+        if MULTIPROCESS_DIR:
+            atexit.register(_mark_process_dead)
 
     def record_request(self, method: str, endpoint: str, status: str, duration: float):
         """Registrar una petición HTTP."""
         REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status).inc()
         REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(duration)
-        self.request_count += 1
 
     def record_agent_call(self, agent_type: str):
         """Registrar llamada a agente."""
         AGENT_INVOCATIONS.labels(agent_type=agent_type).inc()
-        self.agent_calls += 1
 
     def record_error(self, error_type: str):
         """Registrar error."""
         ERROR_COUNT.labels(error_type=error_type).inc()
-        self.error_count += 1
+
+    def record_compaction(self, stats: Dict[str, Any]):
+        """Registrar una compactación del historial enviado al modelo."""
+        COMPACTION_RATIO.labels(agent=stats['agent']).observe(stats['ratio'])
+        COMPACTED_TOKENS.labels(agent=stats['agent']).inc(stats['tokens_before'] - stats['tokens_after'])
 
     def update_active_users(self, count: int):
         """Actualizar contador de usuarios activos."""
         ACTIVE_USERS.set(count)
 
     def get_stats(self) -> Dict[str, Any]:
-        """Obtener estadísticas actuales."""
-        uptime = time.time() - self.start_time
+        """Obtener estadísticas actuales (agregadas entre procesos en modo multiproceso)."""
+        totals: Dict[str, float] = {}
+        start_time = self.start_time
+        for family in metrics_registry().collect():
+            for sample in family.samples:
+                if sample.name == 'sofia_process_start_time_seconds':
+                    start_time = min(start_time, sample.value)
+                else:
+                    totals[sample.name] = totals.get(sample.name, 0) + sample.value
+
+        uptime = time.time() - start_time
+        requests = int(totals.get('sofia_requests_total', 0))
         return {
             'uptime_seconds': uptime,
-            'total_requests': self.request_count,
-            'total_errors': self.error_count,
-            'total_agent_calls': self.agent_calls,
-            'requests_per_second': self.request_count / uptime if uptime > 0 else 0
+            'processes': int(totals.get('sofia_processes', 1)),
+            'total_requests': requests,
+            'total_errors': int(totals.get('sofia_errors_total', 0)),
+            'total_agent_calls': int(totals.get('sofia_agent_invocations_total', 0)),
+            'total_compactions': int(totals.get('sofia_context_compaction_ratio_count', 0)),
+            'log_lines_dropped': int(totals.get('sofia_log_lines_dropped_total', 0)),
+            'requests_per_second': requests / uptime if uptime > 0 else 0
         }
 
 # Instancia global del colector de métricas
@@ -164,26 +280,32 @@ def create_monitoring_dashboard():
         st.sidebar.markdown("### 📝 Actividad Reciente")
         st.sidebar.code("Sistema inicializado correctamente\nUsuario admin inició sesión\nAgente invocado: deep_agent\nBúsqueda web completada")
 
-def start_monitoring_server(port: int = 8000):
-    """Iniciar servidor de métricas Prometheus."""
-    try:
-        start_http_server(port)
-        logger.info("Monitoring server started", port=port)
-    except Exception as e:
-        logger.error("Failed to start monitoring server", error=str(e))
+def start_monitoring_server(port: Optional[int] = None):
+    """Iniciar el exportador de métricas y salud (una vez por proceso)."""
+    from .exporter import start_exporter
+    server = start_exporter(port=port)
+    if server is not None:
+        logger.info("Monitoring server started", port=server.server_address[1])
+    return server
 
 def health_check() -> Dict[str, Any]:
     """Verificación de salud del sistema."""
+    report = readiness()
     return {
-        'status': 'healthy',
+        'status': 'healthy' if report['ready'] else 'degraded',
         'timestamp': datetime.utcnow().isoformat(),
         'version': '1.0.0',
+        'checks': report['checks'],
         'metrics': metrics.get_stats()
     }
 
 # Función para integrar con Streamlit
 def init_monitoring():
     """Inicializar monitorización en la aplicación."""
+    configure_logging()
+    # El exportador arranca una sola vez por proceso, aunque Streamlit re-ejecute el script
+    start_monitoring_server()
+
     # Actualizar usuarios activos
     if 'user_info' in st.session_state:
         metrics.update_active_users(1)  # En producción, contar usuarios reales
@@ -0,0 +1,140 @@
+"""
+Selección de pasajes relevantes en el contenido de páginas web para SOF-IA.
+Divide el contenido bruto de los resultados de búsqueda en pasajes, los puntúa
+contra la consulta con BM25 (vectorizado con NumPy, sin llamadas de red) y
+conserva solo los mejores, con la URL de origen.
+"""
+import copy
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from .lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    # NumPy se carga en la primera puntuación, no al importar la herramienta de búsqueda
+    np = lazy_import('numpy')
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+DEFAULT_PASSAGE_CHARS = 500
+DEFAULT_TOP_K = 6
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Dividir un texto en términos en minúsculas."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_passages(text: str, max_chars: int = DEFAULT_PASSAGE_CHARS) -> List[str]:
+    """Dividir un texto en pasajes de hasta `max_chars` caracteres.
+
+    Se respetan los párrafos: los cortos se agrupan y los largos se dividen
+    por frases (o a la fuerza si una frase excede el límite).
+    """
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(query: str, passages: List[str], k1: float = BM25_K1, b: float = BM25_B) -> "np.ndarray":
+    """Puntuación BM25 de cada pasaje respecto a la consulta.
+
+    Solo se cuentan los términos de la consulta: la matriz de frecuencias es
+    `pasajes x términos de la consulta` y se construye con un único `bincount`.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not passages or not terms:
+        return np.zeros(len(passages))
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    doc_lengths = np.empty(len(passages))
+    doc_index: List[int] = []
+    token_index: List[int] = []
+    for i, passage in enumerate(passages):
+        tokens = tokenize(passage)
+        doc_lengths[i] = len(tokens)
+        for token in tokens:
+            term_id = term_ids.get(token)
+            if term_id is not None:
+                doc_index.append(i)
+                token_index.append(term_id)
+
+    n_docs, n_terms = len(passages), len(terms)
+    flat = np.asarray(doc_index, dtype=np.int64) * n_terms + np.asarray(token_index, dtype=np.int64)
+    tf = np.bincount(flat, minlength=n_docs * n_terms).reshape(n_docs, n_terms).astype(float)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    avg_length = doc_lengths.mean() or 1.0
+    norm = k1 * (1 - b + b * doc_lengths / avg_length)
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def select_passages(response: Dict[str, Any], query: str, top_k: int = DEFAULT_TOP_K,
+                    passage_chars: int = DEFAULT_PASSAGE_CHARS) -> Tuple[Dict[str, Any], bool]:
+    """Sustituir el contenido bruto de cada resultado por sus pasajes más relevantes.
+
+    Los pasajes de todas las páginas se puntúan juntos y se conservan los
+    `top_k` mejores; cada resultado queda con los suyos, en orden de aparición.
+    Devuelve `(respuesta, seleccionado)`; la respuesta original no se modifica.
+    """
+    results = response.get('results') or []
+    sources: List[Tuple[int, int]] = []
+    passages: List[str] = []
+    for i, result in enumerate(results):
+        for j, passage in enumerate(split_passages(result.get('raw_content') or '', passage_chars)):
+            sources.append((i, j))
+            passages.append(passage)
+    if not passages:
+        return response, False
+
+    scores = bm25_scores(query, passages)
+    best = np.argsort(-scores, kind='stable')[:top_k]
+    best = [k for k in best if scores[k] > 0] or list(best[:1])
+
+    selected: Dict[int, List[Tuple[int, str]]] = {}
+    for k in best:
+        i, j = sources[k]
+        selected.setdefault(i, []).append((j, passages[k]))
+
+    shaped = copy.deepcopy(response)
+    for i, result in enumerate(shaped['results']):
+        if 'raw_content' not in result:
+            continue
+        chosen = sorted(selected.get(i, []))
+        if chosen:
+            result['raw_content'] = "\n[...]\n".join(passage for _, passage in chosen)
+        else:
+            del result['raw_content']
+    return shaped, True
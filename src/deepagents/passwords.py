@@ -0,0 +1,229 @@
+"""
+Hash de contraseñas para SOF-IA.
+Algoritmos con coste configurable (scrypt de la biblioteca estándar, PBKDF2 y,
+si está instalado `argon2-cffi`, Argon2id) y un pool acotado de hilos para que
+hashear y verificar no ocupen el hilo de Streamlit ni saturen la CPU en picos
+de logins. Los hashes SHA-256 antiguos se siguen verificando y se marcan para
+re-hashear.
+"""
+import base64
+import concurrent.futures
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Perfiles de coste por algoritmo; `high` para producción con CPU holgada,
+# `low` para tests y desarrollo
+COST_PROFILES: Dict[str, Dict[str, Dict[str, int]]] = {
+    'scrypt': {
+        'low': {'n': 2 ** 12, 'r': 8, 'p': 1},
+        'default': {'n': 2 ** 14, 'r': 8, 'p': 1},
+        'high': {'n': 2 ** 15, 'r': 8, 'p': 1},
+    },
+    'pbkdf2_sha256': {
+        'low': {'iterations': 50_000},
+        'default': {'iterations': 310_000},
+        'high': {'iterations': 600_000},
+    },
+    'argon2id': {
+        'low': {'time_cost': 1, 'memory_cost': 16 * 1024, 'parallelism': 1},
+        'default': {'time_cost': 2, 'memory_cost': 64 * 1024, 'parallelism': 1},
+        'high': {'time_cost': 3, 'memory_cost': 128 * 1024, 'parallelism': 2},
+    },
+}
+
+LEGACY_SALT_ENV = 'PASSWORD_SALT'
+
+
+class PasswordPoolBusy(RuntimeError):
+    """La cola del pool de contraseñas está llena o la operación tardó demasiado."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+class PasswordHasher:
+    """Hashea y verifica contraseñas con el algoritmo y perfil de coste dados.
+
+    Formatos: `scrypt$n$r$p$salt$hash`, `pbkdf2_sha256$iteraciones$salt$hash`,
+    `$argon2id$...` (formato de argon2-cffi) y el SHA-256 hexadecimal antiguo.
+    """
+
+    def __init__(self, algorithm: str = 'scrypt', profile: str = 'default'):
+        if algorithm not in COST_PROFILES:
+            raise ValueError(f"Algoritmo de contraseñas desconocido: {algorithm}")
+        if profile not in COST_PROFILES[algorithm]:
+            raise ValueError(f"Perfil de coste desconocido: {profile}")
+        self.algorithm = algorithm
+        self.profile = profile
+        self.params = COST_PROFILES[algorithm][profile]
+        self._argon2 = None
+        if algorithm == 'argon2id':
+            self._argon2 = self._argon2_hasher(self.params)
+
+    @staticmethod
+    def _argon2_hasher(params: Dict[str, int]):
+        try:
+            from argon2 import PasswordHasher as Argon2Hasher
+        except ImportError as e:
+            raise ImportError("SOFIA_PASSWORD_ALGORITHM=argon2id requiere `pip install argon2-cffi`") from e
+        return Argon2Hasher(**params)
+
+    def hash(self, password: str) -> str:
+        """Hash de `password` con una sal aleatoria."""
+        if self._argon2 is not None:
+            return self._argon2.hash(password)
+        salt = os.urandom(16)
+        if self.algorithm == 'scrypt':
+            n, r, p = self.params['n'], self.params['r'], self.params['p']
+            digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r)
+            return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+        iterations = self.params['iterations']
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Comprobar `password` contra un hash en cualquiera de los formatos soportados."""
+        try:
+            if password_hash.startswith('$argon2'):
+                from argon2.exceptions import VerificationError
+                hasher = self._argon2 or self._argon2_hasher(COST_PROFILES['argon2id']['default'])
+                try:
+                    return hasher.verify(password_hash, password)
+                except VerificationError:
+                    return False
+            if password_hash.startswith('scrypt$'):
+                _, n, r, p, salt, digest = password_hash.split('$')
+                n, r, p = int(n), int(r), int(p)
+                candidate = hashlib.scrypt(password.encode(), salt=_unb64(salt), n=n, r=r, p=p,
+                                           maxmem=256 * n * r)
+                return hmac.compare_digest(candidate, _unb64(digest))
+            if password_hash.startswith('pbkdf2_sha256$'):
+                _, iterations, salt, digest = password_hash.split('$')
+                candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), _unb64(salt), int(iterations))
+                return hmac.compare_digest(candidate, _unb64(digest))
+            return hmac.compare_digest(legacy_hash(password), password_hash)
+        except (ValueError, ImportError):
+            return False
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Indica si el hash usa otro algoritmo o parámetros que los configurados."""
+        if self._argon2 is not None:
+            return not password_hash.startswith('$argon2') or self._argon2.check_needs_rehash(password_hash)
+        if self.algorithm == 'scrypt':
+            n, r, p = self.params['n'], self.params['r'], self.params['p']
+            return not password_hash.startswith(f"scrypt${n}${r}${p}$")
+        return not password_hash.startswith(f"pbkdf2_sha256${self.params['iterations']}$")
+
+
+def legacy_hash(password: str) -> str:
+    """SHA-256 con sal global usado por versiones anteriores (solo para verificar)."""
+    salt = os.getenv(LEGACY_SALT_ENV, 'sofia-salt-2024')
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+
+class PasswordPool:
+    """Pool acotado de hilos para hashear y verificar contraseñas.
+
+    scrypt, PBKDF2 y Argon2 liberan el GIL, así que los hilos del pool corren en
+    paralelo sin bloquear a los de Streamlit. Si hay más de `max_pending`
+    operaciones esperando se rechaza la nueva con `PasswordPoolBusy`.
+    """
+
+    def __init__(self, hasher: PasswordHasher, max_workers: int = 2, max_pending: int = 64,
+                 timeout: float = 30.0):
+        self.hasher = hasher
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='sofia-passwords')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _run(self, operation: str, fn: Callable[[], T]) -> T:
+        # Import diferido: prometheus_client no debe cargarse al importar `deepagents.auth`
+        from . import monitoring
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                monitoring.PASSWORD_REJECTED.inc()
+                raise PasswordPoolBusy(f"Demasiadas operaciones de contraseña en cola ({self._pending})")
+            self._pending += 1
+            monitoring.PASSWORD_QUEUE_DEPTH.set(self._pending)
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            monitoring.PASSWORD_QUEUE_WAIT.observe(started - submitted)
+            try:
+                return fn()
+            finally:
+                monitoring.PASSWORD_HASH_DURATION.labels(operation=operation).observe(time.perf_counter() - started)
+
+        # `_pending` cuenta el trabajo real del executor: se descuenta al terminar la
+        # tarea, no cuando quien llama deja de esperar
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            self._task_done(None)
+            raise
+        future.add_done_callback(self._task_done)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            monitoring.PASSWORD_REJECTED.inc()
+            raise PasswordPoolBusy(f"La operación de contraseña superó {self.timeout:.0f}s") from e
+
+    def _task_done(self, future: Optional[concurrent.futures.Future]):
+        from . import monitoring
+
+        with self._lock:
+            self._pending -= 1
+            monitoring.PASSWORD_QUEUE_DEPTH.set(self._pending)
+
+    def hash(self, password: str) -> str:
+        return self._run('hash', lambda: self.hasher.hash(password))
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self._run('verify', lambda: self.hasher.verify(password, password_hash))
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool: Optional[PasswordPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_password_pool() -> PasswordPool:
+    """Pool compartido, configurado con `SOFIA_PASSWORD_ALGORITHM`, `SOFIA_PASSWORD_PROFILE`,
+    `SOFIA_PASSWORD_WORKERS` y `SOFIA_PASSWORD_QUEUE`."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                hasher = PasswordHasher(
+                    algorithm=os.getenv('SOFIA_PASSWORD_ALGORITHM', 'scrypt'),
+                    profile=os.getenv('SOFIA_PASSWORD_PROFILE', 'default'),
+                )
+                _pool = PasswordPool(
+                    hasher,
+                    max_workers=int(os.getenv('SOFIA_PASSWORD_WORKERS', str(min(4, os.cpu_count() or 1)))),
+                    max_pending=int(os.getenv('SOFIA_PASSWORD_QUEUE', '64')),
+                )
+    return _pool
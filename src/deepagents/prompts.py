@@ -275,3 +275,35 @@ Usage:
 - Results are returned using cat -n format, with line numbers starting at 1
 - You have the capability to call multiple tools in a single response. It is always better to speculatively read multiple files as a batch that are potentially useful. 
 - If you read a file that exists but has empty contents you will receive a system reminder warning in place of file contents."""
+
+# Compact prompt profile: condensed versions of the descriptions above, used by
+# `create_deep_agent(prompt_profile="compact")`. They keep every usage rule the
+# tools rely on but drop the worked examples.
+WRITE_TODOS_DESCRIPTION_COMPACT = """Create and update a structured todo list for the current task, so you and the user can track progress.
+
+Use it for tasks with 3+ steps, multiple requested items, or new instructions; skip it for single, trivial or purely conversational requests.
+
+States: pending, in_progress (only ONE at a time, set before starting), completed (only when FULLY done; keep in_progress if blocked or partial). Mark todos completed immediately, never in batches, and remove todos that are no longer relevant. Always send the full list."""
+
+TASK_DESCRIPTION_PREFIX_COMPACT = """Launch a subagent to handle a complex, multi-step task autonomously.
+
+Available agent types:
+- general-purpose: researching complex questions and executing multi-step tasks. (Tools: *)
+{other_agents}
+"""
+
+TASK_DESCRIPTION_SUFFIX_COMPACT = """Set `subagent_type` to one of the types above.
+
+Notes:
+1. Launch independent subagents in parallel with multiple tool calls in one message.
+2. Each run is stateless and returns a single final message that the user does not see; summarize it for the user.
+3. The description must be self-contained: say exactly what to do, whether to research or create content, and what to return.
+4. Do not use it for tasks you can do with one or two direct tool calls."""
+
+EDIT_DESCRIPTION_COMPACT = """Performs exact string replacements in a file.
+
+- Read the file first. Copy `old_string` exactly as it appears after the line-number prefix (spaces + line number + tab), never including the prefix.
+- The edit fails if `old_string` is not unique; add surrounding context or set `replace_all` to replace every instance.
+- Prefer editing existing files over writing new ones."""
+
+TOOL_DESCRIPTION_COMPACT = """Reads a file. Returns up to `limit` lines (default 2000) starting at line `offset`, in cat -n format (line numbers start at 1); lines longer than 2000 characters are truncated. Read the whole file unless it is long. Missing files return an error; empty files return a reminder."""
@@ -0,0 +1,38 @@
+"""Process-wide background event loop for driving agents from synchronous code.
+
+Keeping a single long-lived loop (instead of one loop per run) lets loop-bound
+resources such as pooled HTTP connections be reused across runs.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background loop, starting its thread on first use."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="deepagents-loop", daemon=True
+                )
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def peek_background_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Return the shared background loop if it has been started, else `None`."""
+    return _loop
+
+
+def run_coroutine(coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+    """Schedule `coro` on the background loop and return a thread-safe future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop())
@@ -0,0 +1,82 @@
+"""Bounded-concurrency scheduling for subagent runs spawned by the `task` tool."""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+
+def _check_limit(name: str, value: Optional[int]):
+    if value is not None and (not isinstance(value, int) or value < 1):
+        raise ValueError(f"{name} must be a positive integer or None, got {value!r}")
+
+
+class SubAgentScheduler:
+    """Limits how many subagents run at once, globally and per subagent type.
+
+    Semaphores are created lazily per event loop, so a single compiled agent can
+    be reused across runs that each drive their own loop.
+
+    Args:
+        max_concurrency: Maximum number of subagents running at the same time,
+            across all types. `None` means unbounded.
+        per_type_limits: Optional mapping of subagent type to its own cap.
+        default_timeout: Deadline in seconds for a single subagent run.
+            `None` means no deadline.
+        per_type_timeouts: Optional mapping of subagent type to its deadline.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_type_limits: Optional[dict[str, int]] = None,
+        default_timeout: Optional[float] = None,
+        per_type_timeouts: Optional[dict[str, float]] = None,
+    ):
+        _check_limit("max_concurrency", max_concurrency)
+        for subagent_type, limit in (per_type_limits or {}).items():
+            _check_limit(f"per_type_limits[{subagent_type!r}]", limit)
+        self.max_concurrency = max_concurrency
+        self.per_type_limits = dict(per_type_limits or {})
+        self.default_timeout = default_timeout
+        self.per_type_timeouts = dict(per_type_timeouts or {})
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def add_type_limit(self, subagent_type: str, limit: int):
+        """Cap `subagent_type` at `limit` concurrent runs unless it already has a cap."""
+        _check_limit(f"max_concurrency of {subagent_type!r}", limit)
+        self.per_type_limits.setdefault(subagent_type, limit)
+
+    def timeout_for(self, subagent_type: str) -> Optional[float]:
+        """Return the deadline (in seconds) for a run of `subagent_type`."""
+        return self.per_type_timeouts.get(subagent_type, self.default_timeout)
+
+    def _loop_semaphores(self) -> dict[Optional[str], asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = {}
+            if self.max_concurrency is not None:
+                semaphores[None] = asyncio.Semaphore(self.max_concurrency)
+            for subagent_type, limit in self.per_type_limits.items():
+                semaphores[subagent_type] = asyncio.Semaphore(limit)
+            self._semaphores[loop] = semaphores
+        return semaphores
+
+    @asynccontextmanager
+    async def slot(self, subagent_type: str) -> AsyncIterator[None]:
+        """Wait for a free slot for `subagent_type` and hold it while running."""
+        semaphores = self._loop_semaphores()
+        # Always acquire the per-type slot first so a saturated type does not
+        # hold global slots that other types could use.
+        acquired = []
+        try:
+            for key in (subagent_type, None):
+                semaphore = semaphores.get(key)
+                if semaphore is not None:
+                    await semaphore.acquire()
+                    acquired.append(semaphore)
+            yield
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
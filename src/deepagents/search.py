@@ -0,0 +1,224 @@
+"""
+Herramienta de búsqueda web (Tavily) para SOF-IA.
+Ofrece una variante síncrona y una asíncrona que comparte un pool httpx keep-alive
+con límite de concurrencia, de modo que las búsquedas paralelas de un mismo turno
+se solapan en el event loop en lugar de ocupar hilos del executor.
+La herramienta del agente compacta los resultados antes de añadirlos al historial.
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Annotated, Any, Dict, Literal, Optional
+
+import httpx
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import InjectedToolCallId, StructuredTool
+from langgraph.types import Command
+
+from .config import get_tavily_api_key
+from .file_store import store_content
+from .health import track_dependency
+from .search_cache import acached_search, cached_search, make_cache_key
+from .passages import select_passages
+from .search_results import format_full_payload, format_search_results, shape_search_response
+
+logger = logging.getLogger(__name__)
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+SEARCH_TOOL_DESCRIPTION = """Run a web search using Tavily.
+
+Use this to run an internet search for a given query. You can specify the number of
+results, the topic ("general", "news" or "finance"), and whether raw page content
+should be included. Long results are truncated; when that happens the full results
+are saved to a file you can read with `read_file`."""
+
+
+def _require_tavily_api_key() -> str:
+    tavily_api_key = get_tavily_api_key()
+    if not tavily_api_key:
+        raise RuntimeError("Falta TAVILY_API_KEY para búsquedas en internet (Tavily). Configure las variables de entorno o use encriptación.")
+    return tavily_api_key
+
+
+# Cliente síncrono, inicializado una sola vez de forma segura entre hilos
+_tavily_client = None
+_tavily_client_lock = threading.Lock()
+
+
+def get_tavily_client():
+    """Obtener el cliente Tavily síncrono compartido."""
+    global _tavily_client
+    if _tavily_client is None:
+        with _tavily_client_lock:
+            if _tavily_client is None:
+                from tavily import TavilyClient
+                _tavily_client = TavilyClient(api_key=_require_tavily_api_key())
+    return _tavily_client
+
+
+class AsyncTavilySearch:
+    """Cliente Tavily asíncrono sobre un `httpx.AsyncClient` con conexiones persistentes.
+
+    `transport` sustituye al transporte HTTP (p. ej. `httpx.MockTransport` en pruebas).
+    """
+
+    def __init__(self, api_key: str, max_concurrency: int = 8, max_connections: int = 20,
+                 timeout: float = 30.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def search(self, query: str, max_results: int = 5, topic: str = "general",
+                     include_raw_content: bool = False) -> Dict[str, Any]:
+        """Ejecutar una búsqueda; devuelve el mismo dict que `TavilyClient.search`."""
+        payload = {
+            "query": query,
+            "max_results": max_results,
+            "topic": topic,
+            "include_raw_content": include_raw_content,
+        }
+        async with self._semaphore:
+            response = await self._client.post(TAVILY_SEARCH_URL, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """Cerrar las conexiones del pool."""
+        await self._client.aclose()
+
+
+# Un cliente asíncrono por event loop: los pools de httpx quedan ligados al loop que los crea
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncTavilySearch]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def get_async_tavily_client() -> AsyncTavilySearch:
+    """Obtener el cliente asíncrono compartido para el event loop actual."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _async_clients_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = AsyncTavilySearch(
+                    api_key=_require_tavily_api_key(),
+                    max_concurrency=int(os.getenv("SOFIA_SEARCH_MAX_CONCURRENCY", "8")),
+                    max_connections=int(os.getenv("SOFIA_SEARCH_MAX_CONNECTIONS", "20")),
+                )
+                _async_clients[loop] = client
+    return client
+
+
+def internet_search(
+    query: str,
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+):
+    """Run a web search using Tavily."""
+    client = get_tavily_client()
+
+    def search(*args, **kwargs):
+        with track_dependency("tavily"):
+            return client.search(*args, **kwargs)
+
+    return cached_search(
+        search,
+        query,
+        max_results=max_results,
+        include_raw_content=include_raw_content,
+        topic=topic,
+    )
+
+
+async def ainternet_search(
+    query: str,
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+):
+    """Run a web search using Tavily without blocking the event loop."""
+    client = get_async_tavily_client()
+
+    async def search(*args, **kwargs):
+        with track_dependency("tavily"):
+            return await client.search(*args, **kwargs)
+
+    return await acached_search(
+        search,
+        query,
+        max_results=max_results,
+        include_raw_content=include_raw_content,
+        topic=topic,
+    )
+
+
+def _search_tool_output(response: Dict[str, Any], query: str, max_results: int, topic: str,
+                        include_raw_content: bool, tool_call_id: str) -> Command:
+    """Compactar la respuesta para el historial y guardar la completa si se recortó."""
+    # Del contenido bruto de las páginas solo llegan al modelo los pasajes más relevantes
+    top_k = int(os.getenv("SOFIA_SEARCH_PASSAGES", "6"))
+    selected = False
+    model_response = response
+    if include_raw_content and top_k > 0:
+        model_response, selected = select_passages(response, query, top_k=top_k)
+    shaped, truncated = shape_search_response(
+        model_response,
+        max_result_chars=int(os.getenv("SOFIA_SEARCH_RESULT_CHARS", "1200")),
+        max_total_chars=int(os.getenv("SOFIA_SEARCH_CALL_CHARS", "6000")),
+    )
+    update: Dict[str, Any] = {}
+    full_path = None
+    if truncated or selected:
+        key = make_cache_key(query, topic, max_results, include_raw_content)
+        full_path = f"search_results/{key[:12]}.md"
+        update["files"] = {full_path: store_content(format_full_payload(response))}
+    update["messages"] = [
+        ToolMessage(format_search_results(shaped, full_path), tool_call_id=tool_call_id)
+    ]
+    return Command(update=update)
+
+
+def _internet_search_tool(
+    query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+) -> Command:
+    response = internet_search(query, max_results, topic, include_raw_content)
+    return _search_tool_output(response, query, max_results, topic, include_raw_content, tool_call_id)
+
+
+async def _ainternet_search_tool(
+    query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+) -> Command:
+    response = await ainternet_search(query, max_results, topic, include_raw_content)
+    return _search_tool_output(response, query, max_results, topic, include_raw_content, tool_call_id)
+
+
+# Herramienta con ambas implementaciones: el grafo asíncrono usa `_ainternet_search_tool`
+internet_search_tool = StructuredTool.from_function(
+    func=_internet_search_tool,
+    coroutine=_ainternet_search_tool,
+    name="internet_search",
+    description=SEARCH_TOOL_DESCRIPTION,
+)
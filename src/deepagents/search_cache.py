@@ -0,0 +1,241 @@
+"""
+Caché de resultados de búsqueda web para SOF-IA.
+Combina un LRU en memoria con una capa persistente en SQLite y TTL por tópico.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# TTL por tópico (segundos): las noticias caducan rápido, lo general dura más
+DEFAULT_TOPIC_TTLS = {
+    'news': 15 * 60,
+    'finance': 60 * 60,
+    'general': 24 * 60 * 60,
+}
+
+
+def normalize_query(query: str) -> str:
+    """Normalizar una consulta para que variantes triviales compartan entrada."""
+    return " ".join(query.lower().split())
+
+
+def make_cache_key(query: str, topic: str, max_results: int, include_raw_content: bool) -> str:
+    """Construir la clave de caché a partir de los parámetros normalizados."""
+    payload = json.dumps(
+        [normalize_query(query), topic, int(max_results), bool(include_raw_content)],
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SearchCache:
+    """Caché de dos niveles (LRU en memoria + SQLite) para resultados de búsqueda."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 512,
+                 topic_ttls: Optional[Dict[str, float]] = None, default_ttl: float = 60 * 60,
+                 enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.topic_ttls = {**DEFAULT_TOPIC_TTLS, **(topic_ttls or {})}
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+
+        self._memory: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0}
+
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS search_cache ("
+                    "key TEXT PRIMARY KEY, topic TEXT NOT NULL, "
+                    "value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache(expires_at)"
+                )
+
+    def ttl_for(self, topic: str) -> float:
+        """TTL en segundos para un tópico."""
+        return self.topic_ttls.get(topic, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtener un resultado vigente o None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return copy.deepcopy(value)
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM search_cache WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._stats['disk_hits'] += 1
+                    return copy.deepcopy(value)
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any], topic: str = 'general'):
+        """Guardar un resultado con el TTL de su tópico."""
+        expires_at = time.time() + self.ttl_for(topic)
+        with self._lock:
+            self._remember(key, expires_at, copy.deepcopy(value))
+            self._stats['stores'] += 1
+            if self._conn is not None:
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO search_cache (key, topic, value, expires_at) "
+                            "VALUES (?, ?, ?, ?)",
+                            (key, topic, json.dumps(value), expires_at),
+                        )
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    logger.warning(f"No se pudo persistir resultado de búsqueda en caché: {e}")
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def record_bypass(self):
+        """Contabilizar una consulta que omitió la caché."""
+        with self._lock:
+            self._stats['bypassed'] += 1
+
+    def purge_expired(self) -> int:
+        """Eliminar entradas caducadas del nivel persistente."""
+        if self._conn is None:
+            return 0
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+            return cursor.rowcount
+
+    def clear(self):
+        """Vaciar ambos niveles de la caché."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM search_cache")
+
+    def close(self):
+        """Cerrar la conexión del nivel persistente."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de aciertos/fallos de la caché."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_default_cache: Optional[SearchCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Instancia compartida de la caché, configurada por variables de entorno."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = SearchCache(
+                    path=os.getenv('SOFIA_SEARCH_CACHE_PATH', 'sofia_search_cache.sqlite3') or None,
+                    max_entries=int(os.getenv('SOFIA_SEARCH_CACHE_SIZE', '512')),
+                    enabled=os.getenv('SOFIA_SEARCH_CACHE', 'on').lower() not in ('0', 'off', 'false'),
+                )
+    return _default_cache
+
+
+# Búsquedas idénticas en vuelo se agrupan en una sola llamada al proveedor
+search_flights = SingleFlight()
+
+
+def cached_search(search_fn: Callable[..., Dict[str, Any]], query: str, max_results: int = 5,
+                  topic: str = 'general', include_raw_content: bool = False,
+                  cache: Optional[SearchCache] = None, bypass_cache: bool = False) -> Dict[str, Any]:
+    """Ejecutar `search_fn` (p. ej. `TavilyClient.search`) pasando por la caché.
+
+    En un fallo de caché, las búsquedas idénticas concurrentes comparten una única
+    llamada al proveedor.
+    """
+    cache = cache or get_search_cache()
+    key = make_cache_key(query, topic, max_results, include_raw_content)
+
+    def fetch():
+        return search_fn(query, max_results=max_results, include_raw_content=include_raw_content, topic=topic)
+
+    if bypass_cache or not cache.enabled:
+        cache.record_bypass()
+        # Quien omite la caché quiere una respuesta nueva: no se une a otra en vuelo
+        return fetch() if bypass_cache else search_flights.do(key, fetch)
+
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    def fetch_and_store():
+        result = fetch()
+        cache.set(key, result, topic)
+        return result
+
+    return search_flights.do(key, fetch_and_store)
+
+
+async def acached_search(search_fn: Callable[..., Awaitable[Dict[str, Any]]], query: str,
+                         max_results: int = 5, topic: str = 'general',
+                         include_raw_content: bool = False, cache: Optional[SearchCache] = None,
+                         bypass_cache: bool = False) -> Dict[str, Any]:
+    """Versión asíncrona de `cached_search` para funciones de búsqueda `async`."""
+    cache = cache or get_search_cache()
+    key = make_cache_key(query, topic, max_results, include_raw_content)
+
+    async def fetch():
+        return await search_fn(query, max_results=max_results,
+                               include_raw_content=include_raw_content, topic=topic)
+
+    if bypass_cache or not cache.enabled:
+        cache.record_bypass()
+        return await (fetch() if bypass_cache else search_flights.ado(key, fetch))
+
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    async def fetch_and_store():
+        result = await fetch()
+        cache.set(key, result, topic)
+        return result
+
+    return await search_flights.ado(key, fetch_and_store)
@@ -0,0 +1,115 @@
+"""
+Compactación de resultados de búsqueda web para SOF-IA.
+Reduce la respuesta de Tavily a lo que el modelo necesita (título, URL y texto),
+elimina URLs duplicadas y limita el tamaño por resultado y por llamada antes de
+que el resultado entre en el historial de mensajes.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Campos de cada resultado que se conservan; el resto (score, favicon...) se descarta
+RESULT_FIELDS = ('title', 'url', 'content', 'raw_content')
+
+# Presupuestos por defecto (caracteres)
+DEFAULT_MAX_RESULT_CHARS = 1200
+DEFAULT_MAX_TOTAL_CHARS = 6000
+# Por debajo de este presupuesto restante no merece la pena incluir otro resultado
+MIN_RESULT_CHARS = 200
+
+
+def normalize_url(url: str) -> str:
+    """Normalizar una URL para detectar duplicados (esquema/host, fragmento, utm_*)."""
+    parts = urlsplit(url.strip())
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_')
+    ])
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def _truncate(text: str, max_chars: int) -> Tuple[str, bool]:
+    if len(text) <= max_chars:
+        return text, False
+    return text[:max_chars].rstrip() + '…', True
+
+
+def shape_search_response(response: Dict[str, Any],
+                          max_result_chars: int = DEFAULT_MAX_RESULT_CHARS,
+                          max_total_chars: int = DEFAULT_MAX_TOTAL_CHARS) -> Tuple[Dict[str, Any], bool]:
+    """Compactar una respuesta de Tavily.
+
+    Devuelve `(respuesta_compacta, recortada)`; `recortada` indica que se descartó
+    o truncó texto, de modo que conviene guardar la respuesta completa aparte.
+    """
+    shaped: Dict[str, Any] = {'query': response.get('query', '')}
+    if response.get('answer'):
+        shaped['answer'] = response['answer']
+
+    seen = set()
+    results: List[Dict[str, Any]] = []
+    remaining = max_total_chars
+    truncated = False
+    for result in response.get('results') or []:
+        url = result.get('url') or ''
+        key = normalize_url(url) if url else None
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+
+        if remaining < MIN_RESULT_CHARS:
+            truncated = True
+            continue
+
+        item = {field: result[field] for field in RESULT_FIELDS if result.get(field)}
+        # El texto del resultado (resumen + contenido de la página) comparte un presupuesto
+        budget = min(max_result_chars, remaining)
+        for field in ('content', 'raw_content'):
+            if field not in item:
+                continue
+            if budget <= 0:
+                del item[field]
+                truncated = True
+                continue
+            item[field], cut = _truncate(item[field], budget)
+            truncated = truncated or cut
+            budget -= len(item[field])
+            remaining -= len(item[field])
+        results.append(item)
+
+    shaped['results'] = results
+    return shaped, truncated
+
+
+def format_search_results(shaped: Dict[str, Any], full_path: Optional[str] = None) -> str:
+    """Formatear una respuesta compacta como texto para el `ToolMessage`."""
+    lines = []
+    if shaped.get('answer'):
+        lines += [f"Answer: {shaped['answer']}", ""]
+    for i, result in enumerate(shaped['results'], start=1):
+        lines.append(f"[{i}] {result.get('title', '')}".rstrip())
+        if result.get('url'):
+            lines.append(f"URL: {result['url']}")
+        if result.get('content'):
+            lines.append(result['content'])
+        if result.get('raw_content'):
+            lines += ["Page content:", result['raw_content']]
+        lines.append("")
+    if not shaped['results']:
+        lines.append(f"No results found for: {shaped.get('query', '')}")
+    if full_path:
+        lines.append(f"Results were truncated. The full results are saved in `{full_path}` (use `read_file`).")
+    return "\n".join(lines).strip()
+
+
+def format_full_payload(response: Dict[str, Any]) -> str:
+    """Formatear la respuesta completa (con contenido íntegro) para guardarla como archivo."""
+    lines = [f"# Search: {response.get('query', '')}", ""]
+    for i, result in enumerate(response.get('results') or [], start=1):
+        lines += [f"## [{i}] {result.get('title', '')}".rstrip(), f"URL: {result.get('url', '')}", ""]
+        if result.get('content'):
+            lines += [result['content'], ""]
+        if result.get('raw_content'):
+            lines += [result['raw_content'], ""]
+    return "\n".join(lines)
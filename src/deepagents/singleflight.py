@@ -0,0 +1,109 @@
+"""
+Coalescencia de peticiones idénticas en vuelo (single-flight) para SOF-IA.
+La primera llamada con una clave ejecuta la operación; las concurrentes con la
+misma clave esperan su resultado en lugar de repetirla.
+"""
+import asyncio
+import concurrent.futures
+import copy
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _LeaderAbandoned(Exception):
+    """La llamada líder se canceló o se interrumpió antes de terminar."""
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución.
+
+    Funciona entre hilos (`do`) y entre event loops (`ado`): las llamadas en vuelo
+    se representan con `concurrent.futures.Future`, que pueden esperarse desde
+    cualquier hilo o loop. Si la llamada líder se cancela (p. ej. un trabajo
+    cancelado o un subagente fuera de plazo), las que esperaban no heredan la
+    cancelación: una de ellas repite la operación como nueva líder.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, concurrent.futures.Future] = {}
+        self._stats = {'executed': 0, 'coalesced': 0}
+
+    def _join(self, key: Hashable):
+        """Devolver `(future, is_leader)` para la clave."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._in_flight[key] = future
+            self._stats['executed'] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: concurrent.futures.Future, result: Any = None,
+                error: Optional[BaseException] = None):
+        """Retirar la entrada en vuelo y después resolver el future de quienes esperan."""
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Cancelación o interrupción del líder: quienes esperan reintentan
+            future.set_exception(_LeaderAbandoned())
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Ejecutar `fn` o esperar la ejecución en curso con la misma clave."""
+        while True:
+            future, is_leader = self._join(key)
+            if is_leader:
+                break
+            try:
+                return copy.deepcopy(future.result())
+            except _LeaderAbandoned:
+                continue
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Versión asíncrona de `do` para operaciones `async`."""
+        while True:
+            future, is_leader = self._join(key)
+            if is_leader:
+                break
+            try:
+                # `shield`: cancelar a quien espera no debe cancelar el future compartido
+                return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+            except _LeaderAbandoned:
+                continue
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def in_flight(self) -> int:
+        """Número de operaciones en curso."""
+        with self._lock:
+            return len(self._in_flight)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Contadores de ejecuciones reales y peticiones coalescidas."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
@@ -1,5 +1,5 @@
 from langgraph.prebuilt.chat_agent_executor import AgentState
-from typing import NotRequired, Annotated
+from typing import NotRequired, Annotated, Optional
 from typing import Literal
 from typing_extensions import TypedDict
 
@@ -11,13 +11,47 @@ class Todo(TypedDict):
     status: Literal["pending", "in_progress", "completed"]
 
 
+# A files update only carries the paths that changed: new content for created or
+# modified files, `None` for deleted ones.
+FilesDelta = dict[str, Optional[str]]
+
+
 def file_reducer(l, r):
-    if l is None:
-        return r
-    elif r is None:
+    """Apply a `FilesDelta` to the current files.
+
+    Only the paths in the delta are touched. The current mapping is copied rather
+    than mutated, since it may still be referenced by a checkpoint being written
+    in the background. That copy is shallow (contents are shared, not copied) but
+    it is still linear in the number of paths: about 15 µs per 1,000 files, see
+    `benchmarks/bench_file_updates.py`. What the delta protocol makes independent
+    of filesystem size is the state update and the tool output of each step. With
+    a checkpointer, a step that changes `files` still stores the whole merged
+    mapping as a new channel version, so that write scales with the number of
+    paths (with a file store, the paths and their references rather than the
+    contents).
+    """
+    if r is None:
         return l
-    else:
-        return {**l, **r}
+    if l is None:
+        return {path: content for path, content in r.items() if content is not None}
+    merged = dict(l)
+    for path, content in r.items():
+        if content is None:
+            merged.pop(path, None)
+        else:
+            merged[path] = content
+    return merged
+
+
+def files_delta(before: dict[str, str], after: dict[str, str]) -> FilesDelta:
+    """Compute the `FilesDelta` that turns `before` into `after`."""
+    delta: FilesDelta = {
+        path: content for path, content in after.items() if before.get(path) != content
+    }
+    for path in before:
+        if path not in after:
+            delta[path] = None
+    return delta
 
 
 class DeepAgentState(AgentState):
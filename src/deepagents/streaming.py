@@ -0,0 +1,147 @@
+"""Incremental event streaming for deep agent runs.
+
+Turns the raw `astream` output of a compiled deep agent graph into a small set of
+UI-friendly events (model tokens, tool starts/ends, todo updates and the final
+state) so callers can render progress while the run is still going.
+"""
+
+import queue
+from typing import Any, AsyncIterator, Iterator, Literal, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from typing_extensions import TypedDict
+
+from deepagents.runtime import run_coroutine
+
+StreamEventType = Literal["token", "tool_start", "tool_end", "todos", "final"]
+
+
+class StreamEvent(TypedDict):
+    """Event emitted while a deep agent run is in progress.
+
+    `namespace` is empty for the main agent and holds the graph path
+    (e.g. `("tools:<id>",)`) for events raised inside a subagent.
+    """
+
+    type: StreamEventType
+    namespace: tuple[str, ...]
+    data: Any
+
+
+def _message_text(content: Any) -> str:
+    """Extract plain text from a message chunk's content (str or content blocks)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for block in content:
+            if isinstance(block, str):
+                parts.append(block)
+            elif isinstance(block, dict) and block.get("type") == "text":
+                parts.append(block.get("text", ""))
+        return "".join(parts)
+    return ""
+
+
+async def astream_agent_events(
+    agent,
+    inputs: Any,
+    config: Optional[RunnableConfig] = None,
+) -> AsyncIterator[StreamEvent]:
+    """Run `agent` and yield `StreamEvent`s as they happen.
+
+    Args:
+        agent: A compiled deep agent (as returned by `create_deep_agent`).
+        inputs: The graph input, e.g. `{"messages": [...]}`.
+        config: Optional runnable config (thread id, callbacks, ...).
+
+    The last event is always of type `final` and carries the final state of
+    the main agent.
+    """
+    final_state = None
+    async for namespace, mode, chunk in agent.astream(
+        inputs,
+        config=config,
+        stream_mode=["messages", "updates", "values"],
+        subgraphs=True,
+    ):
+        if mode == "messages":
+            message, _metadata = chunk
+            if isinstance(message, ToolMessage):
+                yield {
+                    "type": "tool_end",
+                    "namespace": namespace,
+                    "data": {
+                        "id": message.tool_call_id,
+                        "name": message.name,
+                        "content": message.content,
+                    },
+                }
+                continue
+            text = _message_text(message.content)
+            if text:
+                yield {"type": "token", "namespace": namespace, "data": text}
+        elif mode == "updates":
+            for node_update in chunk.values():
+                if not isinstance(node_update, dict):
+                    continue
+                for message in node_update.get("messages", []) or []:
+                    if isinstance(message, AIMessage):
+                        for tool_call in message.tool_calls:
+                            yield {
+                                "type": "tool_start",
+                                "namespace": namespace,
+                                "data": {
+                                    "id": tool_call["id"],
+                                    "name": tool_call["name"],
+                                    "args": tool_call["args"],
+                                },
+                            }
+                if "todos" in node_update:
+                    yield {
+                        "type": "todos",
+                        "namespace": namespace,
+                        "data": node_update["todos"],
+                    }
+        elif mode == "values" and not namespace:
+            final_state = chunk
+    yield {"type": "final", "namespace": (), "data": final_state}
+
+
+def stream_agent_events(
+    agent,
+    inputs: Any,
+    config: Optional[RunnableConfig] = None,
+) -> Iterator[StreamEvent]:
+    """Synchronous wrapper around `astream_agent_events`.
+
+    Drives the async stream on the shared background loop and hands each event
+    to the calling thread as soon as it is produced, so synchronous callers
+    (like a Streamlit script) can render progress. If the caller stops
+    iterating early, the run is cancelled.
+    """
+    events: queue.Queue = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for event in astream_agent_events(agent, inputs, config):
+                events.put(event)
+        except BaseException as e:
+            events.put(e)
+            raise
+        finally:
+            events.put(done)
+
+    future = run_coroutine(pump())
+    try:
+        while True:
+            item = events.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        future.cancel()
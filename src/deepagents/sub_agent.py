@@ -1,12 +1,21 @@
-from deepagents.prompts import TASK_DESCRIPTION_PREFIX, TASK_DESCRIPTION_SUFFIX
-from deepagents.state import DeepAgentState
+from deepagents.prompts import (
+    TASK_DESCRIPTION_PREFIX,
+    TASK_DESCRIPTION_SUFFIX,
+    TASK_DESCRIPTION_PREFIX_COMPACT,
+    TASK_DESCRIPTION_SUFFIX_COMPACT,
+)
+from deepagents.scheduler import SubAgentScheduler
+from deepagents.compaction import create_compaction_hook
+from deepagents.state import DeepAgentState, files_delta
 from langgraph.prebuilt import create_react_agent
 from langchain_core.tools import BaseTool
 from typing_extensions import TypedDict
 from langchain_core.tools import tool, InjectedToolCallId
 from langchain_core.messages import ToolMessage
 from langchain.chat_models import init_chat_model
-from typing import Annotated, NotRequired, Any
+from typing import Annotated, NotRequired, Any, Optional
+import asyncio
+from langgraph.errors import GraphBubbleUp
 from langgraph.types import Command
 
 from langgraph.prebuilt import InjectedState
@@ -19,11 +28,62 @@ class SubAgent(TypedDict):
     tools: NotRequired[list[str]]
     # Optional per-subagent model configuration
     model_settings: NotRequired[dict[str, Any]]
+    # Optional cap on how many runs of this subagent may execute at once
+    max_concurrency: NotRequired[int]
+    # Optional deadline (seconds) for a single run of this subagent
+    timeout: NotRequired[float]
+    # Optional token budget for the message history sent to this subagent's model
+    max_context_tokens: NotRequired[int]
 
 
-def _create_task_tool(tools, instructions, subagents: list[SubAgent], model, state_schema):
+async def _run_subagent(sub_agent, state, timeout: Optional[float]):
+    """Run a subagent, returning `(final_state, timed_out)`.
+
+    The run is streamed so that if the deadline expires, the last state reached
+    so far is returned instead of being discarded.
+    """
+    last_state = None
+    deadline = asyncio.timeout(timeout)
+    try:
+        async with deadline:
+            async for values in sub_agent.astream(state, stream_mode="values"):
+                last_state = values
+    except TimeoutError:
+        # A TimeoutError raised inside the subagent (e.g. by a tool) is a failure,
+        # not our deadline expiring
+        if not deadline.expired():
+            raise
+        return last_state, True
+    return last_state, False
+
+
+def _create_task_tool(
+    tools,
+    instructions,
+    subagents: list[SubAgent],
+    model,
+    state_schema,
+    scheduler: Optional[SubAgentScheduler] = None,
+    max_context_tokens: Optional[int] = None,
+    on_compact=None,
+    prompt_profile: str = "default",
+):
+    def compaction_hook(name, budget):
+        if budget is None:
+            return None
+        return create_compaction_hook(budget, on_compact=on_compact, agent=name)
+
     agents = {
-        "general-purpose": create_react_agent(model, prompt=instructions, tools=tools, checkpointer=False)
+        "general-purpose": create_react_agent(
+            model,
+            prompt=instructions,
+            tools=tools,
+            # Same state as the main agent, so tools that write `files` (e.g. the
+            # full search results) work here too
+            state_schema=state_schema,
+            pre_model_hook=compaction_hook("general-purpose", max_context_tokens),
+            checkpointer=False,
+        )
     }
     tools_by_name = {}
     for tool_ in tools:
@@ -43,16 +103,43 @@ def _create_task_tool(tools, instructions, subagents: list[SubAgent], model, sta
         else:
             sub_model = model
         agents[_agent["name"]] = create_react_agent(
-            sub_model, prompt=_agent["prompt"], tools=_tools, state_schema=state_schema, checkpointer=False
+            sub_model,
+            prompt=_agent["prompt"],
+            tools=_tools,
+            state_schema=state_schema,
+            pre_model_hook=compaction_hook(
+                _agent["name"], _agent.get("max_context_tokens", max_context_tokens)
+            ),
+            checkpointer=False,
         )
+    # Name each subagent's runs so callbacks and traces can attribute them to it
+    agents = {
+        name: agent.with_config({"metadata": {"lc_agent_name": name}})
+        for name, agent in agents.items()
+    }
+
+    if scheduler is None:
+        scheduler = SubAgentScheduler()
+    for _agent in subagents:
+        if "max_concurrency" in _agent:
+            scheduler.add_type_limit(_agent["name"], _agent["max_concurrency"])
+        if "timeout" in _agent:
+            scheduler.per_type_timeouts.setdefault(_agent["name"], _agent["timeout"])
 
     other_agents_string = [
         f"- {_agent['name']}: {_agent['description']}" for _agent in subagents
     ]
 
+    if prompt_profile == "compact":
+        description_prefix = TASK_DESCRIPTION_PREFIX_COMPACT
+        description_suffix = TASK_DESCRIPTION_SUFFIX_COMPACT
+    else:
+        description_prefix = TASK_DESCRIPTION_PREFIX
+        description_suffix = TASK_DESCRIPTION_SUFFIX
+
     @tool(
-        description=TASK_DESCRIPTION_PREFIX.format(other_agents=other_agents_string)
-        + TASK_DESCRIPTION_SUFFIX
+        description=description_prefix.format(other_agents=other_agents_string)
+        + description_suffix
     )
     async def task(
         description: str,
@@ -63,16 +150,38 @@ def _create_task_tool(tools, instructions, subagents: list[SubAgent], model, sta
         if subagent_type not in agents:
             return f"Error: invoked agent of type {subagent_type}, the only allowed types are {[f'`{k}`' for k in agents]}"
         sub_agent = agents[subagent_type]
+        files_before = dict(state.get("files", {}))
         state["messages"] = [{"role": "user", "content": description}]
-        result = await sub_agent.ainvoke(state)
+        timeout = scheduler.timeout_for(subagent_type)
+        async with scheduler.slot(subagent_type):
+            try:
+                result, timed_out = await _run_subagent(sub_agent, state, timeout)
+            except GraphBubbleUp:
+                # Interrupts (e.g. tool approval via `interrupt_config`) must reach the graph
+                raise
+            except Exception as e:
+                # Report the failure to the model instead of failing the whole
+                # step, so results from sibling subagents running in parallel survive.
+                return f"Error: subagent `{subagent_type}` failed: {type(e).__name__}: {e}"
+        if timed_out:
+            last_message = (result or {}).get("messages", [None])[-1]
+            if last_message is None or last_message.type != "ai" or not last_message.content:
+                return f"Error: subagent `{subagent_type}` did not finish within {timeout} seconds"
+            content = (
+                f"Warning: subagent `{subagent_type}` did not finish within {timeout} seconds. "
+                f"Partial result:\n\n{last_message.content}"
+            )
+        else:
+            content = result["messages"][-1].content
+        # A run that never wrote files may not carry the channel at all
+        if "files" in result:
+            changed_files = files_delta(files_before, result["files"])
+        else:
+            changed_files = {}
         return Command(
             update={
-                "files": result.get("files", {}),
-                "messages": [
-                    ToolMessage(
-                        result["messages"][-1].content, tool_call_id=tool_call_id
-                    )
-                ],
+                "files": changed_files,
+                "messages": [ToolMessage(content, tool_call_id=tool_call_id)],
             }
         )
 
@@ -3,6 +3,11 @@ from langgraph.types import Command
 from langchain_core.messages import ToolMessage
 from typing import Annotated
 from langgraph.prebuilt import InjectedState
+from array import array
+from collections import OrderedDict
+from itertools import accumulate
+import hashlib
+import threading
 
 from deepagents.prompts import (
     WRITE_TODOS_DESCRIPTION,
@@ -10,6 +15,7 @@ from deepagents.prompts import (
     TOOL_DESCRIPTION,
 )
 from deepagents.state import Todo, DeepAgentState
+from deepagents.file_store import is_ref, read_content, store_content
 
 
 @tool(description=WRITE_TODOS_DESCRIPTION)
@@ -31,6 +37,50 @@ def ls(state: Annotated[DeepAgentState, InjectedState]) -> list[str]:
     return list(state.get("files", {}).keys())
 
 
+# Line-offset indexes for file contents, keyed by a digest of the content so the
+# cache holds only offsets, never file bodies. File store references already are
+# content digests and are used as keys directly.
+_LINE_INDEX_MAX_ENTRIES = 64
+_line_indexes: "OrderedDict[str, array]" = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+def _line_index_key(value: str) -> str:
+    """Cache key for a `files` state value (a reference or the content itself)."""
+    if is_ref(value):
+        return value
+    return hashlib.blake2b(value.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _line_index(content: str, key: str) -> array:
+    """Return the start offset of every line in `content`, plus its length.
+
+    Line boundaries follow `str.splitlines`, so slicing between two offsets and
+    calling `splitlines()` yields exactly those lines.
+    """
+    with _line_indexes_lock:
+        offsets = _line_indexes.get(key)
+        if offsets is not None:
+            _line_indexes.move_to_end(key)
+            return offsets
+    offsets = array(
+        "q", accumulate(map(len, content.splitlines(keepends=True)), initial=0)
+    )
+    with _line_indexes_lock:
+        _line_indexes[key] = offsets
+        while len(_line_indexes) > _LINE_INDEX_MAX_ENTRIES:
+            _line_indexes.popitem(last=False)
+    return offsets
+
+
+def _invalidate_line_index(value) -> None:
+    """Drop the cached index for a `files` value that is being replaced."""
+    if value is None:
+        return
+    with _line_indexes_lock:
+        _line_indexes.pop(_line_index_key(value), None)
+
+
 @tool(description=TOOL_DESCRIPTION)
 def read_file(
     file_path: str,
@@ -43,38 +93,33 @@ def read_file(
     if file_path not in mock_filesystem:
         return f"Error: File '{file_path}' not found"
 
-    # Get file content
-    content = mock_filesystem[file_path]
+    # Get file content, resolving file store references
+    value = mock_filesystem[file_path]
+    content = read_content(value)
 
     # Handle empty file
-    if not content or content.strip() == "":
+    if not content or content.isspace():
         return "System reminder: File exists but has empty contents"
 
-    # Split content into lines
-    lines = content.splitlines()
+    # Look up line boundaries (computed once per content)
+    offsets = _line_index(content, _line_index_key(value))
+    line_count = len(offsets) - 1
 
     # Apply line offset and limit
     start_idx = offset
-    end_idx = min(start_idx + limit, len(lines))
+    end_idx = min(start_idx + limit, line_count)
 
     # Handle case where offset is beyond file length
-    if start_idx >= len(lines):
-        return f"Error: Line offset {offset} exceeds file length ({len(lines)} lines)"
-
-    # Format output with line numbers (cat -n format)
-    result_lines = []
-    for i in range(start_idx, end_idx):
-        line_content = lines[i]
-
-        # Truncate lines longer than 2000 characters
-        if len(line_content) > 2000:
-            line_content = line_content[:2000]
-
-        # Line numbers start at 1, so add 1 to the index
-        line_number = i + 1
-        result_lines.append(f"{line_number:6d}\t{line_content}")
-
-    return "\n".join(result_lines)
+    if start_idx >= line_count:
+        return f"Error: Line offset {offset} exceeds file length ({line_count} lines)"
+
+    # Slice just the requested window and format it with line numbers (cat -n
+    # format), truncating lines longer than 2000 characters
+    window = content[offsets[start_idx]:offsets[end_idx]].splitlines()
+    return "\n".join(
+        f"{line_number:6d}\t{line_content[:2000]}"
+        for line_number, line_content in enumerate(window, start=start_idx + 1)
+    )
 
 
 def write_file(
@@ -84,11 +129,10 @@ def write_file(
     tool_call_id: Annotated[str, InjectedToolCallId],
 ) -> Command:
     """Write to a file."""
-    files = state.get("files", {})
-    files[file_path] = content
+    _invalidate_line_index(state.get("files", {}).get(file_path))
     return Command(
         update={
-            "files": files,
+            "files": {file_path: store_content(content)},
             "messages": [
                 ToolMessage(f"Updated file {file_path}", tool_call_id=tool_call_id)
             ],
@@ -111,8 +155,8 @@ def edit_file(
     if file_path not in mock_filesystem:
         return f"Error: File '{file_path}' not found"
 
-    # Get current file content
-    content = mock_filesystem[file_path]
+    # Get current file content, resolving file store references
+    content = read_content(mock_filesystem[file_path])
 
     # Check if old_string exists in the file
     if old_string not in content:
@@ -137,11 +181,12 @@ def edit_file(
         )  # Replace only first occurrence
         result_msg = f"Successfully replaced string in '{file_path}'"
 
-    # Update the mock filesystem
-    mock_filesystem[file_path] = new_content
+    _invalidate_line_index(mock_filesystem[file_path])
+
+    # Only send the changed path; file_reducer merges it into the filesystem
     return Command(
         update={
-            "files": mock_filesystem,
+            "files": {file_path: store_content(new_content)},
             "messages": [ToolMessage(result_msg, tool_call_id=tool_call_id)],
         }
     )
@@ -0,0 +1,227 @@
+"""
+Almacén persistente de usuarios para SOF-IA.
+Tabla SQLite con búsqueda indexada por nombre de usuario, compartida entre
+sesiones de Streamlit, procesos y réplicas que monten el mismo archivo. Las
+conexiones salen de un pool acotado (cada una con su caché de sentencias
+preparadas) y las lecturas pasan por una caché en proceso que se invalida con
+cada escritura local y caduca por TTL para ver los cambios de otros procesos.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = 'sofia_users.sqlite3'
+
+# Sentencias fijas: sqlite3 las prepara una vez por conexión (`cached_statements`)
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS users ("
+    "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, role TEXT NOT NULL, "
+    "enabled INTEGER NOT NULL DEFAULT 1, registered_at TEXT NOT NULL, updated_at REAL NOT NULL)"
+)
+_SELECT_USER = "SELECT password_hash, role, enabled, registered_at FROM users WHERE username = ?"
+_INSERT_USER = (
+    "INSERT INTO users (username, password_hash, role, enabled, registered_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_UPDATE_HASH = "UPDATE users SET password_hash = ?, updated_at = ? WHERE username = ?"
+_UPDATE_ENABLED = "UPDATE users SET enabled = ?, updated_at = ? WHERE username = ?"
+_COUNT_USERS = "SELECT COUNT(*) FROM users"
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite reutilizables entre hilos.
+
+    Las conexiones se crean bajo demanda hasta `size`; si todas están en uso se
+    espera hasta `timeout` segundos a que se libere una.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 10.0):
+        self.path = path
+        # Cada conexión a ':memory:' sería una base de datos distinta
+        self.size = 1 if path == ':memory:' else max(1, size)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=64)
+        if self.path != ':memory:':
+            # WAL: los lectores de otros procesos no bloquean a los escritores
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Tomar una conexión del pool y devolverla al salir."""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except sqlite3.Error:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Sin conexiones libres en el pool de {self.path}") from None
+
+    def close(self):
+        """Cerrar las conexiones ociosas."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class UserStore:
+    """Usuarios persistidos en SQLite con caché de lectura en proceso.
+
+    Los cambios hechos por otros procesos se ven, como mucho, `cache_ttl`
+    segundos después; los de este proceso, de inmediato.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, pool_size: int = 4, cache_ttl: float = 30.0,
+                 cache_size: int = 1024):
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._pool = ConnectionPool(path, size=pool_size)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Versión por usuario (y global) que sube con cada invalidación: una lectura
+        # que compitió con una escritura local no vuelve a meter la fila vieja en caché
+        self._versions: Dict[str, int] = {}
+        self._generation = 0
+        with self._pool.connection() as conn, conn:
+            conn.execute(_SCHEMA)
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Usuario con ese nombre, o None si no existe."""
+        # Import diferido: prometheus_client no debe cargarse al importar `deepagents.auth`
+        from . import monitoring
+
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(username)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(username)
+                monitoring.USER_STORE_LOOKUPS.labels(result='hit').inc()
+                return dict(entry[1])
+            version = (self._generation, self._versions.get(username, 0))
+
+        monitoring.USER_STORE_LOOKUPS.labels(result='miss').inc()
+        with self._pool.connection() as conn:
+            row = conn.execute(_SELECT_USER, (username,)).fetchone()
+        if row is None:
+            return None
+        user = {
+            'password_hash': row[0],
+            'role': row[1],
+            'enabled': bool(row[2]),
+            'registered_at': row[3],
+        }
+        with self._cache_lock:
+            if version != (self._generation, self._versions.get(username, 0)):
+                return dict(user)
+            self._cache[username] = (now + self.cache_ttl, user)
+            self._cache.move_to_end(username)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(user)
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) is not None
+
+    def create(self, username: str, password_hash: str, role: str = 'user', enabled: bool = True) -> bool:
+        """Crear un usuario; devuelve False si el nombre ya existe (también entre procesos)."""
+        try:
+            with self._pool.connection() as conn, conn:
+                conn.execute(_INSERT_USER, (username, password_hash, role, int(enabled),
+                                            datetime.utcnow().isoformat(), time.time()))
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            self.invalidate(username)
+        return True
+
+    def update_password_hash(self, username: str, password_hash: str) -> bool:
+        """Sustituir el hash de contraseña; devuelve False si el usuario no existe."""
+        return self._update(_UPDATE_HASH, (password_hash, time.time(), username), username)
+
+    def set_enabled(self, username: str, enabled: bool) -> bool:
+        """Activar o desactivar un usuario; devuelve False si no existe."""
+        return self._update(_UPDATE_ENABLED, (int(enabled), time.time(), username), username)
+
+    def _update(self, sql: str, params: tuple, username: str) -> bool:
+        try:
+            with self._pool.connection() as conn, conn:
+                return conn.execute(sql, params).rowcount > 0
+        finally:
+            self.invalidate(username)
+
+    def count(self) -> int:
+        """Número de usuarios almacenados."""
+        with self._pool.connection() as conn:
+            return conn.execute(_COUNT_USERS).fetchone()[0]
+
+    def invalidate(self, username: Optional[str] = None):
+        """Olvidar la entrada en caché de `username` (o todas)."""
+        with self._cache_lock:
+            if username is None:
+                self._cache.clear()
+                self._versions.clear()
+                self._generation += 1
+            else:
+                self._cache.pop(username, None)
+                self._versions[username] = self._versions.get(username, 0) + 1
+
+    def close(self):
+        self.invalidate()
+        self._pool.close()
+
+
+_default_store: Optional[UserStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_user_store() -> UserStore:
+    """Almacén compartido, configurado con `SOFIA_USER_DB_PATH`, `SOFIA_USER_DB_POOL`
+    y `SOFIA_USER_CACHE_TTL`."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = UserStore(
+                    path=os.getenv('SOFIA_USER_DB_PATH', DEFAULT_PATH),
+                    pool_size=int(os.getenv('SOFIA_USER_DB_POOL', '4')),
+                    cache_ttl=float(os.getenv('SOFIA_USER_CACHE_TTL', '30')),
+                )
+    return _default_store
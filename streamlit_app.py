@@ -1,7 +1,7 @@
 import os
 import sys
 import time
-from typing import Literal
+import uuid
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -16,7 +16,14 @@ if repo_src not in sys.path:
 
 try:
     from deepagents import create_deep_agent
-    from deepagents.config import get_gemini_api_key, get_tavily_api_key, validate_configuration
+    from deepagents.admission import AdmissionRejected, get_admission_controller, is_rate_limit_error
+    from deepagents.callbacks import AgentMetricsCallbackHandler
+    from deepagents.checkpoint import SQLiteSaver, has_unfinished_run, thread_config
+    from deepagents.file_store import SQLiteFileStore
+    from deepagents.jobs import JobAlreadyRunning, JobCancelled, get_job_runner
+    from deepagents.search import internet_search_tool
+    from deepagents.search_cache import get_search_cache, search_flights
+    from deepagents.config import get_gemini_api_key, validate_configuration
     from deepagents.monitoring import init_monitoring, log_user_action, log_agent_interaction, time_request, metrics
     from deepagents.ui import (
         init_responsive_layout, modern_header, status_message, enhanced_text_area,
@@ -27,8 +34,6 @@ except ImportError as e:
     st.error("Asegúrate de que todos los archivos estén en sus ubicaciones correctas.")
     st.stop()
 
-from tavily import TavilyClient
-
 # LangChain model provider
 from langchain_google_genai import ChatGoogleGenerativeAI  # for Gemini
 
@@ -46,39 +51,40 @@ def build_model(model_name: str | None = None):
     return ChatGoogleGenerativeAI(google_api_key=api_key, model=model, temperature=0.2)
 
 
-# It's best practice to initialize Tavily client once
-_tavily_client = None
-
-def get_tavily_client() -> TavilyClient:
-    global _tavily_client
-    if _tavily_client is None:
-        tavily_api_key = get_tavily_api_key()
-        if not tavily_api_key:
-            raise RuntimeError("Falta TAVILY_API_KEY para búsquedas en internet (Tavily). Configure las variables de entorno o use encriptación.")
-        _tavily_client = TavilyClient(api_key=tavily_api_key)
-    return _tavily_client
-
-
-def internet_search(
-    query: str,
-    max_results: int = 5,
-    topic: Literal["general", "news", "finance"] = "general",
-    include_raw_content: bool = False,
-):
-    """Run a web search using Tavily."""
-    client = get_tavily_client()
-    return client.search(
-        query,
-        max_results=max_results,
-        include_raw_content=include_raw_content,
-        topic=topic,
-    )
+@st.cache_resource
+def get_file_store() -> SQLiteFileStore:
+    """Almacén de archivos compartido por todas las sesiones del proceso."""
+    return SQLiteFileStore(os.getenv("SOFIA_FILE_STORE_PATH", "sofia_files.sqlite3"))
+
+
+@st.cache_resource
+def get_checkpointer() -> SQLiteSaver:
+    """Checkpointer compartido por todas las sesiones del proceso (una sola conexión)."""
+    return SQLiteSaver(os.getenv("SOFIA_CHECKPOINT_PATH", "sofia_checkpoints.sqlite3"))
 
 
 def init_agent(model_name: str | None, system_instructions: str):
     model = build_model(model_name)
-    tools = [internet_search]
-    return create_deep_agent(tools=tools, instructions=system_instructions, model=model)
+    tools = [internet_search_tool]
+    agent = create_deep_agent(
+        tools=tools,
+        instructions=system_instructions,
+        model=model,
+        # Limitar subagentes en paralelo para no exceder la cuota de Gemini
+        subagent_max_concurrency=int(os.getenv("SOFIA_MAX_PARALLEL_SUBAGENTS", "3")),
+        subagent_timeout=float(os.getenv("SOFIA_SUBAGENT_TIMEOUT", "300")),
+        # Contenido de archivos deduplicado y comprimido; el estado solo guarda referencias
+        file_store=get_file_store(),
+        # Checkpoints persistentes: las conversaciones y ejecuciones sobreviven a reinicios
+        checkpointer=get_checkpointer(),
+        # Presupuesto de tokens del historial: compacta resultados antiguos en ejecuciones largas
+        max_context_tokens=int(os.getenv("SOFIA_MAX_CONTEXT_TOKENS", "32000")),
+        on_compact=metrics.record_compaction,
+        # Descripciones de herramientas condensadas: menos tokens fijos por llamada al modelo
+        prompt_profile=os.getenv("SOFIA_PROMPT_PROFILE", "compact"),
+    )
+    # Latencias, tokens y pasos por llamada al modelo y por herramienta (también en subagentes)
+    return agent.with_config({"callbacks": [AgentMetricsCallbackHandler()]})
 
 
 def main():
@@ -206,6 +212,15 @@ def main():
             st.error(f"❌ Error inicializando el agente: {e}")
             st.stop()
 
+    # El hilo de conversación vive en la URL para poder retomarlo tras un reinicio del servidor
+    if "thread" not in st.query_params:
+        st.query_params["thread"] = uuid.uuid4().hex[:12]
+    # Los hilos se guardan por usuario autenticado o, si no, por sesión: un ?thread=
+    # ajeno en la URL no da acceso a los checkpoints ni a los trabajos de otro
+    user_info = st.session_state.get("user_info") or {}
+    user_id = user_info.get("username") or st.session_state.setdefault("session_uid", uuid.uuid4().hex)
+    run_config = thread_config(user_id, st.query_params["thread"])
+
     # Área principal de consulta
     st.markdown("## 💬 ¿Qué necesitas saber?")
 
@@ -235,6 +250,7 @@ def main():
             if st.button("🗑️ Limpiar", use_container_width=True):
                 st.session_state.pop("last_result", None)
                 st.session_state.pop("user_query", None)
+                st.query_params["thread"] = uuid.uuid4().hex[:12]
                 st.success("✅ Historial limpiado")
                 st.rerun()
 
@@ -283,68 +299,184 @@ def main():
             with col3:
                 st.metric("⚡ RPS", f"{stats['requests_per_second']:.2f}")
 
+            cache_stats = get_search_cache().get_stats()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("🗄️ Caché búsquedas", f"{cache_stats['hit_ratio']:.0%}")
+            with col2:
+                st.metric("✅ Aciertos", cache_stats['memory_hits'] + cache_stats['disk_hits'])
+            with col3:
+                st.metric("🌐 Fallos", cache_stats['misses'])
+            st.caption(f"🔗 Búsquedas coalescidas: {search_flights.get_stats()['coalesced']}")
+            st.caption(f"🗜️ Compactaciones de contexto: {stats['total_compactions']}")
+            if stats['processes'] > 1:
+                st.caption(f"🖥️ Valores agregados de {stats['processes']} procesos")
+
     # Usar la consulta del ejemplo si existe
     if 'user_query' in st.session_state and not user_query:
         user_query = st.session_state.user_query
 
-    if run and user_query.strip():
-        # Mostrar progreso
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        with st.spinner("🤖 Procesando tu consulta..."):
-            start_time = time.time()
+    # Las consultas corren como trabajos en segundo plano: sobreviven a re-ejecuciones,
+    # recargas del navegador y desconexiones. El trabajo en curso vive en la URL.
+    job_runner = get_job_runner(
+        retention=float(os.getenv("SOFIA_JOB_RETENTION", "3600")),
+        max_retained=int(os.getenv("SOFIA_JOB_MAX_RETAINED", "100")),
+    )
+    thread_key = run_config["configurable"]["thread_id"]
+    job = job_runner.get(st.query_params.get("job", ""))
+    if job is not None and job.key != thread_key:
+        job = None
+    if job is None:
+        # p. ej. la consulta se lanzó desde otra pestaña de la misma conversación
+        job = job_runner.find(thread_key)
+
+    # Ofrecer reanudar una ejecución que se interrumpió (error, reinicio del servidor...)
+    resume = False
+    if job is None and has_unfinished_run(st.session_state.agent, run_config):
+        st.warning("⚠️ La última consulta de esta conversación no terminó.")
+        resume = st.button("▶️ Reanudar desde el último paso completado")
+
+    status_box = None
+    if ((run and user_query.strip()) or resume) and job is not None and not job.done:
+        # Un clic repetido no paga dos veces la misma investigación
+        st.info("⏳ Ya hay una consulta en curso en esta conversación; se muestra su progreso.")
+
+    elif (run and user_query.strip()) or resume:
+        status_box = st.status("🤖 Procesando tu consulta...", expanded=True)
+
+        # Turno en el control de admisión: usuario autenticado o, si no, la sesión
+        admission = get_admission_controller()
+
+        def show_queue_position(position, estimated_wait):
+            status_box.update(label=f"⏳ En cola: posición {position} (~{estimated_wait:.0f}s de espera)")
+
+        def finish_turn(finished):
+            # Un 429 del proveedor reduce el límite global aunque nadie esté viendo el trabajo
+            if finished.error is not None and is_rate_limit_error(finished.error):
+                admission.report_rate_limited()
+            admission.release(finished.duration)
 
+        try:
+            admission.acquire(
+                user_id,
+                user_info.get("role", "user"),
+                on_wait=show_queue_position,
+            )
+        except AdmissionRejected as e:
+            status_box.update(label="🚦 Servicio saturado", state="error")
+            log_user_action('usuario', 'admission_rejected', {'reason': e.reason, 'query': user_query})
+            if e.reason == "rate_limited":
+                st.warning(f"⏱️ Has enviado varias consultas seguidas. Inténtalo de nuevo en {e.retry_after:.0f}s.")
+            else:
+                st.warning(f"🚦 Hay muchas consultas en curso. Inténtalo de nuevo en unos {max(e.retry_after, 5):.0f}s.")
+        else:
+            status_box.update(label="🤖 Procesando tu consulta...")
+            # Al reanudar no hay entrada nueva: el grafo continúa desde el último checkpoint
+            inputs = None if resume else {"messages": [{"role": "user", "content": user_query}]}
             try:
-                # Actualizar progreso
-                progress_bar.progress(25)
-                status_text.text("🔍 Buscando información...")
-
-                progress_bar.progress(50)
-                status_text.text("🧠 Analizando datos...")
-
-                # Ejecutar el agente
-                result = st.session_state.agent.invoke({
-                    "messages": [{"role": "user", "content": user_query}]
-                })
-
-                progress_bar.progress(75)
-                status_text.text("📝 Generando respuesta...")
+                job = job_runner.submit(
+                    st.session_state.agent, inputs, run_config,
+                    key=thread_key,
+                    owner=user_info.get("username"),
+                    metadata={"query": user_query},
+                    # El turno se libera al terminar el trabajo, no al terminar este script
+                    on_finish=finish_turn,
+                )
+            except JobAlreadyRunning as e:
+                # Otra pestaña lanzó una consulta en esta conversación mientras esperábamos turno
+                admission.release()
+                job = e.job
+                st.info("⏳ Ya hay una consulta en curso en esta conversación; se muestra su progreso.")
+            except Exception:
+                admission.release()
+                raise
+            st.query_params["job"] = job.id
+
+    if job is not None and st.session_state.get("shown_job") != job.id:
+        # Contenedores que se actualizan a medida que llegan eventos del agente
+        if status_box is None:
+            status_box = st.status("🤖 Procesando tu consulta...", expanded=True)
+        if not job.done and st.button("⏹️ Cancelar consulta", key=f"cancel_{job.id}"):
+            job.cancel()
+        todos_placeholder = status_box.empty()
+        answer_placeholder = st.empty()
+
+        answer_text = ""
+        tool_names = {}
+        job_query = job.metadata.get("query", "")
 
-                duration = time.time() - start_time
-                st.session_state.last_result = result
+        try:
+            # Repite lo ya ocurrido y sigue en vivo; si este script se interrumpe
+            # (clic, recarga), el trabajo continúa y se retoma en la siguiente ejecución
+            for event in job.stream():
+                is_main_agent = not event["namespace"]
+
+                if event["type"] == "token" and is_main_agent:
+                    answer_text += event["data"]
+                    answer_placeholder.markdown(answer_text + "▌")
+
+                elif event["type"] == "tool_start":
+                    tool_names[event["data"]["id"]] = event["data"]["name"]
+                    prefix = "↳ " if not is_main_agent else ""
+                    status_box.write(f"{prefix}🔧 `{event['data']['name']}` iniciado")
+                    if is_main_agent:
+                        # El texto previo a una llamada de herramienta es razonamiento intermedio
+                        answer_text = ""
+                        answer_placeholder.empty()
+
+                elif event["type"] == "tool_end":
+                    name = event["data"]["name"] or tool_names.get(event["data"]["id"], "tool")
+                    prefix = "↳ " if not is_main_agent else ""
+                    status_box.write(f"{prefix}✅ `{name}` completado")
+
+                elif event["type"] == "todos" and is_main_agent:
+                    icons = {"pending": "⬜", "in_progress": "⏳", "completed": "✅"}
+                    todos_placeholder.markdown("\n".join(
+                        f"{icons.get(todo['status'], '⬜')} {todo['content']}" for todo in event["data"]
+                    ))
+
+            result = job.result
+            duration = job.duration or 0.0
+            answer_placeholder.empty()
+            status_box.update(label="✅ ¡Respuesta lista!", state="complete", expanded=False)
+            st.session_state.last_result = result
+
+            # Log de interacción
+            response_length = len(str(result))
+            log_agent_interaction('deep_agent', job_query, response_length, duration)
+
+            if job.first_token_at is not None:
+                first_token_time = job.first_token_at - job.started_at
+                st.success(f"🎉 Respuesta generada en {duration:.1f} segundos (primer token en {first_token_time:.1f}s)")
+            else:
+                st.success(f"🎉 Respuesta generada en {duration:.1f} segundos")
 
-                # Log de interacción
-                response_length = len(str(result))
-                log_agent_interaction('deep_agent', user_query, response_length, duration)
+        except JobCancelled:
+            answer_placeholder.empty()
+            status_box.update(label="⏹️ Consulta cancelada", state="error", expanded=False)
+            log_user_action('usuario', 'agent_cancelled', {'duration': job.duration, 'query': job_query})
 
-                progress_bar.progress(100)
-                status_text.text("✅ ¡Respuesta lista!")
+        except Exception as e:
+            duration = job.duration or 0.0
+            answer_placeholder.empty()
+            status_box.update(label="❌ Error al procesar la consulta", state="error")
 
-                # Limpiar después de un momento
-                time.sleep(1)
-                progress_bar.empty()
-                status_text.empty()
+            st.error(f"❌ Error al procesar la consulta: {str(e)}")
+            log_user_action('usuario', 'agent_error', {'error': str(e), 'duration': duration, 'query': job_query})
 
-                st.success(f"🎉 Respuesta generada en {duration:.1f} segundos")
+            # Sugerencias de solución
+            with st.expander("💡 Sugerencias"):
+                st.markdown("""
+                **Posibles soluciones:**
+                - Verifica tu conexión a internet
+                - Revisa que las API keys sean válidas
+                - Intenta reformular tu pregunta
+                - Si el problema persiste, contacta al soporte
+                """)
 
-            except Exception as e:
-                duration = time.time() - start_time
-                progress_bar.empty()
-                status_text.empty()
-
-                st.error(f"❌ Error al procesar la consulta: {str(e)}")
-                log_user_action('usuario', 'agent_error', {'error': str(e), 'duration': duration, 'query': user_query})
-
-                # Sugerencias de solución
-                with st.expander("💡 Sugerencias"):
-                    st.markdown("""
-                    **Posibles soluciones:**
-                    - Verifica tu conexión a internet
-                    - Revisa que las API keys sean válidas
-                    - Intenta reformular tu pregunta
-                    - Si el problema persiste, contacta al soporte
-                    """)
+        # El resultado ya se mostró: no repetirlo en las siguientes re-ejecuciones
+        st.session_state.shown_job = job.id
+        st.query_params.pop("job", None)
 
     # Mostrar resultados si existen
     if st.session_state.get("last_result"):
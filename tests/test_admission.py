@@ -0,0 +1,109 @@
+"""
+Pruebas del control de admisión de ejecuciones del agente.
+"""
+import threading
+import time
+
+import pytest
+
+from src.deepagents import admission as admission_module
+from src.deepagents.admission import AdmissionController, AdmissionRejected, is_rate_limit_error
+
+
+class _Rerun(BaseException):
+    """Como la excepción con la que Streamlit interrumpe un script en un rerun."""
+
+
+class TestAdmissionController:
+    """Pruebas de `AdmissionController`."""
+
+    def test_fair_queuing_between_users(self):
+        """Con un solo turno, quien tiene una consulta no espera a las tres de otro."""
+        controller = AdmissionController(max_concurrent=1, max_wait=100, user_burst=10)
+        controller.acquire('ocupa')
+        order, positions = [], []
+
+        def run(user):
+            with controller.admit(user, on_wait=lambda position, _: positions.append(position)):
+                order.append(user)
+
+        threads = []
+        for user in ('ana', 'ana', 'ana', 'beto'):
+            thread = threading.Thread(target=run, args=(user,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+        assert controller.get_stats()['queued'] == 4
+
+        controller.release()
+        for thread in threads:
+            thread.join(5)
+        assert order.index('beto') < 2
+        stats = controller.get_stats()
+        assert (stats['running'], stats['queued']) == (0, 0)
+        assert positions and min(positions) >= 1
+
+    def test_interrupted_wait_gives_back_its_turn(self):
+        """Si la espera se interrumpe, el turno no queda ocupado para siempre."""
+        controller = AdmissionController(max_concurrent=1, max_wait=100, user_burst=10)
+        controller.acquire('ocupa')
+
+        def interrupt(position, estimated):
+            raise _Rerun()
+
+        with pytest.raises(_Rerun):
+            controller.acquire('ana', on_wait=interrupt)
+        assert controller.get_stats()['queued'] == 0
+
+        # Interrumpida justo cuando ya se le había concedido el turno
+        def granted_then_interrupt(position, estimated):
+            controller.release()
+            raise _Rerun()
+
+        with pytest.raises(_Rerun):
+            controller.acquire('ana', on_wait=granted_then_interrupt)
+        stats = controller.get_stats()
+        assert (stats['running'], stats['queued']) == (0, 0)
+        with controller.admit('beto'):
+            pass
+
+    def test_idle_users_are_pruned(self, monkeypatch):
+        """El estado de los usuarios inactivos no crece sin límite."""
+        monkeypatch.setattr(admission_module, 'PRUNE_INTERVAL', 0.0)
+        controller = AdmissionController(max_concurrent=1, max_wait=100, user_rate=1000, user_burst=1)
+        for i in range(50):
+            with controller.admit(f'sesion-{i}'):
+                pass
+        time.sleep(0.01)
+        with controller.admit('ana'):
+            pass
+        assert set(controller._buckets) <= {'ana', 'sesion-49'}
+        assert len(controller._last_finish) <= 1
+
+    def test_rate_limit_and_load_shedding(self):
+        """El token bucket limita a cada usuario y la cola llena descarta de inmediato."""
+        controller = AdmissionController(max_concurrent=1, max_queue=0, user_rate=0.01, user_burst=2)
+        with controller.admit('ana'):
+            with pytest.raises(AdmissionRejected) as rejected:
+                controller.acquire('beto')
+            assert rejected.value.reason == 'queue_full'
+        controller.acquire('ana')
+        controller.release()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.acquire('ana')
+        assert rejected.value.reason == 'rate_limited'
+        assert rejected.value.retry_after > 0
+
+    def test_provider_throttling_halves_limit(self):
+        """Un 429 del proveedor reduce el límite global, que se recupera al terminar ejecuciones."""
+        controller = AdmissionController(max_concurrent=8, user_burst=100, throttle_cooldown=0)
+        assert is_rate_limit_error(RuntimeError("429 Resource has been exhausted"))
+        assert not is_rate_limit_error(ValueError("bad input"))
+
+        controller.report_rate_limited()
+        assert controller.limit == 4
+        for _ in range(40):
+            with controller.admit('ana'):
+                pass
+        assert controller.limit == 8
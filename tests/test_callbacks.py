@@ -0,0 +1,66 @@
+"""
+Pruebas de la instrumentación por llamada al modelo y por herramienta.
+"""
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.deepagents import monitoring
+from src.deepagents.callbacks import AgentMetricsCallbackHandler
+
+
+def _sample(name, **labels):
+    return monitoring.registry.get_sample_value(name, labels) or 0
+
+
+class TestAgentMetricsCallbackHandler:
+    """Pruebas del callback handler de métricas."""
+
+    def test_subagent_calls_are_labeled(self):
+        """Las llamadas dentro de un subagente se etiquetan con su nombre."""
+        handler = AgentMetricsCallbackHandler()
+        llm_before = _sample('sofia_llm_call_duration_seconds_count', agent='researcher', model='m')
+        tokens_before = _sample('sofia_llm_input_tokens_sum', agent='researcher', model='m')
+        tool_before = _sample('sofia_tool_duration_seconds_count', agent='main', tool='task', status='success')
+        steps_before = _sample('sofia_agent_steps_count', agent='researcher')
+
+        root, tool, sub, llm = uuid4(), uuid4(), uuid4(), uuid4()
+        handler.on_chain_start({}, {}, run_id=root)
+        handler.on_tool_start({'name': 'task'}, '', run_id=tool, parent_run_id=root)
+        handler.on_chain_start({}, {}, run_id=sub, parent_run_id=tool,
+                               metadata={'lc_agent_name': 'researcher'})
+        handler.on_chat_model_start({}, [], run_id=llm, parent_run_id=sub,
+                                    metadata={'ls_model_name': 'm'})
+        message = AIMessage(content='ok', usage_metadata={'input_tokens': 120, 'output_tokens': 8, 'total_tokens': 128})
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=llm)
+        handler.on_chain_end({}, run_id=sub)
+        handler.on_tool_end('resultado', run_id=tool)
+        handler.on_chain_end({}, run_id=root)
+
+        assert _sample('sofia_llm_call_duration_seconds_count', agent='researcher', model='m') == llm_before + 1
+        assert _sample('sofia_llm_input_tokens_sum', agent='researcher', model='m') == tokens_before + 120
+        assert _sample('sofia_tool_duration_seconds_count', agent='main', tool='task', status='success') == tool_before + 1
+        assert _sample('sofia_agent_steps_count', agent='researcher') == steps_before + 1
+        assert not handler._agents and not handler._agent_steps
+
+    def test_cancelled_runs_are_evicted(self):
+        """Las ejecuciones canceladas sin `*_end` se descartan al terminar su raíz."""
+        handler = AgentMetricsCallbackHandler()
+        errors_before = _sample('sofia_tool_duration_seconds_count', agent='researcher',
+                                tool='internet_search', status='error')
+
+        root, tool, sub, search = uuid4(), uuid4(), uuid4(), uuid4()
+        handler.on_chain_start({}, {}, run_id=root)
+        handler.on_tool_start({'name': 'task'}, '', run_id=tool, parent_run_id=root)
+        handler.on_chain_start({}, {}, run_id=sub, parent_run_id=tool,
+                               metadata={'lc_agent_name': 'researcher'})
+        handler.on_tool_start({'name': 'internet_search'}, '', run_id=search, parent_run_id=sub)
+        # El plazo del subagente vence: ni la búsqueda ni el subagente notifican su final
+        handler.on_tool_end('Error: plazo agotado', run_id=tool)
+        handler.on_chain_end({}, run_id=root)
+
+        assert _sample('sofia_tool_duration_seconds_count', agent='researcher',
+                       tool='internet_search', status='error') == errors_before + 1
+        assert not (handler._parents or handler._children or handler._agents
+                    or handler._agent_steps or handler._tool_calls)
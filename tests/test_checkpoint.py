@@ -0,0 +1,104 @@
+"""
+Pruebas del checkpointer SQLite de los deep agents.
+Valida la reanudación tras un fallo y la escritura incremental de canales.
+"""
+import asyncio
+import operator
+import threading
+from typing import Annotated
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from src.deepagents.checkpoint import SQLiteSaver, has_unfinished_run, thread_config
+
+
+class PipelineState(TypedDict):
+    steps: Annotated[list, operator.add]
+    notes: str
+
+
+def build_pipeline(checkpointer, calls, fail_on=None):
+    """Grafo de tres pasos que cuenta ejecuciones y puede fallar en un paso."""
+    def make_step(name):
+        def step(state):
+            calls.append(name)
+            if name == fail_on:
+                raise RuntimeError(f"fallo en {name}")
+            return {"steps": [name]}
+        return step
+
+    builder = StateGraph(PipelineState)
+    for name in ("buscar", "redactar", "revisar"):
+        builder.add_node(name, make_step(name))
+    builder.add_edge(START, "buscar")
+    builder.add_edge("buscar", "redactar")
+    builder.add_edge("redactar", "revisar")
+    builder.add_edge("revisar", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+class TestSQLiteSaver:
+    """Pruebas para el checkpointer persistente."""
+
+    def test_resume_after_crash_in_new_process(self, tmp_path):
+        """Una ejecución interrumpida continúa desde el último paso completado."""
+        path = str(tmp_path / 'checkpoints.sqlite3')
+        config = thread_config('ana', 'informe')
+        calls = []
+
+        with pytest.raises(RuntimeError):
+            build_pipeline(SQLiteSaver(path), calls, fail_on="redactar").invoke(
+                {"steps": [], "notes": "borrador"}, config)
+
+        graph = build_pipeline(SQLiteSaver(path), calls)
+        assert graph.get_state(config).next == ("redactar",)
+        assert has_unfinished_run(graph, config)
+        result = graph.invoke(None, config)
+        assert not has_unfinished_run(graph, config)
+
+        assert result["steps"] == ["buscar", "redactar", "revisar"]
+        assert calls == ["buscar", "redactar", "redactar", "revisar"]
+        assert graph.get_state(thread_config('otro', 'informe')).values == {}
+
+    def test_only_changed_channels_are_stored(self, tmp_path):
+        """Cada paso guarda solo los canales que cambiaron."""
+        saver = SQLiteSaver(str(tmp_path / 'checkpoints.sqlite3'))
+        config = thread_config('ana', 'informe')
+        build_pipeline(saver, []).invoke({"steps": [], "notes": "x" * 10_000}, config)
+
+        notes_blobs = saver._conn.execute(
+            "SELECT COUNT(*) FROM blobs WHERE channel = 'notes'").fetchone()[0]
+        checkpoints = saver._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        assert checkpoints == 5
+        assert notes_blobs == 1
+        assert len(list(saver.list(config, limit=2))) == 2
+
+    def test_async_resume_runs_sqlite_off_the_loop(self, tmp_path, monkeypatch):
+        """La API asíncrona reanuda igual y hace el trabajo SQLite fuera del event loop."""
+        saver = SQLiteSaver(str(tmp_path / 'checkpoints.sqlite3'))
+        config = thread_config('ana', 'informe')
+        threads = set()
+        put = saver.put
+
+        def recording_put(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return put(*args, **kwargs)
+
+        monkeypatch.setattr(saver, 'put', recording_put)
+
+        async def run():
+            calls = []
+            with pytest.raises(RuntimeError):
+                await build_pipeline(saver, calls, fail_on="redactar").ainvoke(
+                    {"steps": [], "notes": "borrador"}, config)
+            result = await build_pipeline(saver, calls).ainvoke(None, config)
+            history = [item async for item in saver.alist(config, limit=2)]
+            return result, calls, history
+
+        result, calls, history = asyncio.run(run())
+        assert result["steps"] == ["buscar", "redactar", "revisar"]
+        assert calls == ["buscar", "redactar", "redactar", "revisar"]
+        assert len(history) == 2
+        assert threads and threading.get_ident() not in threads
@@ -0,0 +1,69 @@
+"""
+Pruebas de la compactación del historial de mensajes.
+Valida que se respete el presupuesto sin romper pares llamada/resultado.
+"""
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.deepagents.compaction import compact_messages, create_compaction_hook
+
+
+def search_turn(i, size=4000):
+    """Turno con una llamada a herramienta y un resultado grande."""
+    return [
+        AIMessage(content="", tool_calls=[{"name": "internet_search", "args": {"query": f"q{i}"}, "id": f"c{i}"}]),
+        ToolMessage("resultado " * size, tool_call_id=f"c{i}"),
+    ]
+
+
+class TestCompaction:
+    """Pruebas para el paso de compactación previo al modelo."""
+
+    def test_under_budget_is_untouched(self):
+        """Un historial dentro del presupuesto se envía tal cual."""
+        messages = [HumanMessage("hola"), *search_turn(0, size=10)]
+        compacted, stats = compact_messages(messages, max_tokens=10_000)
+
+        assert compacted == messages
+        assert stats['ratio'] == 1.0 and stats['digested'] == stats['dropped'] == 0
+
+    def test_old_results_digested_and_recent_kept(self):
+        """Los resultados antiguos se resumen; la petición y los turnos recientes se conservan."""
+        messages = [HumanMessage("investiga")]
+        for i in range(4):
+            messages += search_turn(i)
+        compacted, stats = compact_messages(messages, max_tokens=12_000, keep_last=2)
+
+        assert stats['tokens_after'] <= 12_000 < stats['tokens_before']
+        assert compacted[0].content == "investiga"
+        assert compacted[-2:] == messages[-2:]
+        assert "characters omitted" in compacted[2].content
+        # Ningún resultado de herramienta queda separado de su llamada
+        call_ids = {tc['id'] for m in compacted if isinstance(m, AIMessage) for tc in m.tool_calls}
+        assert all(m.tool_call_id in call_ids for m in compacted if isinstance(m, ToolMessage))
+
+    def test_drops_oldest_turns_and_reports(self):
+        """Si resumir no basta se descartan los turnos más antiguos y se notifica."""
+        messages = [HumanMessage("investiga")]
+        for i in range(6):
+            messages += search_turn(i)
+        reports = []
+        hook = create_compaction_hook(6_000, keep_last=2, on_compact=reports.append, agent="research-agent")
+        compacted = hook({"messages": messages})["llm_input_messages"]
+
+        assert len(compacted) < len(messages)
+        assert not isinstance(compacted[1], ToolMessage)
+        assert reports[0]['agent'] == "research-agent" and reports[0]['dropped'] > 0
+        assert reports[0]['ratio'] < 1.0
+
+    def test_multi_turn_keeps_current_question(self):
+        """En una conversación de varios turnos se conserva la pregunta en curso."""
+        messages = [HumanMessage("pregunta 1"), *search_turn(0, size=300), AIMessage("respuesta 1"),
+                    HumanMessage("pregunta 2")]
+        for i in range(1, 10):
+            messages += search_turn(i, size=300)
+        compacted, stats = compact_messages(messages, max_tokens=2500)
+
+        questions = [m.content for m in compacted if isinstance(m, HumanMessage)]
+        assert questions == ["pregunta 1", "pregunta 2"]
+        assert stats['tokens_after'] <= 2500 and stats['dropped'] > 0
+        assert compacted[-6:] == messages[-6:]
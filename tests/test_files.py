@@ -0,0 +1,144 @@
+"""
+Pruebas del sistema de archivos virtual de los deep agents.
+Valida el protocolo de deltas entre herramientas y reducer.
+"""
+import pytest
+from src.deepagents.state import file_reducer, files_delta
+
+
+class TestFileDeltas:
+    """Pruebas para el protocolo de actualizaciones incrementales de archivos."""
+
+    def test_reducer_applies_upserts_and_deletions(self):
+        """El reducer aplica altas, cambios y borrados sin tocar el resto."""
+        files = {'a.md': 'A', 'b.md': 'B', 'c.md': 'C'}
+        merged = file_reducer(files, {'a.md': 'A2', 'b.md': None, 'd.md': 'D'})
+
+        assert merged == {'a.md': 'A2', 'c.md': 'C', 'd.md': 'D'}
+        assert files == {'a.md': 'A', 'b.md': 'B', 'c.md': 'C'}
+
+    def test_reducer_initial_and_empty_updates(self):
+        """Sin estado previo se ignoran borrados; sin update se conserva el estado."""
+        assert file_reducer(None, {'a.md': 'A', 'b.md': None}) == {'a.md': 'A'}
+        assert file_reducer({'a.md': 'A'}, None) == {'a.md': 'A'}
+
+    def test_files_delta_roundtrip(self):
+        """El delta calculado reproduce el estado final."""
+        before = {'keep.md': 'k', 'edit.md': 'v1', 'gone.md': 'x'}
+        after = {'keep.md': 'k', 'edit.md': 'v2', 'new.md': 'n'}
+        delta = files_delta(before, after)
+
+        assert delta == {'edit.md': 'v2', 'new.md': 'n', 'gone.md': None}
+        assert file_reducer(before, delta) == after
+
+
+class TestReadFileWindow:
+    """Pruebas para la lectura paginada con índice de líneas."""
+
+    def test_window_matches_full_split(self):
+        """La ventana coincide con dividir el archivo completo, con cualquier fin de línea."""
+        from src.deepagents.tools import read_file
+
+        content = "uno\r\ndos\rtres\n\ncinco" + "\n" + "x" * 2500
+        state = {'files': {'notas.md': content}}
+        lines = content.splitlines()
+
+        result = read_file.func('notas.md', state, offset=1, limit=4)
+        expected = "\n".join(f"{i + 1:6d}\t{lines[i]}" for i in range(1, 5))
+        assert result == expected
+
+        last = read_file.func('notas.md', state, offset=5, limit=10)
+        assert last == f"{6:6d}\t{'x' * 2000}"
+
+    def test_offset_beyond_end_and_edit_invalidation(self):
+        """Los errores de offset se mantienen y una edición invalida el índice."""
+        from src.deepagents.tools import _line_index_key, _line_indexes, edit_file, read_file
+
+        state = {'files': {'a.md': "hola\nmundo"}}
+        assert read_file.func('a.md', state, offset=5) == "Error: Line offset 5 exceeds file length (2 lines)"
+        key = _line_index_key("hola\nmundo")
+        assert key in _line_indexes
+        # El caché guarda solo los offsets, nunca el contenido
+        assert "hola\nmundo" not in _line_indexes
+
+        edit_file.func('a.md', 'mundo', 'equipo', state, tool_call_id='1')
+        assert key not in _line_indexes
+
+
+class TestFileStore:
+    """Pruebas para el almacén de contenido direccionado por hash."""
+
+    def test_drafts_share_chunks(self):
+        """Dos borradores casi iguales comparten la mayoría de sus chunks."""
+        from src.deepagents.file_store import InMemoryFileStore, is_ref
+
+        store = InMemoryFileStore()
+        draft = "".join(f"Párrafo {i}: resultados del análisis de mercado.\n" for i in range(2000))
+        ref1 = store.put(draft)
+        first = store.stats()
+        ref2 = store.put(draft.replace("Párrafo 1000:", "Párrafo revisado:"))
+
+        assert is_ref(ref1) and ref1 != ref2
+        assert store.put(draft) == ref1
+        stats = store.stats()
+        assert stats['blobs'] == 2
+        assert stats['chunks'] - first['chunks'] <= 2
+
+    def test_sqlite_store_persists_compressed(self, tmp_path):
+        """El almacén SQLite comprime y sobrevive a una nueva conexión."""
+        from src.deepagents.file_store import SQLiteFileStore, resolve_files
+
+        path = str(tmp_path / 'files.sqlite3')
+        content = "informe\n" * 5000
+        ref = SQLiteFileStore(path).put(content)
+
+        store = SQLiteFileStore(path)
+        assert store.get(ref) == content
+        assert resolve_files({'informe.md': ref, 'nota.md': 'texto plano'}, store) == {
+            'informe.md': content, 'nota.md': 'texto plano'}
+        stored = store._conn.execute("SELECT SUM(LENGTH(data)) FROM chunks").fetchone()[0]
+        assert stored < len(content) / 10
+        with pytest.raises(KeyError):
+            store.get('cas:sha256:' + '0' * 64)
+
+    def test_long_lines_are_chunked(self):
+        """Un JSON minificado en una sola línea también se divide y deduplica."""
+        from src.deepagents.file_store import MAX_CHUNK, InMemoryFileStore, _chunk
+
+        store = InMemoryFileStore()
+        minified = "[" + ",".join(f'{{"id":{i},"nombre":"fuente {i}"}}' for i in range(20000)) + "]"
+        store.put(minified)
+        first = store.stats()
+        store.put(minified.replace('"fuente 10000"', '"fuente revisada"'))
+        assert first['chunks'] > 10
+        assert store.stats()['chunks'] - first['chunks'] <= 2
+
+        opaque = "A" * (3 * MAX_CHUNK + 10)
+        assert [len(c) for c in _chunk(opaque.encode())] == [MAX_CHUNK] * 3 + [10]
+
+    def test_garbage_collection(self, tmp_path):
+        """Se borran los blobs sin referencias y los chunks que solo ellos usaban."""
+        from src.deepagents.checkpoint import SQLiteSaver, thread_config
+        from src.deepagents.file_store import InMemoryFileStore, SQLiteFileStore
+
+        base = "".join(f"Línea {i} del informe.\n" for i in range(3000))
+        for store in (InMemoryFileStore(), SQLiteFileStore(str(tmp_path / 'files.sqlite3'))):
+            live = store.put(base)
+            dead = store.put(base + "Apéndice descartado.\n" * 500)
+            # Recién escritos: un run en curso podría tenerlos sin checkpoint
+            assert store.collect_garbage([live]) == {'blobs_deleted': 0, 'chunks_deleted': 0}
+
+            result = store.collect_garbage([live], min_age=0)
+            assert result['blobs_deleted'] == 1 and result['chunks_deleted'] >= 1
+            assert store.get(live) == base
+            with pytest.raises(KeyError):
+                store.get(dead)
+
+        saver = SQLiteSaver(str(tmp_path / 'checkpoints.sqlite3'))
+        config = thread_config('ana', 'informe', checkpoint_ns='')
+        checkpoint = {
+            'v': 1, 'id': '1', 'ts': '', 'channel_versions': {'files': 1},
+            'channel_values': {'files': {'informe.md': live}}, 'versions_seen': {},
+        }
+        saver.put(config, checkpoint, {}, {'files': 1})
+        assert saver.file_refs() == {live}
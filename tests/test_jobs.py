@@ -0,0 +1,108 @@
+"""
+Pruebas de los trabajos en segundo plano de los deep agents.
+Valida que una ejecución se puede retomar desde otra llamada, cancelar y expirar.
+"""
+import asyncio
+import operator
+import time
+from typing import Annotated
+
+import pytest
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from src.deepagents.jobs import Job, JobAlreadyRunning, JobCancelled, JobRunner
+
+
+class ReportState(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def build_report(delay: float):
+    """Grafo de dos pasos; el primero tarda `delay` segundos."""
+    async def investigar(state):
+        await asyncio.sleep(delay)
+        return {"steps": ["investigar"]}
+
+    def redactar(state):
+        return {"steps": ["redactar"]}
+
+    builder = StateGraph(ReportState)
+    builder.add_node("investigar", investigar)
+    builder.add_node("redactar", redactar)
+    builder.add_edge(START, "investigar")
+    builder.add_edge("investigar", "redactar")
+    builder.add_edge("redactar", END)
+    return builder.compile()
+
+
+class TestJobRunner:
+    """Pruebas para `JobRunner` y `Job`."""
+
+    def test_same_key_is_rejected_while_running_and_replays(self):
+        """Un segundo envío para la misma conversación no lanza otra ejecución."""
+        runner = JobRunner()
+        finished = []
+        graph = build_report(0.2)
+
+        job = runner.submit(graph, {"steps": []}, key="ana:informe", on_finish=finished.append)
+        with pytest.raises(JobAlreadyRunning) as running:
+            runner.submit(graph, {"steps": []}, key="ana:informe", on_finish=finished.append)
+        assert running.value.job is job
+        assert runner.find("ana:informe") is job
+
+        assert job.wait(5)
+        assert job.status == "succeeded"
+        assert job.result["steps"] == ["investigar", "redactar"]
+        assert finished == [job]
+        # Cualquier lector posterior ve la ejecución completa desde el principio
+        events = list(runner.get(job.id).stream())
+        assert events[-1]["type"] == "final"
+        assert runner.find("ana:informe") is None
+
+    def test_cancel_and_retention(self):
+        """Cancelar detiene el trabajo; los terminados se expulsan por cantidad."""
+        runner = JobRunner(max_retained=1)
+        slow = runner.submit(build_report(30), {"steps": []}, key="ana:lento")
+        assert runner.cancel(slow.id) is True
+        with pytest.raises(JobCancelled):
+            list(slow.stream())
+        assert slow.status == "cancelled"
+        assert runner.cancel(slow.id) is False
+
+        quick = runner.submit(build_report(0), {"steps": []})
+        assert quick.wait(5)
+        assert runner.get(quick.id) is quick
+        assert runner.get(slow.id) is None
+
+    def test_cancelled_before_start_stays_cancelled(self):
+        """Un trabajo cancelado antes de arrancar no pasa a `running`."""
+        runner = JobRunner()
+        job = Job(key="ana:informe")
+        job.cancel()
+        asyncio.run(runner._run(job, build_report(0), {"steps": []}, None))
+        assert job.status == "cancelled" and job.started_at is None
+
+    def test_token_events_are_merged_after_finishing(self):
+        """Los tokens consecutivos de un mismo agente se fusionan al terminar."""
+        job = Job()
+        for text in ("Hola", ", ", "mundo"):
+            job._append({"type": "token", "namespace": (), "data": text})
+        job._append({"type": "token", "namespace": ("tools:1",), "data": "sub"})
+        job._append({"type": "final", "namespace": (), "data": {}})
+        job._finish("succeeded")
+
+        reader = job.stream()
+        next(reader)
+        assert job._compact() is False  # alguien está leyendo
+        reader.close()
+        assert job._compact() is True
+        assert [(e["type"], e["data"]) for e in job.stream()] == [
+            ("token", "Hola, mundo"), ("token", "sub"), ("final", {})]
+
+        runner = JobRunner(compact_after=0)
+        quick = runner.submit(build_report(0), {"steps": []})
+        assert quick.wait(5)
+        time.sleep(0.01)
+        runner.list()
+        assert quick._compacted
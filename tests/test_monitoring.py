@@ -0,0 +1,160 @@
+"""
+Pruebas del colector de métricas.
+"""
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.deepagents.exporter import start_exporter, stop_exporter
+from src.deepagents import runtime
+from src.deepagents import search_cache as search_cache_module
+from src.deepagents.health import DependencyHealth, _background_loop_check, _dependencies
+from src.deepagents.log_pipeline import BatchRotatingFileHandler, LogPipeline, PipelineQueueHandler
+from src.deepagents.monitoring import MetricsCollector
+
+
+
+@pytest.fixture(autouse=True)
+def isolated_search_cache(tmp_path, monkeypatch):
+    """`/readyz` consulta la caché de búsqueda: cada prueba usa la suya, fuera del repositorio."""
+    monkeypatch.setenv('SOFIA_SEARCH_CACHE_PATH', str(tmp_path / 'search_cache.sqlite3'))
+    monkeypatch.setattr(search_cache_module, '_default_cache', None)
+    yield
+    if search_cache_module._default_cache is not None:
+        search_cache_module._default_cache.close()
+
+
+class TestMetricsCollector:
+    """Pruebas de las estadísticas de `MetricsCollector`."""
+
+    def test_concurrent_requests_are_all_counted(self):
+        """Las peticiones registradas desde varios hilos se cuentan todas."""
+        collector = MetricsCollector()
+        before = collector.get_stats()
+
+        def record():
+            for _ in range(500):
+                collector.record_request('GET', '/test', 'success', 0.01)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        collector.record_error('TestError')
+
+        stats = collector.get_stats()
+        assert stats['total_requests'] == before['total_requests'] + 2000
+        assert stats['total_errors'] == before['total_errors'] + 1
+        assert stats['processes'] == 1
+
+
+class TestExporter:
+    """Pruebas del exportador de métricas y salud."""
+
+    def test_endpoints_and_readiness(self):
+        """El exportador es idempotente y `/readyz` refleja una dependencia caída."""
+        server = start_exporter(port=0, host='127.0.0.1')
+        try:
+            assert start_exporter() is server
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            assert b'sofia_requests_total' in urllib.request.urlopen(base + '/metrics').read()
+            assert 'total_requests' in json.loads(urllib.request.urlopen(base + '/stats').read())
+            assert urllib.request.urlopen(base + '/healthz').status == 200
+
+            dependency = DependencyHealth('test-dependency', failure_threshold=2)
+            _dependencies['test-dependency'] = dependency
+            dependency.record_failure(RuntimeError('caída'))
+            dependency.record_failure(RuntimeError('caída'))
+            try:
+                urllib.request.urlopen(base + '/readyz')
+                assert False, "se esperaba 503"
+            except urllib.error.HTTPError as e:
+                assert e.code == 503
+                assert json.loads(e.read())['checks']['dependencies']['test-dependency']['state'] == 'open'
+        finally:
+            _dependencies.pop('test-dependency', None)
+            stop_exporter()
+
+    def test_background_loop_depth_and_blocked_loop(self, monkeypatch):
+        """La profundidad se cuenta dentro del loop; un loop bloqueado no está listo."""
+        monkeypatch.setenv('SOFIA_READY_LOOP_TIMEOUT', '0.2')
+        loop = runtime.get_background_loop()
+        sleeping = [runtime.run_coroutine(asyncio.sleep(1)) for _ in range(3)]
+        ok, details = _background_loop_check()
+        assert ok and details['responsive'] and details['queue_depth'] >= 3
+
+        loop.call_soon_threadsafe(time.sleep, 0.5)
+        ok, details = _background_loop_check()
+        assert not ok and details['responsive'] is False
+        for future in sleeping:
+            future.cancel()
+
+
+class _BlockingHandler(logging.Handler):
+    """Handler que se bloquea hasta que se libera, para simular un disco lento."""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release_event = threading.Event()
+
+    def emit(self, record):
+        self.entered.set()
+        self.release_event.wait(5)
+
+
+class TestLogPipeline:
+    """Pruebas del pipeline de logging asíncrono."""
+
+    def _record(self, i):
+        return logging.LogRecord('test', logging.INFO, __file__, 1, 'línea %d', (i,), None)
+
+    def test_batches_and_rotates(self, tmp_path):
+        """El escritor vuelca todos los registros y rota el archivo por tamaño."""
+        path = tmp_path / 'app.log'
+        handler = BatchRotatingFileHandler(path, maxBytes=200, backupCount=20, delay=True)
+        pipeline = LogPipeline([handler])
+        for i in range(100):
+            pipeline.enqueue(self._record(i))
+        pipeline.stop()
+
+        lines = []
+        for name in [f"app.log.{n}" for n in range(20, 0, -1)] + ["app.log"]:
+            if (tmp_path / name).exists():
+                lines += (tmp_path / name).read_text().splitlines()
+        assert (tmp_path / 'app.log.1').exists()
+        assert lines == [f'línea {i}' for i in range(100)]
+
+    def test_drops_when_queue_is_full(self):
+        """Con el escritor bloqueado, el camino caliente no espera y descarta."""
+        handler = _BlockingHandler()
+        pipeline = LogPipeline([handler], queue_size=1)
+        pipeline.enqueue(self._record(0))
+        assert handler.entered.wait(5)
+        for i in range(1, 5):
+            pipeline.enqueue(self._record(i))
+        assert pipeline.dropped == 3
+        handler.release_event.set()
+        pipeline.stop()
+
+    def test_exceptions_are_formatted_before_queueing(self, tmp_path):
+        """La traza se formatea al encolar; el registro no retiene los frames."""
+        path = tmp_path / 'app.log'
+        pipeline = LogPipeline([BatchRotatingFileHandler(path, delay=True)])
+        queue_handler = PipelineQueueHandler(pipeline)
+        try:
+            raise ValueError("dato inválido")
+        except ValueError:
+            record = logging.LogRecord('test', logging.ERROR, __file__, 1, 'fallo', (), sys.exc_info())
+        queue_handler.emit(record)
+        assert record.exc_info is None and 'ValueError: dato inválido' in record.exc_text
+        pipeline.stop()
+        assert 'ValueError: dato inválido' in path.read_text()
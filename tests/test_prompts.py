@@ -0,0 +1,28 @@
+"""
+Pruebas de los perfiles de prompt de los deep agents.
+Valida que el perfil compacto reduzca el texto sin cambiar las herramientas.
+"""
+import pytest
+
+from src.deepagents.graph import _built_in_tools
+
+
+class TestPromptProfiles:
+    """Pruebas para el perfil de prompt compacto."""
+
+    def test_compact_tools_keep_schema_with_shorter_descriptions(self):
+        """Las herramientas compactas conservan nombre y argumentos con descripciones más cortas."""
+        default = {getattr(t, 'name', None) or t.__name__: t for t in _built_in_tools("default")}
+        compact = {getattr(t, 'name', None) or t.__name__: t for t in _built_in_tools("compact")}
+
+        assert default.keys() == compact.keys()
+        for name in ('write_todos', 'read_file', 'edit_file'):
+            assert len(compact[name].description) < len(default[name].description) / 2
+            assert compact[name].args == default[name].args
+        # Las descripciones por defecto no se modifican
+        assert _built_in_tools("default")[2].description == default['read_file'].description
+
+    def test_unknown_profile_rejected(self):
+        """Un perfil desconocido produce un error claro."""
+        with pytest.raises(ValueError):
+            _built_in_tools("tiny")
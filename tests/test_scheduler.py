@@ -0,0 +1,109 @@
+"""
+Pruebas del planificador de subagentes.
+Valida los límites de concurrencia y el plazo de cada ejecución.
+"""
+import asyncio
+from typing import Annotated
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import InjectedToolCallId, tool
+from langgraph.types import Command
+
+from src.deepagents.scheduler import SubAgentScheduler
+from src.deepagents.state import DeepAgentState
+from src.deepagents.sub_agent import _create_task_tool, _run_subagent
+
+
+class FakeSubAgent:
+    """Subagente que emite estados cada `step` segundos o lanza `error`."""
+
+    def __init__(self, steps=3, step=0.05, error=None):
+        self.steps = steps
+        self.step = step
+        self.error = error
+
+    async def astream(self, state, stream_mode="values"):
+        for i in range(self.steps):
+            await asyncio.sleep(self.step)
+            if self.error is not None:
+                raise self.error
+            yield {"messages": [f"paso {i}"]}
+
+
+class ScriptedModel(GenericFakeChatModel):
+    """Modelo falso que responde con los mensajes dados e ignora las herramientas."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool
+def guardar_resultados(tool_call_id: Annotated[str, InjectedToolCallId]):
+    """Guardar resultados completos en un fichero."""
+    return Command(update={
+        "files": {"search_results/abc.md": "resultados"},
+        "messages": [ToolMessage("guardado", tool_call_id=tool_call_id)],
+    })
+
+
+class TestSubAgentScheduler:
+    """Pruebas para `SubAgentScheduler`."""
+
+    def test_global_and_per_type_limits(self):
+        """Nunca se superan el límite global ni el de cada tipo."""
+        scheduler = SubAgentScheduler(max_concurrency=3, per_type_limits={"investigador": 1})
+        running = {"investigador": 0, "otro": 0, "total": 0}
+        peaks = {"investigador": 0, "total": 0}
+
+        async def run(subagent_type):
+            async with scheduler.slot(subagent_type):
+                running[subagent_type] += 1
+                running["total"] += 1
+                peaks["investigador"] = max(peaks["investigador"], running["investigador"])
+                peaks["total"] = max(peaks["total"], running["total"])
+                await asyncio.sleep(0.02)
+                running[subagent_type] -= 1
+                running["total"] -= 1
+
+        async def main():
+            await asyncio.gather(*(run(t) for t in ["investigador"] * 4 + ["otro"] * 6))
+
+        asyncio.run(main())
+        assert peaks == {"investigador": 1, "total": 3}
+
+    def test_invalid_limits_are_rejected(self):
+        """Un límite de 0 bloquearía para siempre: se rechaza al configurar."""
+        with pytest.raises(ValueError):
+            SubAgentScheduler(max_concurrency=0)
+        with pytest.raises(ValueError):
+            SubAgentScheduler(per_type_limits={"investigador": 0})
+        with pytest.raises(ValueError):
+            SubAgentScheduler().add_type_limit("investigador", -1)
+
+    def test_deadline_returns_partial_state(self):
+        """Al vencer el plazo se devuelve el último estado alcanzado."""
+        state, timed_out = asyncio.run(_run_subagent(FakeSubAgent(steps=100), {}, timeout=0.2))
+        assert timed_out is True
+        assert state is not None and state["messages"][0] != "paso 99"
+
+        state, timed_out = asyncio.run(_run_subagent(FakeSubAgent(steps=2), {}, timeout=5))
+        assert (timed_out, state["messages"]) == (False, ["paso 1"])
+
+    def test_inner_timeout_is_not_the_deadline(self):
+        """Un TimeoutError de dentro del subagente se propaga como fallo."""
+        with pytest.raises(TimeoutError):
+            asyncio.run(_run_subagent(FakeSubAgent(error=TimeoutError("herramienta")), {}, timeout=5))
+
+    def test_general_purpose_keeps_written_files(self):
+        """Los ficheros que escriben las herramientas del subagente general llegan al agente principal."""
+        model = ScriptedModel(messages=iter([
+            AIMessage("", tool_calls=[{"name": "guardar_resultados", "args": {}, "id": "c1"}]),
+            AIMessage("hecho"),
+        ]))
+        task = _create_task_tool([guardar_resultados], "instrucciones", [], model, DeepAgentState)
+        command = asyncio.run(task.coroutine(
+            description="investiga", subagent_type="general-purpose",
+            state={"messages": [], "files": {}}, tool_call_id="t1"))
+        assert command.update["files"] == {"search_results/abc.md": "resultados"}
@@ -0,0 +1,320 @@
+"""
+Pruebas de la capa de búsqueda web de SOF-IA.
+Valida la caché de resultados sin realizar llamadas reales a Tavily.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from src.deepagents import search as search_module
+from src.deepagents import search_cache as search_cache_module
+from src.deepagents.health import get_dependency
+from src.deepagents.search_cache import SearchCache, cached_search, make_cache_key
+
+
+def fake_search_response(query):
+    return {'query': query, 'results': [{'url': 'https://example.com', 'content': 'contenido'}]}
+
+
+class TestSearchCache:
+    """Pruebas para la caché de resultados de búsqueda."""
+
+    def test_normalized_queries_share_key(self):
+        """Consultas con distinto espaciado o mayúsculas comparten clave."""
+        assert make_cache_key("  Noticias  IA ", "news", 5, False) == make_cache_key("noticias ia", "news", 5, False)
+        assert make_cache_key("noticias ia", "news", 5, False) != make_cache_key("noticias ia", "general", 5, False)
+
+    def test_memory_hit_avoids_second_call(self):
+        """La segunda búsqueda idéntica se sirve desde memoria."""
+        cache = SearchCache()
+        search_fn = MagicMock(side_effect=lambda q, **kwargs: fake_search_response(q))
+
+        first = cached_search(search_fn, "energía solar", cache=cache)
+        second = cached_search(search_fn, "Energía   solar", cache=cache)
+
+        assert first == second
+        assert search_fn.call_count == 1
+        assert cache.get_stats()['memory_hits'] == 1
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """El nivel SQLite persiste entre instancias."""
+        path = str(tmp_path / "cache.sqlite3")
+        search_fn = MagicMock(side_effect=lambda q, **kwargs: fake_search_response(q))
+
+        cached_search(search_fn, "marte", cache=SearchCache(path=path))
+        cache = SearchCache(path=path)
+        result = cached_search(search_fn, "marte", cache=cache)
+
+        assert result['query'] == "marte"
+        assert search_fn.call_count == 1
+        assert cache.get_stats()['disk_hits'] == 1
+
+    def test_topic_ttl_expiry(self):
+        """Las entradas caducan según el TTL de su tópico."""
+        cache = SearchCache(topic_ttls={'news': 10})
+        key = make_cache_key("elecciones", "news", 5, False)
+
+        with patch('src.deepagents.search_cache.time.time', return_value=1000.0):
+            cache.set(key, fake_search_response("elecciones"), 'news')
+        with patch('src.deepagents.search_cache.time.time', return_value=1005.0):
+            assert cache.get(key) is not None
+        with patch('src.deepagents.search_cache.time.time', return_value=1011.0):
+            assert cache.get(key) is None
+
+    def test_bypass_flag(self):
+        """El flag de bypass siempre consulta el proveedor."""
+        cache = SearchCache()
+        search_fn = MagicMock(side_effect=lambda q, **kwargs: fake_search_response(q))
+
+        cached_search(search_fn, "bolsa", cache=cache, bypass_cache=True)
+        cached_search(search_fn, "bolsa", cache=cache, bypass_cache=True)
+
+        assert search_fn.call_count == 2
+        assert cache.get_stats()['bypassed'] == 2
+
+    def test_lru_eviction(self):
+        """El nivel en memoria respeta el tamaño máximo."""
+        cache = SearchCache(max_entries=2)
+        for i in range(3):
+            cache.set(f"k{i}", {'i': i})
+
+        assert cache.get("k0") is None
+        assert cache.get("k2") == {'i': 2}
+
+
+class TestSingleFlight:
+    """Pruebas para la coalescencia de búsquedas en vuelo."""
+
+    def test_concurrent_threads_share_one_call(self):
+        """Hilos con la misma clave comparten una única ejecución."""
+        import threading
+        import time
+        from src.deepagents.singleflight import SingleFlight
+
+        flights = SingleFlight()
+        calls = []
+        results = []
+        start = threading.Barrier(5)
+
+        def slow_search():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'results': ['a']}
+
+        def worker():
+            start.wait()
+            results.append(flights.do("misma consulta", slow_search))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{'results': ['a']}] * 5
+        assert flights.get_stats()['coalesced'] == 4
+
+    def test_concurrent_coroutines_share_one_call(self):
+        """Corrutinas concurrentes con la misma búsqueda hacen una sola llamada."""
+        import asyncio
+        from src.deepagents.search_cache import acached_search
+
+        calls = []
+
+        async def slow_search(query, **kwargs):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return fake_search_response(query)
+
+        async def run():
+            cache = SearchCache()
+            return await asyncio.gather(*[acached_search(slow_search, "noticias ia", cache=cache) for _ in range(4)])
+
+        results = asyncio.run(run())
+        assert len(calls) == 1
+        assert all(result['query'] == "noticias ia" for result in results)
+
+    def test_errors_propagate_to_waiters(self):
+        """Un error del líder se propaga y no deja la clave bloqueada."""
+        from src.deepagents.singleflight import SingleFlight
+
+        flights = SingleFlight()
+        with pytest.raises(RuntimeError):
+            flights.do("k", lambda: (_ for _ in ()).throw(RuntimeError("fallo")))
+        assert flights.do("k", lambda: 1) == 1
+        assert flights.get_stats()['in_flight'] == 0
+
+    def test_leader_cancellation_does_not_cancel_waiters(self):
+        """Si se cancela la corrutina líder, la que esperaba repite la llamada."""
+        import asyncio
+        from src.deepagents.singleflight import SingleFlight
+
+        flights = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'results': ['a']}
+
+        async def run():
+            leader = asyncio.create_task(flights.ado("k", slow))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(flights.ado("k", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(run()) == {'results': ['a']}
+        assert len(calls) == 2
+        assert flights.get_stats()['in_flight'] == 0
+
+
+class TestSearchResultShaping:
+    """Pruebas para la compactación de resultados antes del historial."""
+
+    def test_dedupes_strips_and_caps(self):
+        """Se eliminan URLs duplicadas y campos no usados, y se respetan los límites."""
+        from src.deepagents.search_results import shape_search_response
+
+        response = {
+            'query': 'ia', 'response_time': 1.3, 'images': [],
+            'results': [
+                {'title': 'A', 'url': 'https://Ejemplo.com/a/?utm_source=x#top', 'content': 'a' * 2000, 'score': 0.9},
+                {'title': 'A bis', 'url': 'https://ejemplo.com/a', 'content': 'duplicado', 'score': 0.8},
+                {'title': 'B', 'url': 'https://otro.com/b', 'content': 'b' * 100, 'raw_content': 'r' * 5000},
+                {'title': 'C', 'url': 'https://tercero.com/c', 'content': 'c' * 500},
+            ],
+        }
+        shaped, truncated = shape_search_response(response, max_result_chars=1000, max_total_chars=1500)
+
+        assert truncated
+        assert [r['title'] for r in shaped['results']] == ['A', 'B']
+        assert set(shaped['results'][0]) == {'title', 'url', 'content'}
+        assert sum(len(r.get('content', '')) + len(r.get('raw_content', '')) for r in shaped['results']) <= 1502
+        assert 'response_time' not in shaped
+
+    def test_small_response_untouched(self):
+        """Una respuesta pequeña no se recorta ni remite a un archivo."""
+        from src.deepagents.search_results import format_search_results, shape_search_response
+
+        response = {'query': 'ia', 'results': [{'title': 'A', 'url': 'https://a.com', 'content': 'texto'}]}
+        shaped, truncated = shape_search_response(response)
+        text = format_search_results(shaped)
+
+        assert not truncated
+        assert text == "[1] A\nURL: https://a.com\ntexto"
+
+
+class TestPassageSelection:
+    """Pruebas para la selección BM25 de pasajes del contenido bruto."""
+
+    def test_bm25_prefers_passages_with_rare_query_terms(self):
+        """El pasaje con los términos de la consulta obtiene la mejor puntuación."""
+        from src.deepagents.passages import bm25_scores
+
+        passages = [
+            "El mercado eléctrico europeo cerró el año con precios estables.",
+            "La capacidad fotovoltaica instalada en España creció un 28% en 2024.",
+            "Los precios del mercado mayorista bajaron en primavera.",
+        ]
+        scores = bm25_scores("capacidad fotovoltaica España 2024", passages)
+
+        assert scores.argmax() == 1
+        assert scores[0] == 0
+
+    def test_select_passages_keeps_top_k_with_sources(self):
+        """Solo se conservan los mejores pasajes, en el resultado de su URL de origen."""
+        from src.deepagents.passages import select_passages
+
+        filler = "\n\n".join(f"Párrafo genérico número {i} sin relación con la consulta." for i in range(50))
+        response = {'query': 'q', 'results': [
+            {'url': 'https://a.com', 'raw_content': filler + "\n\nLa batería de sodio reduce costes."},
+            {'url': 'https://b.com', 'raw_content': filler},
+            {'url': 'https://c.com', 'content': 'sin contenido bruto'},
+        ]}
+        shaped, selected = select_passages(response, "batería de sodio", top_k=1, passage_chars=80)
+
+        assert selected
+        assert shaped['results'][0]['raw_content'] == "La batería de sodio reduce costes."
+        assert 'raw_content' not in shaped['results'][1]
+        assert len(response['results'][1]['raw_content']) == len(filler)
+
+
+class TestAsyncTavilySearch:
+    """Pruebas del cliente Tavily asíncrono con un transporte HTTP simulado."""
+
+    @pytest.fixture
+    def tavily(self, monkeypatch):
+        """Sustituir la red por `httpx.MockTransport`; devuelve las peticiones recibidas."""
+        requests = []
+        status = {'code': 200}
+
+        def handler(request):
+            requests.append(request)
+            body = json.loads(request.content)
+            return httpx.Response(status['code'], json=fake_search_response(body['query']))
+
+        real_client = search_module.AsyncTavilySearch
+
+        def make_client(**kwargs):
+            return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+        monkeypatch.setattr(search_module, '_require_tavily_api_key', lambda: 'tv-test')
+        monkeypatch.setattr(search_module, 'AsyncTavilySearch', make_client)
+        monkeypatch.setattr(search_module, '_async_clients', search_module.weakref.WeakKeyDictionary())
+        monkeypatch.setattr(search_cache_module, '_default_cache', SearchCache())
+        return requests, status
+
+    def test_payload_and_auth_header(self, tavily):
+        """La petición lleva la clave como Bearer y los parámetros de la búsqueda."""
+        requests, _ = tavily
+        client = search_module.AsyncTavilySearch(api_key='tv-test')
+        result = asyncio.run(client.search("fusión nuclear", max_results=3, topic="news",
+                                           include_raw_content=True))
+
+        assert result['query'] == "fusión nuclear"
+        request = requests[0]
+        assert str(request.url) == search_module.TAVILY_SEARCH_URL
+        assert request.headers['Authorization'] == 'Bearer tv-test'
+        assert json.loads(request.content) == {
+            'query': "fusión nuclear", 'max_results': 3, 'topic': "news", 'include_raw_content': True}
+
+    def test_one_client_per_event_loop(self, tavily):
+        """Dentro de un loop se reutiliza el cliente; otro loop tiene el suyo."""
+        async def clients():
+            return search_module.get_async_tavily_client(), search_module.get_async_tavily_client()
+
+        first, again = asyncio.run(clients())
+        other, _ = asyncio.run(clients())
+        assert first is again
+        assert other is not first
+
+    def test_errors_are_recorded_on_the_dependency(self, tavily):
+        """Un error HTTP se propaga y cuenta como fallo de Tavily."""
+        _, status = tavily
+        status['code'] = 500
+        failures = get_dependency('tavily').snapshot()['failures']
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(search_module.ainternet_search("consulta fallida"))
+        assert get_dependency('tavily').snapshot()['failures'] == failures + 1
+
+    def test_tool_ainvoke_uses_async_cached_search(self, tavily):
+        """`ainvoke` de la herramienta usa la ruta asíncrona con caché."""
+        requests, _ = tavily
+        call = {
+            'name': 'internet_search', 'args': {'query': "baterías de sodio"},
+            'id': 'c1', 'type': 'tool_call',
+        }
+        with patch.object(search_module, 'acached_search', wraps=search_module.acached_search) as acached:
+            command = asyncio.run(search_module.internet_search_tool.ainvoke(call))
+            asyncio.run(search_module.internet_search_tool.ainvoke(call))
+
+        assert acached.call_count == 2
+        assert len(requests) == 1
+        assert "https://example.com" in command.update['messages'][0].content
@@ -3,10 +3,30 @@ Pruebas de seguridad para SOF-IA.
 Valida el funcionamiento de la encriptación, autenticación y configuración segura.
 """
 import pytest
+import hashlib
 import os
+import threading
+import time
+from contextlib import contextmanager
 from unittest.mock import patch, MagicMock
+from src.deepagents import config as config_module
 from src.deepagents.config import SecureConfig, get_gemini_api_key, get_tavily_api_key, validate_configuration
+from datetime import timedelta
+from src.deepagents import auth as auth_module
 from src.deepagents.auth import AuthManager
+from src.deepagents import user_store as user_store_module
+from src.deepagents.user_store import UserStore
+from src.deepagents.passwords import PasswordHasher, PasswordPool, PasswordPoolBusy, legacy_hash
+
+
+@pytest.fixture(autouse=True)
+def isolated_user_db(tmp_path, monkeypatch):
+    """Cada prueba usa su propia base de datos de usuarios, fuera del repositorio."""
+    monkeypatch.setenv('SOFIA_USER_DB_PATH', str(tmp_path / 'users.sqlite3'))
+    monkeypatch.setattr(user_store_module, '_default_store', None)
+    yield
+    if user_store_module._default_store is not None:
+        user_store_module._default_store.close()
 
 
 class TestSecureConfig:
@@ -43,6 +63,38 @@ class TestSecureConfig:
             retrieved_key = config.get_secure_api_key('gemini')
             assert retrieved_key == 'sk-plain123'
 
+    def test_key_derived_once_and_secrets_memoized(self):
+        """La clave se deriva una vez por master key y los secretos se memorizan."""
+        config_module._derived_key = None
+        with patch('cryptography.hazmat.primitives.kdf.pbkdf2.PBKDF2HMAC.derive',
+                   side_effect=lambda data: b'k' * 32) as derive:
+            encrypted = SecureConfig(master_key="memo_key").encrypt_value("sk-memo")
+            config = SecureConfig(master_key="memo_key")
+            with patch.dict(os.environ, {'GEMINI_API_KEY_ENCRYPTED': encrypted}):
+                with patch.object(config, 'decrypt_value', wraps=config.decrypt_value) as decrypt:
+                    assert config.get_secure_api_key('gemini') == "sk-memo"
+                    assert config.get_secure_api_key('gemini') == "sk-memo"
+            assert derive.call_count == 1
+            assert decrypt.call_count == 1
+            # Solo se conserva la clave en uso, y sin la master key en claro
+            assert config_module._derived_key[0] == hashlib.sha256(b"memo_key").digest()
+            SecureConfig(master_key="otra_key").encrypt_value("x")
+            assert derive.call_count == 2
+        config_module._derived_key = None
+
+    def test_secret_cache_follows_env_and_ttl(self):
+        """Un cambio en el entorno, el TTL o `reload()` invalidan el secreto memorizado."""
+        config = SecureConfig(master_key="ttl_key", secret_ttl=60)
+        with patch.dict(os.environ, {'TAVILY_API_KEY': 'tv-old'}):
+            assert config.get_secure_api_key('tavily') == 'tv-old'
+        with patch.dict(os.environ, {'TAVILY_API_KEY': 'tv-new'}):
+            assert config.get_secure_api_key('tavily') == 'tv-new'
+            with patch('src.deepagents.config.time.monotonic', return_value=time.monotonic() + 120):
+                with patch.object(config, '_load_api_key', return_value='tv-reloaded'):
+                    assert config.get_secure_api_key('tavily') == 'tv-reloaded'
+            config.reload()
+            assert config.get_secure_api_key('tavily') == 'tv-new'
+
     def test_validate_configuration_success(self):
         """Prueba de validación exitosa de configuración."""
         with patch.dict(os.environ, {
@@ -101,6 +153,120 @@ class TestAuthManager:
         result = auth.verify_jwt_token('invalid_token')
         assert result is None
 
+    def test_verified_token_cache_avoids_decode(self):
+        """Prueba de que un token ya verificado no se vuelve a decodificar."""
+        auth = AuthManager()
+        token = auth.create_jwt_token({'username': 'test_user', 'role': 'user'})
+
+        with patch('src.deepagents.auth.jwt.decode', wraps=auth_module.jwt.decode) as decode:
+            for _ in range(3):
+                assert auth.verify_jwt_token(token)['username'] == 'test_user'
+        assert decode.call_count == 1
+
+        auth.token_cache.discard(token)
+        assert auth.token_cache.get(token) is None
+
+    def test_refresh_only_near_expiry(self):
+        """Prueba de la renovación deslizante del token."""
+        auth = AuthManager()
+        token = auth.create_jwt_token({'username': 'test_user', 'role': 'user'})
+        assert auth.refresh_jwt_token(token) is None
+
+        with patch.object(auth_module, 'JWT_REFRESH_WINDOW', timedelta(hours=25)):
+            refreshed = auth.refresh_jwt_token(token)
+        assert auth.verify_jwt_token(refreshed)['username'] == 'test_user'
+        assert auth.refresh_jwt_token('invalid_token') is None
+
+
+class TestUserStore:
+    """Pruebas para el almacén persistente de usuarios."""
+
+    def test_users_shared_between_managers(self, tmp_path):
+        """Prueba de que un usuario registrado es visible desde otro almacén y gestor."""
+        path = str(tmp_path / 'users.sqlite3')
+        auth = AuthManager(store=UserStore(path))
+        assert auth.register_user('nuevo', 'clave-nueva') is True
+        assert auth.register_user('nuevo', 'otra-clave') is False
+
+        other = AuthManager(store=UserStore(path))
+        assert other.authenticate_user('nuevo', 'clave-nueva')['role'] == 'user'
+        assert other.authenticate_user('admin', 'admin123') is not None
+        assert other.store.count() == 3
+
+    def test_read_through_cache_invalidation(self, tmp_path):
+        """Prueba de la caché de lectura y su invalidación al escribir."""
+        store = UserStore(str(tmp_path / 'users.sqlite3'), cache_ttl=60)
+        assert store.create('ana', 'hash-1', role='admin')
+        assert store.get('ana')['password_hash'] == 'hash-1'
+
+        store.update_password_hash('ana', 'hash-2')
+        assert store.get('ana')['password_hash'] == 'hash-2'
+        store.set_enabled('ana', False)
+        assert store.get('ana')['enabled'] is False
+        assert store.get('nadie') is None
+
+    def test_racing_read_does_not_cache_stale_row(self, tmp_path):
+        """Una lectura que compite con una escritura local no deja la fila vieja en caché."""
+        store = UserStore(str(tmp_path / 'users.sqlite3'), cache_ttl=60)
+        assert store.create('ana', 'hash-1')
+        real_connection = store._pool.connection
+        writes = [lambda: store.update_password_hash('ana', 'hash-2')]
+
+        @contextmanager
+        def connection():
+            # La escritura termina justo después de que la lectura obtenga la fila vieja
+            with real_connection() as conn:
+                yield conn
+            if writes:
+                writes.pop()()
+
+        with patch.object(store._pool, 'connection', connection):
+            assert store.get('ana')['password_hash'] == 'hash-1'
+        assert store.get('ana')['password_hash'] == 'hash-2'
+
+
+class TestPasswords:
+    """Pruebas del hash de contraseñas y su pool."""
+
+    def test_hash_formats_and_legacy_rehash(self):
+        """Cada hash lleva su sal; los SHA-256 antiguos se verifican y piden re-hash."""
+        for algorithm in ('scrypt', 'pbkdf2_sha256'):
+            hasher = PasswordHasher(algorithm, profile='low')
+            first, second = hasher.hash('secreto'), hasher.hash('secreto')
+            assert first != second
+            assert hasher.verify('secreto', first)
+            assert not hasher.verify('otro', first)
+            assert not hasher.needs_rehash(first)
+
+        hasher = PasswordHasher('scrypt', profile='low')
+        old = legacy_hash('secreto')
+        assert hasher.verify('secreto', old)
+        assert hasher.needs_rehash(old)
+        assert hasher.needs_rehash(PasswordHasher('scrypt', profile='default').hash('secreto'))
+
+    def test_pool_rejects_when_queue_is_full(self):
+        """Con la cola llena, el pool rechaza en lugar de encolar sin límite."""
+        pool = PasswordPool(PasswordHasher('scrypt', profile='low'), max_workers=1, max_pending=0)
+        with pytest.raises(PasswordPoolBusy):
+            pool.verify('secreto', legacy_hash('secreto'))
+        pool.shutdown()
+
+    def test_pool_timeout_is_busy_and_pending_tracks_work(self):
+        """Un timeout se informa como `PasswordPoolBusy` y la tarea sigue contando hasta terminar."""
+        release = threading.Event()
+        hasher = MagicMock()
+        hasher.verify.side_effect = lambda *args: release.wait(5)
+        pool = PasswordPool(hasher, max_workers=1, max_pending=1, timeout=0.05)
+        with pytest.raises(PasswordPoolBusy):
+            pool.verify('secreto', 'hash')
+        # La verificación sigue en curso: el pool no admite otra
+        assert pool.pending() == 1
+        with pytest.raises(PasswordPoolBusy):
+            pool.verify('secreto', 'hash')
+        release.set()
+        pool.shutdown()
+        assert pool.pending() == 0
+
 
 class TestIntegration:
     """Pruebas de integración."""